@@ -0,0 +1,277 @@
+"""Пакетный конвейер целиком против локального сервера изображений.
+
+Перебирает число потоков рендеринга, размер пакета, шаблоны и форматы
+экспорта; для каждой комбинации запускает ``run_batch`` в отдельном
+процессе с пустым кэшем и пишет пропускную способность, перцентили стадий
+и пиковый RSS. Результаты сохраняются в JSON и CSV для сравнения между
+версиями.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks.bench_batch --rows 300 --workers 4 8 12 16 \\
+        --batch-sizes 100 200 500 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.image_server import FORMATS, ImageServer, parse_size
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMN_MAPPING = {
+    'top_left': 'Название',
+    'top_right': 'Цена',
+    'bottom_left': 'Состав',
+    'bottom_right': 'Скидка',
+    'image_url': 'URL картинки',
+}
+CSV_FIELDS = ['template', 'format', 'encoder_profile', 'render_mode', 'render_workers', 'batch_size', 'rows', 'processed',
+              'errors', 'seconds', 'throughput', 'download_p50_ms', 'download_p95_ms',
+              'download_p99_ms', 'render_p50_ms', 'render_p95_ms', 'render_p99_ms',
+              'peak_rss_mb', 'throttled', 'output_mb', 'encode_ms_per_file']
+RENDER_STAGES = ('decode', 'resize', 'draw', 'encode', 'write')
+
+
+def resolve_templates(names):
+    """Полные имена шаблонов по подстроке ("Премиум") или ``all``"""
+    from infographic.config import Config
+
+    if names == ["all"]:
+        return list(Config.TEMPLATES)
+    resolved = []
+    for name in names:
+        matches = [template for template in Config.TEMPLATES if name in template]
+        if not matches:
+            raise SystemExit(f"Шаблон не найден: {name} (есть: {', '.join(Config.TEMPLATES)})")
+        resolved.append(matches[0])
+    return resolved
+
+
+def peak_rss_bytes():
+    """Пик RSS этого процесса и его дочерних процессов (бэкенд processes)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                       resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def run_case(case):
+    """Один прогон в текущем процессе; вызывается в дочернем процессе"""
+    import pandas as pd
+
+    from infographic.batch import BatchSettings, run_batch
+
+    urls = [f"{case['base_url']}{path}" for path in case['paths']]
+    df = pd.DataFrame({
+        'Название': [f"Товар {i}" for i in range(len(urls))],
+        'Цена': [f"{990 + i} руб" for i in range(len(urls))],
+        'Состав': "Хлопок 100%",
+        'Скидка': "-15%",
+        'URL картинки': urls,
+    })
+    settings = BatchSettings(
+        column_mapping=COLUMN_MAPPING,
+        template_name=case['template'],
+        export_format=case['format'],
+        render_backend=case['backend'],
+        render_mode=case['render_mode'],
+        encoder_profile=case['encoder_profile'],
+        max_output_kb=case['max_kb'],
+        render_workers=case['render_workers'],
+        download_concurrency=case['download_concurrency'],
+        per_host_limit=case['per_host_limit'],
+        adaptive_concurrency=case['adaptive'],
+        batch_size=case['batch_size'],
+        retries=case['retries'],
+        zip_only=case['zip_only'],
+        dedup=case['dedup'],
+        shared_frames=case['shared_frames'],
+        output_root="output",
+        archive_dir="."
+    )
+    started = time.perf_counter()
+    report = run_batch(df, settings)
+    seconds = time.perf_counter() - started
+    return {
+        'seconds': seconds,
+        'processed': report.processed,
+        'errors': report.errors,
+        'stage_stats': report.stage_stats,
+        'throttled': report.pool_stats['throttled'],
+        'frame_stats': report.frame_stats,
+        'format_stats': report.format_stats,
+        'host_limits': report.pool_stats['limits'],
+        'render_stats': render_latency(report.stage_stats),
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def render_latency(stage_stats):
+    """Оценка перцентилей рендеринга строки: сумма перцентилей его стадий"""
+    return {key: sum(stage_stats[stage][key] for stage in RENDER_STAGES if stage in stage_stats)
+            for key in ('p50', 'p95', 'p99')}
+
+
+def run_isolated(case):
+    """Прогон в отдельном процессе и пустой папке: свой кэш и свой пик RSS"""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_batch", "--case", json.dumps(case)],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Прогон завершился с ошибкой:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summary_row(case, result):
+    download = result['stage_stats'].get('download', {})
+    render = result['render_stats']
+    rss = result['peak_rss_bytes']
+    formats = result['format_stats']
+    return {
+        'template': case['template'],
+        'format': case['format'],
+        'encoder_profile': case['encoder_profile'],
+        'render_mode': case['render_mode'],
+        'render_workers': case['render_workers'],
+        'batch_size': case['batch_size'],
+        'rows': len(case['paths']),
+        'processed': result['processed'],
+        'errors': result['errors'],
+        'seconds': round(result['seconds'], 2),
+        'throughput': round(result['processed'] / max(result['seconds'], 1e-9), 2),
+        'download_p50_ms': round(download.get('p50', 0) * 1000, 1),
+        'download_p95_ms': round(download.get('p95', 0) * 1000, 1),
+        'download_p99_ms': round(download.get('p99', 0) * 1000, 1),
+        'render_p50_ms': round(render['p50'] * 1000, 1),
+        'render_p95_ms': round(render['p95'] * 1000, 1),
+        'render_p99_ms': round(render['p99'] * 1000, 1),
+        'peak_rss_mb': round(rss / 1024 / 1024, 1) if rss else "",
+        'throttled': result['throttled'],
+        'output_mb': round(sum(stats['bytes'] for stats in formats.values()) / 1024 / 1024, 2),
+        'encode_ms_per_file': round(sum(stats['encode_time'] for stats in formats.values()) * 1000
+                                    / max(sum(stats['files'] for stats in formats.values()), 1), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 8, 12, 16],
+                        help="Число потоков рендеринга")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100])
+    parser.add_argument("--templates", nargs="+", default=["Стандартный"],
+                        help="Подстроки имён шаблонов или all")
+    parser.add_argument("--formats", nargs="+", default=["JPEG"],
+                        help="Форматы экспорта (Config.EXPORT_FORMATS)")
+    parser.add_argument("--backend", default="threads")
+    parser.add_argument("--render-modes", nargs="+", default=["overlay"],
+                        help="overlay и/или direct")
+    parser.add_argument("--encoder-profiles", nargs="+", default=["balanced"],
+                        help="Профили кодировщика (Config.ENCODER_PROFILES)")
+    parser.add_argument("--max-kb", type=int, default=0,
+                        help="Лимит размера файла в КБ (подбор качества JPEG/WebP)")
+    parser.add_argument("--download-concurrency", type=int, default=64)
+    parser.add_argument("--per-host-limit", type=int, default=8)
+    parser.add_argument("--no-adaptive", action="store_true",
+                        help="Постоянный лимит на хост вместо AIMD")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--zip-only", action="store_true")
+    parser.add_argument("--no-shared-frames", action="store_true",
+                        help="Бэкенд processes: без ячеек разделяемой памяти для основ")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Включить дедупликацию: сервер повторяет байты каждые несколько "
+                             "строк, поэтому по умолчанию она выключена, чтобы мерить полный конвейер")
+    server_group = parser.add_argument_group("сервер изображений")
+    server_group.add_argument("--sizes", nargs="+", default=["800x600", "1600x1600", "3000x3000"])
+    server_group.add_argument("--source-formats", nargs="+", default=["jpeg", "png", "webp"],
+                              choices=list(FORMATS))
+    server_group.add_argument("--latency-ms", type=float, default=50.0)
+    server_group.add_argument("--jitter-ms", type=float, default=50.0)
+    server_group.add_argument("--error-rate", type=float, default=0.02)
+    server_group.add_argument("--seed", type=int, default=0)
+    server_group.add_argument("--max-concurrent", type=int, default=0,
+                              help="Квота сервера на одновременные запросы: сверх неё 429 + Retry-After")
+    parser.add_argument("--output", default="bench_batch_results",
+                        help="Префикс файлов результатов (.json и .csv)")
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    templates = resolve_templates(args.templates)
+    server = ImageServer([parse_size(size) for size in args.sizes], args.source_formats,
+                         latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         error_rate=args.error_rate, seed=args.seed,
+                         max_concurrent=args.max_concurrent)
+    server.warm_up()
+    paths = [server.url(i)[len(server.base_url):] for i in range(args.rows)]
+    print(f"Строк: {args.rows} | исходники: {', '.join(args.sizes)} × {', '.join(args.source_formats)} | "
+          f"задержка {args.latency_ms:.0f}+{args.jitter_ms:.0f} мс | ошибки {args.error_rate:.0%}")
+    print(f"{'шаблон':<16} {'формат':<6} {'профиль':<8} {'режим':<7} {'потоки':>6} {'пакет':>5} "
+          f"{'изобр./с':>9} {'загр. p95':>10} {'ренд. p95':>10} {'RSS, МБ':>8} {'вывод, МБ':>9} "
+          f"{'ошибок':>6}")
+
+    rows, raw = [], []
+    with server:
+        for template, export_format, encoder_profile, render_mode, workers, batch_size in itertools.product(
+                templates, args.formats, args.encoder_profiles, args.render_modes, args.workers,
+                args.batch_sizes):
+            case = {
+                'base_url': server.base_url,
+                'paths': paths,
+                'template': template,
+                'format': export_format,
+                'backend': args.backend,
+                'encoder_profile': encoder_profile,
+                'max_kb': args.max_kb,
+                'render_mode': render_mode,
+                'render_workers': workers,
+                'download_concurrency': args.download_concurrency,
+                'per_host_limit': args.per_host_limit,
+                'adaptive': not args.no_adaptive,
+                'batch_size': batch_size,
+                'retries': args.retries,
+                'zip_only': args.zip_only,
+                'dedup': args.dedup,
+                'shared_frames': not args.no_shared_frames,
+            }
+            result = run_isolated(case)
+            row = summary_row(case, result)
+            rows.append(row)
+            raw.append({**{key: value for key, value in case.items() if key != 'paths'},
+                        **result})
+            print(f"{template:<16} {export_format:<6} {encoder_profile:<8} {render_mode:<7} {workers:>6} "
+                  f"{batch_size:>5} {row['throughput']:>9.1f} {row['download_p95_ms']:>10.1f} "
+                  f"{row['render_p95_ms']:>10.1f} {row['peak_rss_mb']:>8} {row['output_mb']:>9} "
+                  f"{row['errors']:>6}")
+
+    environment = {'python': sys.version.split()[0], 'cpus': os.cpu_count(),
+                   'platform': sys.platform, 'args': dict(vars(args), case=None)}
+    with open(f"{args.output}.json", "w", encoding="utf-8") as f:
+        json.dump({'environment': environment, 'runs': raw}, f, ensure_ascii=False, indent=2)
+    with open(f"{args.output}.csv", "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    best = max(rows, key=lambda row: row['throughput'])
+    print(f"Лучше всего: {best['render_workers']} потоков, пакет {best['batch_size']} — "
+          f"{best['throughput']} изобр./сек | результаты: {args.output}.json, {args.output}.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Скорость построения имён файлов: прежний построчный путь против текущего.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks.bench_filenames --rows 100000 --extra-columns 20
+"""
+import argparse
+import hashlib
+import re
+import time
+
+import pandas as pd
+
+from infographic.prepare import NOT_USED, iter_prepared_rows
+
+COLUMN_MAPPING = {
+    'top_left': 'Название',
+    'image_url': 'URL картинки',
+    'top_right': 'Цена',
+    'bottom_left': NOT_USED,
+    'bottom_right': NOT_USED,
+}
+
+
+def legacy_sanitize_filename(filename):
+    filename = filename.replace(' ', '_')
+    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
+    translit_map = {'а':'a','б':'b','в':'v','г':'g','д':'d','е':'e','ё':'yo',
+                   'ж':'zh','з':'z','и':'i','й':'y','к':'k','л':'l','м':'m',
+                   'н':'n','о':'o','п':'p','р':'r','с':'s','т':'t','у':'u',
+                   'ф':'f','х':'kh','ц':'ts','ч':'ch','ш':'sh','щ':'shch',
+                   'ы':'y','э':'e','ю':'yu','я':'ya'}
+    for rus, eng in translit_map.items():
+        filename = filename.replace(rus, eng).replace(rus.upper(), eng.upper())
+    return filename[:100]
+
+
+def legacy_output_filename(row, prefix="", suffix=""):
+    base_name = legacy_sanitize_filename(str(row.get('Название', f'product_{row.name}')))
+    hash_str = hashlib.md5(str(row).encode()).hexdigest()[:8]
+    return f"{prefix}{base_name}{suffix}_{hash_str}_{row.name:06d}.jpg"
+
+
+def make_frame(rows, extra_columns):
+    data = {
+        'Название': [f"Футболка хлопковая «Лето» № {i} / размер XL" for i in range(rows)],
+        'URL картинки': [f"https://cdn.example.com/images/{i}.jpg" for i in range(rows)],
+        'Цена': [f"{1000 + i} руб" for i in range(rows)],
+    }
+    for column in range(extra_columns):
+        data[f"Доп. поле {column}"] = [f"значение {column}-{i}" for i in range(rows)]
+    return pd.DataFrame(data)
+
+
+def bench_legacy(df):
+    started = time.perf_counter()
+    for i in range(len(df)):
+        legacy_output_filename(df.iloc[i], "product_", "_promo")
+    return time.perf_counter() - started
+
+
+def bench_current(df):
+    started = time.perf_counter()
+    for _ in iter_prepared_rows(df, COLUMN_MAPPING, prefix="product_", suffix="_promo"):
+        pass
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--extra-columns", type=int, default=10,
+                        help="Несопоставленные столбцы: прежний хэш зависел от их числа")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.extra_columns)
+    print(f"Строк: {args.rows}, столбцов: {len(df.columns)}")
+    results = {}
+    for name, bench in (("построчно (прежний)", bench_legacy), ("по столбцам", bench_current)):
+        elapsed = bench(df)
+        results[name] = elapsed
+        print(f"{name:>22}: {elapsed:6.2f} сек | {args.rows / elapsed:10.0f} строк/сек")
+    legacy, current = results.values()
+    print(f"Ускорение: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Сравнение пропускной способности бэкендов рендеринга.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks.bench_render_backends --jobs 64 --workers 4
+"""
+import argparse
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from infographic.config import Config
+from infographic.render import RENDER_BACKENDS, RenderJob, create_render_executor, render_job
+
+
+def synthetic_jpeg(width, height, seed):
+    img = Image.effect_noise((width, height), 64 + seed % 32).convert("RGB")
+    buffer = BytesIO()
+    img.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def make_jobs(count, output_dir, template_name, export_format, source_size):
+    sources = [synthetic_jpeg(*source_size, seed) for seed in range(4)]
+    extension = Config.EXPORT_FORMATS[export_format]['extension']
+    return [
+        RenderJob(
+            index=i,
+            image_bytes=sources[i % len(sources)],
+            text_data={'top_left': f"Product {i}", 'top_right': f"{1000 + i} RUB",
+                       'bottom_left': "Cotton 100%", 'bottom_right': "-15%"},
+            template_name=template_name,
+            export_format=export_format,
+            output_path=os.path.join(output_dir, f"{i:06d}.{extension}")
+        )
+        for i in range(count)
+    ]
+
+
+def run_backend(backend, workers, jobs):
+    with create_render_executor(backend, workers) as executor:
+        # Прогрев: запуск процессов не должен попадать в замер
+        list(executor.map(render_job, jobs[:workers]))
+        started = time.perf_counter()
+        results = list(executor.map(render_job, jobs))
+        elapsed = time.perf_counter() - started
+    errors = sum(result['status'] == 'error' for result in results)
+    return elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--template", default=list(Config.TEMPLATES)[0],
+                        choices=list(Config.TEMPLATES))
+    parser.add_argument("--format", default="JPEG", choices=list(Config.EXPORT_FORMATS))
+    parser.add_argument("--source-size", type=int, nargs=2, default=(3000, 3000))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        jobs = make_jobs(args.jobs, output_dir, args.template, args.format,
+                         tuple(args.source_size))
+        print(f"{args.jobs} изображений, {args.workers} воркеров, "
+              f"исходник {args.source_size[0]}x{args.source_size[1]}")
+        baseline = None
+        for backend in RENDER_BACKENDS:
+            elapsed, errors = run_backend(backend, args.workers, jobs)
+            throughput = args.jobs / elapsed
+            baseline = baseline or throughput
+            print(f"{backend:<10} {elapsed:7.2f} сек  {throughput:7.1f} изобр./сек  "
+                  f"x{throughput / baseline:.2f}  ошибок: {errors}")
+
+
+if __name__ == "__main__":
+    main()
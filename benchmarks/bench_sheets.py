@@ -0,0 +1,83 @@
+"""Обмен с Google Sheets без сети: прежнее полное чтение/перезапись против
+чтения выбранных столбцов и пакетной записи статусов.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks.bench_sheets --rows 5000 --extra-columns 20 --latency 0.2
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from infographic import sheets
+from infographic.fake_sheets import FakeWorksheet
+
+MAPPED_COLUMNS = ['Название', 'URL картинки', 'Цена']
+
+
+def make_rows(rows, extra_columns):
+    header = MAPPED_COLUMNS + [f"Доп. поле {column}" for column in range(extra_columns)]
+    data = [[f"Товар {i}", f"https://cdn.example.com/{i}.jpg", f"{1000 + i} руб"]
+            + [f"значение {column}-{i}" for column in range(extra_columns)]
+            for i in range(rows)]
+    return [header] + data
+
+
+def make_results(df, error_every=10):
+    return [{'index': i, 'status': 'error', 'error': 'HTTP 404'} if i % error_every == 0
+            else {'index': i, 'status': 'success', 'filename': f"product_{i:06d}.jpg"}
+            for i in range(len(df))]
+
+
+def legacy_round_trip(worksheet):
+    # get_as_dataframe(evaluate_formulas=True) + clear() + set_with_dataframe()
+    values = worksheet.get_all_values()
+    df = pd.io.parsers.TextParser(values).read().dropna(how='all')
+    results = make_results(df)
+    df[sheets.STATUS_COLUMN] = [sheets.result_cells(r)[0] for r in results]
+    df[sheets.FILENAME_COLUMN] = [sheets.result_cells(r)[1] for r in results]
+    worksheet.clear()
+    worksheet.update("A1", [list(df.columns)] + df.astype(object).where(df.notna(), "").values.tolist())
+
+
+def current_round_trip(worksheet):
+    df = sheets.read_worksheet(worksheet, columns=MAPPED_COLUMNS)
+    sheets.write_batch_results(worksheet, df, make_results(df))
+
+
+def run(name, round_trip, rows, args):
+    worksheet = FakeWorksheet(rows, latency=args.latency, quota_every=args.quota_every)
+    started = time.perf_counter()
+    round_trip(worksheet)
+    elapsed = time.perf_counter() - started
+    stats = worksheet.stats
+    print(f"{name:>24}: {elapsed:6.2f} сек | вызовов API: {stats['calls']:3d} "
+          f"(429: {stats['quota_errors']}) | прочитано ячеек: {stats['cells_read']:8d} | "
+          f"записано ячеек: {stats['cells_written']:8d}")
+    # Повторная запись тех же статусов: изменившихся ячеек нет
+    if round_trip is current_round_trip:
+        worksheet.stats = dict.fromkeys(worksheet.stats, 0)
+        round_trip(worksheet)
+        print(f"{'повторный запуск':>24}: записано ячеек: {worksheet.stats['cells_written']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--extra-columns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="Имитация задержки одного вызова API, сек")
+    parser.add_argument("--quota-every", type=int, default=0,
+                        help="Каждый N-й вызов отвечает 429 (0 — без ошибок квоты); "
+                             "время включает паузы повторов")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.extra_columns)
+    print(f"Строк: {args.rows}, столбцов: {len(rows[0])}, задержка вызова: {args.latency} сек")
+    run("полная перезапись", legacy_round_trip, rows, args)
+    run("столбцы + batch_update", current_round_trip, rows, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Локальный HTTP-сервер синтетических изображений для бенчмарков.
+
+Заменяет CDN с каталогом: отдаёт изображения заданных размеров и форматов
+по адресам вида ``/img/800x600/jpeg/17.jpg``, с настраиваемой задержкой
+ответа и долей ошибок. Задержка и ошибки детерминированы зерном и путём
+запроса, поэтому повторный прогон видит те же ответы. ``max_concurrent``
+имитирует CDN с квотой: запросы сверх неё получают 429 с Retry-After.
+Ответы несут ETag по содержимому и отвечают 304 на ``If-None-Match``.
+
+Для тестов по произвольному пути можно опубликовать свои байты
+(``publish``, в том числе заменить картинку по тому же адресу) и задать
+пути код ответа — постоянный или на первые несколько запросов (``fail``).
+
+Отдельный запуск (например, для ручной проверки интерфейса)::
+
+    python -m benchmarks.image_server --port 8765 --latency-ms 50 --error-rate 0.02
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'png': ('PNG', 'png', 'image/png'),
+    'webp': ('WEBP', 'webp', 'image/webp'),
+}
+VARIANTS = 4
+ERROR_STATUSES = (404, 503)
+
+
+def synthetic_image(width, height, fmt, variant):
+    """Шум с градиентом: сжимается как фотография, а не как заливка"""
+    noise = Image.effect_noise((width, height), 48 + 8 * variant).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    img = Image.blend(noise, gradient, 0.5)
+    pil_format, _, _ = FORMATS[fmt]
+    buffer = BytesIO()
+    img.save(buffer, pil_format, **({'quality': 90} if pil_format != 'PNG' else {}))
+    return buffer.getvalue()
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def parse_range(header, total):
+    """(начало, конец) из ``Range: bytes=a-b`` или None для всего файла"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].partition("-")
+    if not start.isdigit() or int(start) >= total:
+        return None
+    return int(start), min(int(end) if end.isdigit() else total - 1, total - 1)
+
+
+class ImageServer:
+    """Сервер в фоновом потоке; используется как контекстный менеджер"""
+
+    def __init__(self, sizes=((800, 600),), formats=('jpeg',), latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, seed=0, host="127.0.0.1", port=0, max_concurrent=0):
+        self.sizes = [tuple(size) for size in sizes]
+        self.formats = list(formats)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._images = {}
+        self._published = {}
+        self._failures = {}
+        self._in_flight = 0
+        self.stats = {'requests': 0, 'errors': 0, 'throttled': 0, 'bytes_sent': 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, index):
+        """Адрес изображения для строки ``index``: размеры и форматы по кругу"""
+        width, height = self.sizes[index % len(self.sizes)]
+        fmt = self.formats[(index // len(self.sizes)) % len(self.formats)]
+        return f"{self.base_url}/img/{width}x{height}/{fmt}/{index}.{FORMATS[fmt][1]}"
+
+    def publish(self, path, data, content_type="image/jpeg"):
+        """Отдаёт ``data`` по ``path`` вместо синтетики; возвращает полный адрес"""
+        with self._lock:
+            self._published[path] = (data, content_type)
+        return self.base_url + path
+
+    def fail(self, path, status, times=None):
+        """Ответ ``status`` на ``path``: на первые ``times`` запросов или всегда"""
+        with self._lock:
+            self._failures[path] = [status, times]
+
+    def _forced_status(self, path):
+        with self._lock:
+            failure = self._failures.get(path)
+            if failure is None:
+                return None
+            status, times = failure
+            if times is not None:
+                if times <= 1:
+                    del self._failures[path]
+                else:
+                    failure[1] = times - 1
+            return status
+
+    def resolve(self, path):
+        """(байты, Content-Type) для пути или None, если такого изображения нет"""
+        with self._lock:
+            published = self._published.get(path)
+        if published is not None:
+            return published
+        parts = path.strip("/").split("/")
+        try:
+            _, size, fmt, name = parts
+            width, height = parse_size(size)
+            index = int(name.split(".")[0])
+            _, _, content_type = FORMATS[fmt]
+        except (ValueError, KeyError):
+            return None
+        return self.image(width, height, fmt, index % VARIANTS), content_type
+
+    def image(self, width, height, fmt, variant):
+        key = (width, height, fmt, variant)
+        with self._lock:
+            data = self._images.get(key)
+        if data is None:
+            data = synthetic_image(width, height, fmt, variant)
+            with self._lock:
+                data = self._images.setdefault(key, data)
+        return data
+
+    def warm_up(self):
+        """Заранее кодирует все варианты, чтобы генерация не попала в замер"""
+        for width, height in self.sizes:
+            for fmt in self.formats:
+                for variant in range(VARIANTS):
+                    self.image(width, height, fmt, variant)
+
+    def plan(self, path):
+        """(задержка в секундах, код ошибки или None) для пути запроса"""
+        rng = random.Random(f"{self.seed}:{path}")
+        delay = (self.latency_ms + rng.uniform(0, self.jitter_ms)) / 1000
+        status = rng.choice(ERROR_STATUSES) if rng.random() < self.error_rate else None
+        return delay, status
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def _enter(self):
+        """False, если квота одновременных запросов исчерпана"""
+        with self._lock:
+            if self.max_concurrent and self._in_flight >= self.max_concurrent:
+                self.stats['throttled'] += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _empty(self, status, headers=()):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+
+            def do_GET(self):
+                if not server._enter():
+                    self._empty(429, [("Retry-After", "1")])
+                    return
+                try:
+                    self._serve()
+                finally:
+                    server._leave()
+
+            def _serve(self):
+                delay, status = server.plan(self.path)
+                if delay:
+                    time.sleep(delay)
+                server._count(requests=1)
+                status = server._forced_status(self.path) or status
+                resolved = server.resolve(self.path)
+                if resolved is None:
+                    status = 404
+                if status is not None:
+                    server._count(errors=1)
+                    self._empty(status)
+                    return
+                data, content_type = resolved
+                etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._empty(304, [("ETag", etag)])
+                    return
+                total = len(data)
+                byte_range = parse_range(self.headers.get("Range"), total)
+                if byte_range is not None:
+                    # Предпроверка ссылок запрашивает только начало файла
+                    data = data[byte_range[0]:byte_range[1] + 1]
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {byte_range[0]}-{byte_range[1]}/{total}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Cache-Control", "max-age=3600")
+                self.end_headers()
+                self.wfile.write(data)
+                server._count(bytes_sent=len(data))
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sizes", nargs="+", default=["800x600", "3000x3000"])
+    parser.add_argument("--formats", nargs="+", default=["jpeg"], choices=list(FORMATS))
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-concurrent", type=int, default=0,
+                        help="Квота одновременных запросов (0 — без квоты)")
+    args = parser.parse_args()
+
+    server = ImageServer([parse_size(size) for size in args.sizes], args.formats,
+                         latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         error_rate=args.error_rate, seed=args.seed, port=args.port,
+                         max_concurrent=args.max_concurrent)
+    print(f"Пример адреса: {server.url(0)}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""Точка входа: ``python -m infographic``."""
+import sys
+
+from .cli import main
+
+sys.exit(main())
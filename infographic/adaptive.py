@@ -0,0 +1,170 @@
+"""Адаптивная параллельность загрузок, повторы и автоматический выключатель.
+
+``AdaptiveLimit`` — AIMD-лимит одновременных запросов к одному хосту:
+каждый быстрый успешный ответ прибавляет ``1/limit`` (примерно +1 за
+«окно» запросов), ответ 429/503, сетевой сбой или резкий рост задержки
+уменьшают лимит вдвое — не чаще раза за окно. ``Retry-After`` от хоста
+приостанавливает все запросы к нему на указанное время.
+
+``CircuitBreaker`` размыкается после серии сбоев подряд: запросы к хосту
+сразу получают ``HostCircuitOpen``, пакет откладывает такие строки в конец
+и возвращается к ним, когда истечёт пауза.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+THROTTLE_STATUSES = (429, 503)
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class HostCircuitOpen(Exception):
+    """Хост временно отключён выключателем"""
+
+    def __init__(self, host, retry_at):
+        super().__init__(f"Хост {host} временно недоступен (слишком много ошибок подряд)")
+        self.host = host
+        self.retry_at = retry_at
+
+
+def response_status(error):
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def is_retryable_error(error):
+    """Сетевой сбой, таймаут, 429 или 5xx — повтор имеет смысл; 404 и не-изображение — нет"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return response_status(error) in RETRY_STATUSES
+
+
+def retry_after_seconds(response, now=None):
+    """Пауза из заголовка Retry-After (секунды или HTTP-дата) или None"""
+    value = (getattr(response, 'headers', None) or {}).get('Retry-After')
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment.timestamp() - (now or time.time()))
+
+
+def backoff_delay(attempt, error=None, base_delay=0.5, max_delay=30.0):
+    """Пауза перед повтором: Retry-After хоста или экспоненциальная с полным джиттером"""
+    retry_after = retry_after_seconds(getattr(error, 'response', None))
+    if retry_after is not None:
+        return min(max_delay, retry_after) + random.uniform(0, base_delay)
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class AdaptiveLimit:
+    """AIMD-лимит одновременных запросов к хосту от 1 до ``max_limit``.
+
+    ``adaptive=False`` — постоянный лимит, как у семафора.
+    """
+
+    def __init__(self, max_limit, adaptive=True, decrease=0.5, latency_factor=4.0):
+        self.max_limit = max(1, max_limit)
+        self.adaptive = adaptive
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._latency = None
+        self._baseline = None
+        self._last_decrease = 0.0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._cond.wait(timeout=pause if pause > 0 else None)
+
+    def release(self, latency, ok=True, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if self.adaptive:
+                self._update(latency, ok, throttled)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Retry-After: новых запросов к хосту нет ``seconds`` секунд"""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _update(self, latency, ok, throttled):
+        now = time.monotonic()
+        if ok:
+            self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+            # База — медленно забываемый минимум сглаженной задержки
+            self._baseline = (self._latency if self._baseline is None
+                              else min(self._latency, self._baseline * 1.01))
+        slow = (ok and self._baseline is not None
+                and self._latency > self.latency_factor * max(self._baseline, 0.05))
+        if throttled or not ok or slow:
+            # Не чаще раза за окно: пачка ошибок одной волны — одно уменьшение
+            if now - self._last_decrease > max(self._latency or 0.0, 0.5):
+                factor = self.decrease if (throttled or not ok) else 0.9
+                self.limit = max(1.0, self.limit * factor)
+                self._last_decrease = now
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+
+class CircuitBreaker:
+    """Выключатель хоста: ``failure_threshold`` сбоев подряд — пауза
+    ``cooldown`` секунд, удваивающаяся при повторных срабатываниях"""
+
+    def __init__(self, failure_threshold=5, cooldown=10.0, max_cooldown=120.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return time.monotonic() < self.open_until
+
+    def check(self, host):
+        with self._lock:
+            if time.monotonic() < self.open_until:
+                raise HostCircuitOpen(host, self.open_until)
+
+    def wait(self):
+        """Ждёт окончания паузы (для отложенных строк)"""
+        delay = self.open_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, ok):
+        """Возвращает True, если этот сбой разомкнул выключатель"""
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.cooldown = self.base_cooldown
+                return False
+            self.failures += 1
+            if self.failures < self.failure_threshold or time.monotonic() < self.open_until:
+                return False
+            # После паузы хватает одного нового сбоя, чтобы разомкнуть снова
+            self.failures = self.failure_threshold - 1
+            self.open_until = time.monotonic() + self.cooldown
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            self.opened += 1
+            return True
@@ -0,0 +1,39 @@
+"""Потоковая запись результатов в ZIP-архив.
+
+Каждое закодированное изображение добавляется в архив из памяти сразу,
+как только готово, — без повторного чтения файлов с диска после пакета.
+"""
+import threading
+import zipfile
+
+# JPEG/WebP/PNG уже сжаты — повторное deflate только тратит CPU
+STORED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class ZipArchiveSink:
+    """Потокобезопасный приёмник файлов в ZIP-архив"""
+
+    def __init__(self, zip_path):
+        self.zip_path = zip_path
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(zip_path, 'w', allowZip64=True)
+        self.files_written = 0
+        self.bytes_written = 0
+
+    def add_bytes(self, arcname, data):
+        compression = (zipfile.ZIP_STORED if arcname.lower().endswith(STORED_EXTENSIONS)
+                       else zipfile.ZIP_DEFLATED)
+        with self._lock:
+            self._zip.writestr(arcname, data, compress_type=compression)
+            self.files_written += 1
+            self.bytes_written += len(data)
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,723 @@
+"""Пакетная обработка без Streamlit.
+
+``run_batch`` выполняет весь конвейер — контрольные точки, инкрементальный
+режим, загрузку, рендеринг, ZIP и отчёты — и используется как интерфейсом
+Streamlit, так и командной строкой, поэтому результаты у них совпадают.
+"""
+import gc
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from .adaptive import HostCircuitOpen
+from .archive import ZipArchiveSink
+from .checkpoint import CheckpointManifest, completed_rows
+from .config import Config
+from .dedup import DEDUP_GROUP_ROWS, SingleFlight, SourceGroup, group_rows
+from .download import (download_image_bytes, get_fingerprint_index, get_http_pool,
+                       get_image_cache)
+from .filenames import variant_dirname, variant_filename
+from .frames import SharedFramePool
+from .http_pool import host_of, pool_stats_delta
+from .image_cache import stats_delta
+from .incremental import image_validator, revalidate_stale, row_fingerprint
+from .metrics import StageMetrics, should_profile, write_profile
+from .pipeline import DownloadRenderPipeline
+from .preflight import PREFLIGHT_REPORT, PreflightReport, run_preflight
+from .prepare import iter_prepared_rows
+from .render import (DEFAULT_ENCODER_PROFILE, RenderJob, create_render_executor, render_job,
+                     variants_target_size)
+
+
+def new_batch_id():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+@dataclass
+class BatchSettings:
+    """Все параметры пакета; значения по умолчанию совпадают с интерфейсом"""
+    column_mapping: dict
+    template_name: str
+    export_format: str = "JPEG"
+    filename_prefix: str = "product_"
+    filename_suffix: str = "_promo"
+    watermark_text: str = ""
+    render_backend: str = "threads"
+    render_mode: str = "overlay"
+    # Профиль кодировщика (Config.ENCODER_PROFILES) и лимит размера файла:
+    # 0 — без лимита, иначе качество JPEG/WebP подбирается под него
+    encoder_profile: str = DEFAULT_ENCODER_PROFILE
+    max_output_kb: int = 0
+    # Веер: те же строки ещё в этих шаблонах и форматах из одной загрузки
+    extra_templates: list = field(default_factory=list)
+    extra_formats: list = field(default_factory=list)
+    # Одна загрузка и один ресайз на одинаковые URL и одинаковое содержимое
+    dedup: bool = True
+    # Бэкенд процессов: основы в ячейках разделяемой памяти, общие для воркеров
+    shared_frames: bool = True
+    render_workers: int = 8
+    download_concurrency: int = 64
+    per_host_limit: int = 8
+    # AIMD-лимит на хост вместо постоянного и отсрочка строк хостов с
+    # разомкнутым выключателем в конец пакета
+    adaptive_concurrency: bool = True
+    retries: int = 2
+    timeout: int = 15
+    batch_size: int = 100
+    rows_to_process: Optional[int] = None
+    zip_only: bool = False
+    incremental: bool = False
+    # Предпроверка ссылок перед рендерингом: "flag" — только отчёт,
+    # "exclude" — битые строки сразу в журнал ошибок, без загрузки
+    preflight: str = ""
+    # Выборочное профилирование: "cprofile"/"tracemalloc" для каждой N-й строки
+    profile_mode: str = ""
+    profile_every: int = 0
+    batch_id: str = field(default_factory=new_batch_id)
+    output_root: str = "output"
+    archive_dir: str = "."
+
+    @property
+    def output_dir(self):
+        return os.path.join(self.output_root, f"batch_{self.batch_id}")
+
+    @property
+    def zip_path(self):
+        return os.path.join(self.archive_dir, f"batch_{self.batch_id}.zip")
+
+    @property
+    def variants(self):
+        """Пары (шаблон, формат); первая — основной шаблон и формат"""
+        templates = list(dict.fromkeys([self.template_name, *self.extra_templates]))
+        formats = list(dict.fromkeys([self.export_format, *self.extra_formats]))
+        return [(template, export_format) for template in templates for export_format in formats]
+
+    @property
+    def fanout(self):
+        return len(self.variants) > 1
+
+    def variant_arcname(self, filename, template_name, export_format):
+        """Путь файла варианта в архиве и папке пакета: ``<вариант>/<имя>``"""
+        extension = Config.EXPORT_FORMATS[export_format]['extension']
+        return (f"{variant_dirname(template_name, export_format)}/"
+                f"{variant_filename(filename, extension)}")
+
+    def manifest_settings(self):
+        """Настройки, влияющие на имена и содержимое файлов пакета"""
+        settings = {
+            'column_mapping': self.column_mapping,
+            'template': self.template_name,
+            'export_format': self.export_format,
+            'prefix': self.filename_prefix,
+            'suffix': self.filename_suffix,
+            'watermark': self.watermark_text
+        }
+        if self.fanout:
+            settings['variants'] = [list(variant) for variant in self.variants]
+        if self.encoder_profile != DEFAULT_ENCODER_PROFILE or self.max_output_kb:
+            settings['encoder'] = [self.encoder_profile, self.max_output_kb]
+        return settings
+
+    def render_settings(self):
+        """Всё, что влияет на пиксели результата, входит в отпечаток строки"""
+        settings = {
+            'template': self.template_name,
+            'template_config': Config.TEMPLATES[self.template_name],
+            'export_format': self.export_format,
+            'export_config': Config.EXPORT_FORMATS[self.export_format],
+            'watermark': self.watermark_text,
+            'render_mode': self.render_mode,
+            'encoder_profile': self.encoder_profile,
+            'max_output_kb': self.max_output_kb
+        }
+        if self.fanout:
+            settings['variants'] = [
+                (template, Config.TEMPLATES[template], export_format,
+                 Config.EXPORT_FORMATS[export_format])
+                for template, export_format in self.variants
+            ]
+        return settings
+
+    def settings_digest(self):
+        """Хэш всех настроек, от которых зависят имена и содержимое файлов:
+        запись контрольной точки с другим хэшем не переиспользуется"""
+        payload = json.dumps({'manifest': self.manifest_settings(),
+                              'render': self.render_settings()},
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class BatchReport:
+    settings: BatchSettings
+    results: list
+    error_log: list
+    delta_report: list
+    resumed: int
+    start_time: datetime
+    end_time: datetime
+    archive_files: int
+    cache_stats: dict
+    pool_stats: dict
+    stage_stats: dict
+    host_timings: dict
+    deferred_rows: int = 0
+    preflight: Optional[PreflightReport] = None
+    frame_stats: Optional[dict] = None
+
+    @property
+    def processed(self):
+        return sum(1 for result in self.results if result['status'] == 'success')
+
+    @property
+    def errors(self):
+        return len(self.error_log)
+
+    @property
+    def processing_time(self):
+        return (self.end_time - self.start_time).total_seconds()
+
+    @property
+    def decode_stats(self):
+        """Время и память декодирования по отрендеренным в этом запуске строкам"""
+        decoded = [result for result in self.results if 'decode_time' in result]
+        return {
+            'images': len(decoded),
+            'decode_time': sum(result['decode_time'] for result in decoded),
+            'peak_bytes': max((result['decode_bytes'] for result in decoded), default=0),
+            'decoded_bytes': sum(result['decode_bytes'] for result in decoded),
+            'full_bytes': sum(result['decode_full_bytes'] for result in decoded)
+        }
+
+    @property
+    def format_stats(self):
+        """Размер файлов и время кодирования по форматам (строки этого запуска)"""
+        stats = {}
+        for result in self.results:
+            if 'encode_time' not in result and 'outputs' not in result:
+                continue
+            outputs = result.get('outputs') or [dict(result, export_format=self.settings.export_format)]
+            for output in outputs:
+                if 'encode_time' not in output:
+                    continue
+                entry = stats.setdefault(output['export_format'], {
+                    'files': 0, 'bytes': 0, 'encode_time': 0.0, 'qualities': [], 'over_budget': 0})
+                entry['files'] += 1
+                entry['bytes'] += output['size']
+                entry['encode_time'] += output['encode_time']
+                entry['over_budget'] += int(output.get('over_budget', False))
+                if output.get('quality') is not None:
+                    entry['qualities'].append(output['quality'])
+        for entry in stats.values():
+            qualities = entry.pop('qualities')
+            entry['mean_quality'] = sum(qualities) / len(qualities) if qualities else None
+        return stats
+
+    @property
+    def dedup_stats(self):
+        """Сколько загрузок, декодирований и ресайзов сэкономила дедупликация"""
+        url_rows = [result for result in self.results if result.get('dedup') == 'url']
+        content_rows = [result for result in self.results if result.get('dedup') == 'content']
+        return {
+            'url_rows': len(url_rows),
+            'content_rows': len(content_rows),
+            'downloads_saved': len(url_rows),
+            'bytes_saved': sum(result.get('source_bytes', 0) for result in url_rows),
+            'decodes_saved': len(url_rows) + len(content_rows),
+            'resizes_saved': (len(url_rows) + len(content_rows))
+                             * len(dict.fromkeys(template for template, _ in self.settings.variants)),
+            'time_saved': sum(result.get('saved_time', 0.0) for result in self.results)
+        }
+
+
+def _notify(callback, level, message):
+    if callback is not None:
+        callback(level, message)
+
+
+def preflight_batch(df, settings, skip=(), on_progress=None):
+    """Предпроверка ссылок строк пакета (кроме индексов ``skip``) — ``PreflightReport``"""
+    rows_to_process = min(settings.rows_to_process or len(df), len(df))
+    rows = iter_prepared_rows(df, settings.column_mapping, stop=rows_to_process,
+                              prefix=settings.filename_prefix, suffix=settings.filename_suffix)
+    return run_preflight(
+        ((row.index, row.image_url) for row in rows if row.index not in skip),
+        target_size=variants_target_size([template for template, _ in settings.variants]),
+        concurrency=settings.download_concurrency, timeout=settings.timeout,
+        on_progress=on_progress)
+
+
+def run_batch(df, settings, on_progress=None, on_notice=None):
+    """Обрабатывает строки ``df`` и возвращает ``BatchReport``.
+
+    ``on_progress(processed, errors, total)`` вызывается после каждого
+    результата, ``on_notice(level, message)`` — для предупреждений
+    (level: "info" или "warning").
+    """
+    rows_to_process = min(settings.rows_to_process or len(df), len(df))
+    start_time = datetime.now()
+    render_settings = settings.render_settings()
+    revalidated = {}
+    export_extension = Config.EXPORT_FORMATS[settings.export_format]['extension']
+
+    def fingerprint_row(idx, text_data, img_url, check_age=True):
+        validator = image_validator(get_image_cache(), img_url, revalidated=revalidated,
+                                    check_age=check_age)
+        fingerprint = row_fingerprint(text_data, img_url, validator, render_settings)
+        return f"{idx}:{text_data['top_left']}", fingerprint
+
+    def prepared_rows():
+        return iter_prepared_rows(df, settings.column_mapping, stop=rows_to_process,
+                                  prefix=settings.filename_prefix,
+                                  suffix=settings.filename_suffix,
+                                  extension=export_extension)
+
+    def fetch_image_task(group):
+        """Стадия загрузки: байты исходного изображения для группы строк"""
+        started = time.perf_counter()
+        data = None
+        try:
+            if not defer_failing_hosts[0]:
+                # Второй проход: ждём, пока выключатель хоста снова замкнётся
+                get_http_pool().breaker(host_of(group.image_url)).wait()
+            # Части одной большой группы не качают один URL параллельно
+            data, _ = fetch_flight.do(group.key, lambda: download_image_bytes(
+                group.image_url, timeout=settings.timeout, retries=settings.retries))
+        finally:
+            metrics.add_download(host_of(group.image_url), time.perf_counter() - started,
+                                 size=len(data or b""), ok=bool(data))
+        if not data:
+            raise Exception("Не удалось загрузить изображение")
+        return data
+
+    def row_variants(filename):
+        """(шаблон, формат, путь, имя в архиве) каждого файла строки в режиме веера"""
+        return tuple(
+            (template_name, export_format, os.path.join(output_dir, arcname), arcname)
+            for template_name, export_format in settings.variants
+            for arcname in [settings.variant_arcname(filename, template_name, export_format)]
+        )
+
+    def output_path(row, variants):
+        return variants[0][2] if variants else os.path.join(output_dir, row.filename)
+
+    def render_image_task(group, data):
+        """Стадия рендеринга: задание без замыканий на df отправляется в бэкенд.
+
+        Возвращает список результатов — по одному на строку группы.
+        """
+        row, *shared = group.rows
+        leases = {}
+        try:
+            variants = row_variants(row.filename) if settings.fanout else ()
+            shared_rows = []
+            for other in shared:
+                other_variants = row_variants(other.filename) if settings.fanout else ()
+                shared_rows.append((other.index, other.text_data,
+                                    output_path(other, other_variants), other_variants))
+            content_hash = hashlib.sha256(data).hexdigest() if settings.dedup else ""
+            frames = ()
+            if frame_pool is not None:
+                # Одна ячейка на размер холста: шаблоны одного размера делят
+                # кадр. Ячейки берутся в одном порядке размеров — задания с
+                # одним исходником не ждут друг друга по кругу
+                target_size = variants_target_size(template_names)
+                for size in template_sizes:
+                    leases[size] = frame_pool.acquire(
+                        (content_hash, target_size, size) if content_hash else None, size)
+                # Кадр размера заполняет воркер один раз, для первого шаблона
+                frames = tuple((name, leases[size].ref,
+                                leases[size].fill and template_sizes[size] == name)
+                               for name in template_names
+                               for size in [tuple(Config.TEMPLATES[name]['size'])])
+            job = RenderJob(
+                index=row.index,
+                # Если все кадры уже в ячейках, байты исходника не пересылаются
+                image_bytes=(data if frame_pool is None
+                             or any(lease.fill for lease in leases.values()) else b""),
+                text_data=row.text_data,
+                template_name=settings.template_name,
+                export_format=settings.export_format,
+                output_path=output_path(row, variants),
+                variants=variants,
+                shared_rows=tuple(shared_rows),
+                content_hash=content_hash,
+                frames=frames,
+                watermark_text=settings.watermark_text,
+                write_file=not settings.zip_only,
+                return_bytes=True,
+                render_mode=settings.render_mode,
+                encoder_profile=settings.encoder_profile,
+                max_bytes=settings.max_output_kb * 1024,
+                profile=(settings.profile_mode
+                         if should_profile(row.index, settings.profile_every) else "")
+            )
+            result = render_executor.submit(render_job, job).result()
+            if leases and 'frame_cost' in result:
+                frame_cost = result.pop('frame_cost')
+                for lease in leases.values():
+                    if lease.fill:
+                        frame_pool.filled(lease, frame_cost)
+                if result['status'] == 'success' and not any(lease.fill
+                                                             for lease in leases.values()):
+                    result['saved_time'] = max(frame_pool.cost(lease)
+                                               for lease in leases.values())
+            group_results = [result] + result.pop('shared', [])
+            for member_result in group_results[1:]:
+                if 'source_bytes' in member_result:
+                    member_result['source_bytes'] = len(data)
+            for member, member_result in zip(group.rows, group_results):
+                member_result['row_hash'] = member.row_hash
+                if settings.incremental and member_result['status'] == 'success':
+                    # Кэш уже содержит только что загруженные байты — отпечаток
+                    # совпадёт с тем, что следующий запуск вычислит до загрузки
+                    member_result['row_key'], member_result['fingerprint'] = fingerprint_row(
+                        member.index, member.text_data, member.image_url, check_age=False)
+            return group_results
+
+        except Exception as e:
+            return task_error_result(group, e)
+        finally:
+            for lease in leases.values():
+                frame_pool.release(lease)
+
+    def task_error_result(group, error):
+        if isinstance(error, HostCircuitOpen) and defer_failing_hosts[0]:
+            # Не ошибка строки: группа вернётся во втором проходе
+            return [{'index': group.rows[0].index, 'status': 'deferred', 'group': group}]
+        return [{
+            'index': row.index,
+            'status': 'error',
+            'error': str(error)
+        } for row in group.rows]
+
+    output_dir = settings.output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    batch_settings = settings.manifest_settings()
+    previous_settings = CheckpointManifest.load_settings(output_dir)
+    if previous_settings and previous_settings != batch_settings:
+        _notify(on_notice, "warning", "⚠️ Настройки отличаются от исходного запуска пакета — "
+                                      "строки, готовые с прежними настройками, будут "
+                                      "отрисованы заново")
+    settings_digest = settings.settings_digest()
+    checkpoint_records = CheckpointManifest.load(output_dir)
+    manifest = CheckpointManifest(output_dir, settings_digest=settings_digest)
+    if previous_settings is None:
+        manifest.write_settings(batch_settings)
+    cache_stats_before = get_image_cache().stats()
+    get_http_pool().configure(pool_size=settings.download_concurrency,
+                              per_host_limit=settings.per_host_limit,
+                              adaptive=settings.adaptive_concurrency)
+    pool_stats_before = get_http_pool().stats()
+
+    results = []
+    error_log = []
+    delta_report = []
+    metrics = StageMetrics()
+    fetch_flight = SingleFlight()
+    template_names = list(dict.fromkeys(template for template, _ in settings.variants))
+    # Размер холста -> первый шаблон этого размера
+    template_sizes = {}
+    for name in template_names:
+        template_sizes.setdefault(tuple(Config.TEMPLATES[name]['size']), name)
+    frame_pool = None
+    defer_failing_hosts = [settings.adaptive_concurrency]
+    deferred = []
+    processed = errors = 0
+
+    def progress():
+        if on_progress is not None:
+            on_progress(processed, errors, rows_to_process)
+
+    render_executor = archive = stream = None
+    finished = False
+    try:
+        # Загрузка (asyncio) и рендеринг (потоки или процессы) — разные
+        # стадии со своей параллельностью, связанные ограниченной очередью
+        render_executor = create_render_executor(settings.render_backend, settings.render_workers)
+        if settings.render_backend == "processes" and settings.shared_frames:
+            frame_pool = SharedFramePool.for_templates(template_sizes, settings.render_workers)
+        pipeline = DownloadRenderPipeline(
+            fetch=fetch_image_task,
+            render=render_image_task,
+            on_error=task_error_result,
+            download_concurrency=settings.download_concurrency,
+            render_workers=settings.render_workers,
+            max_in_flight=settings.batch_size,
+            # Окно считает строки: группа дубликатов занимает по месту на строку
+            job_weight=lambda group: len(group.rows)
+        )
+        # Архив пишется по мере готовности изображений, без второго прохода
+        archive = ZipArchiveSink(settings.zip_path)
+
+        # Строки, уже готовые по контрольной точке, берутся с диска, а в
+        # инкрементальном режиме — неизменившиеся строки из прошлых пакетов.
+        # Оба случая проверяются за один проход по подготовленным строкам
+        resumable = completed_rows(checkpoint_records, settings_digest)
+        fingerprint_index = get_fingerprint_index() if settings.incremental else None
+        if fingerprint_index is not None:
+            # Устаревшие записи кэша проверяются параллельно до прохода по
+            # строкам, а не по одному запросу на строку
+            revalidated.update(revalidate_stale(
+                get_image_cache(), (row.image_url for row in prepared_rows()),
+                get_http_pool().get, timeout=settings.timeout,
+                concurrency=settings.download_concurrency))
+        resumed_rows = set()
+        resumed = 0
+        if resumable or settings.incremental:
+            for row in prepared_rows():
+                idx = row.index
+                record = resumable.get(idx)
+                if record is not None and record['filename'] == row.filename:
+                    outputs = record.get('outputs') or [{'arcname': row.filename,
+                                                         'path': record['path']}]
+                    for output in outputs:
+                        with open(output['path'], "rb") as f:
+                            archive.add_bytes(output['arcname'], f.read())
+                    resumed_rows.add(idx)
+                    result = {'index': idx, 'status': 'success', 'filename': record['filename'],
+                              'path': record['path'], 'resumed': True}
+                    if 'outputs' in record:
+                        result['outputs'] = record['outputs']
+                    results.append(result)
+                    processed += 1
+                    resumed += 1
+                    continue
+                if fingerprint_index is None:
+                    continue
+                row_key, fingerprint = fingerprint_row(idx, row.text_data, row.image_url)
+                previous = fingerprint_index.lookup(fingerprint)
+                if previous is None:
+                    continue
+                filename = row.filename
+                # Отпечаток веера покрывает все варианты; в индексе — путь к
+                # первому, остальные лежат рядом в папках своих вариантов
+                sources = [(filename, previous['path'])]
+                if settings.fanout:
+                    previous_dir = os.path.dirname(os.path.dirname(previous['path']))
+                    sources = [(arcname, os.path.join(previous_dir, arcname))
+                               for _, _, _, arcname in row_variants(filename)]
+                    if not all(os.path.exists(source) for _, source in sources):
+                        continue
+                outputs = []
+                for (arcname, source), (template_name, export_format) in zip(sources,
+                                                                            settings.variants):
+                    with open(source, "rb") as f:
+                        reused_bytes = f.read()
+                    archive.add_bytes(arcname, reused_bytes)
+                    path = None
+                    if not settings.zip_only:
+                        path = os.path.join(output_dir, arcname)
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        with open(path, "wb") as f:
+                            f.write(reused_bytes)
+                    outputs.append({'template': template_name, 'export_format': export_format,
+                                    'arcname': arcname, 'path': path})
+                path = outputs[0]['path']
+                result = {'index': idx, 'status': 'success', 'filename': filename,
+                          'path': path, 'reused_from': previous['batch_id']}
+                if settings.fanout:
+                    result['outputs'] = outputs
+                delta_report.append({'index': idx, 'row_key': row_key,
+                                     'delta': fingerprint_index.classify(row_key, fingerprint),
+                                     'reused_from': previous['batch_id']})
+                fingerprint_index.remember(row_key, fingerprint, path or previous['path'],
+                                           settings.batch_id)
+                manifest.record(result, row.row_hash)
+                results.append(result)
+                resumed_rows.add(idx)
+                processed += 1
+        if resumed:
+            _notify(on_notice, "info", f"♻️ Из контрольной точки восстановлено {resumed} строк")
+        if delta_report:
+            _notify(on_notice, "info",
+                    f"♻️ Без изменений: {len(delta_report)} строк — взяты из прошлых пакетов")
+        progress()
+
+        preflight = None
+        excluded = {}
+        if settings.preflight:
+            preflight = preflight_batch(df, settings, skip=resumed_rows)
+            if preflight.errors or preflight.warnings:
+                _notify(on_notice, "warning",
+                        f"🔍 Предпроверка ссылок: битых {len(preflight.errors)}, "
+                        f"с предупреждениями {len(preflight.warnings)} из {len(preflight.rows)}")
+            if settings.preflight == 'exclude':
+                excluded = preflight.failed
+                for idx, problem in excluded.items():
+                    result = {'index': idx, 'status': 'error',
+                              'error': f"Предпроверка: {problem}", 'preflight': True}
+                    results.append(result)
+                    error_log.append(result)
+                    manifest.record(result, '')
+                    errors += 1
+                progress()
+
+        # Строки подготавливаются кусками по столбцам и подаются лениво:
+        # в работе не больше batch_size строк. Строки с одним исходником
+        # объединяются в группы: одна загрузка, одно декодирование и ресайз;
+        # группа не больше окна, чтобы целиком в него помещаться
+        rows = (row for row in prepared_rows()
+                if row.index not in resumed_rows and row.index not in excluded)
+        tasks = (group_rows(rows, max_rows=min(DEDUP_GROUP_ROWS, max(settings.batch_size, 1)))
+                 if settings.dedup
+                 else (SourceGroup(row.image_url, row.image_url, (row,)) for row in rows))
+
+        def pipeline_results():
+            for group_results in pipeline.run(tasks):
+                yield from group_results
+            if not deferred:
+                return
+            # Строки хостов, отключённых выключателем, — вторым проходом в
+            # конце пакета, когда пауза истечёт; повторно они уже не откладываются
+            _notify(on_notice, "warning", f"⏳ Отложено строк недоступных хостов: "
+                                          f"{sum(len(group.rows) for group in deferred)} — "
+                                          f"повторяем после паузы")
+            defer_failing_hosts[0] = False
+            for group_results in pipeline.run(list(deferred)):
+                yield from group_results
+
+        # Обрабатываем результаты по мере их поступления
+        stream = pipeline_results()
+        for result in stream:
+            if result['status'] == 'deferred':
+                deferred.append(result['group'])
+                continue
+            results.append(result)
+
+            if result['status'] == 'error':
+                errors += 1
+                error_log.append(result)
+            else:
+                processed += 1
+                metrics.add_many(result.pop('timings', {}))
+                started = time.perf_counter()
+                if 'outputs' in result:
+                    for output in result['outputs']:
+                        archive.add_bytes(output['arcname'], output.pop('data'))
+                else:
+                    archive.add_bytes(result['filename'], result.pop('data'))
+                metrics.add('zip', time.perf_counter() - started)
+            if 'profile' in result:
+                result['profile_path'] = write_profile(output_dir, result['index'],
+                                                       settings.profile_mode, result.pop('profile'))
+            manifest.record(result, result.get('row_hash', ''))
+            if 'fingerprint' in result:
+                delta_report.append({'index': result['index'], 'row_key': result['row_key'],
+                                     'delta': fingerprint_index.classify(result['row_key'], result['fingerprint']),
+                                     'reused_from': ''})
+                fingerprint_index.remember(result['row_key'], result['fingerprint'],
+                                           result['path'], settings.batch_id)
+            progress()
+
+        # Явно вызываем сборщик мусора для освобождения памяти
+        gc.collect()
+
+        write_reports(df, settings, results, error_log, delta_report, archive, preflight)
+        end_time = datetime.now()
+        elapsed = (end_time - start_time).total_seconds()
+        stage_stats, host_timings = metrics.export(output_dir, extra={
+            'batch_id': settings.batch_id,
+            'rows': rows_to_process,
+            'processed': processed,
+            'errors': errors,
+            'processing_time': elapsed,
+            'throughput': processed / max(elapsed, 0.1),
+            'render_backend': settings.render_backend,
+            'render_workers': settings.render_workers,
+            'download_concurrency': settings.download_concurrency,
+            'adaptive_concurrency': settings.adaptive_concurrency,
+            'host_limits': get_http_pool().limits()
+        })
+        frame_stats = frame_pool.stats() if frame_pool is not None else None
+        finished = True
+    finally:
+        # При ошибке или отмене — без ожидания очереди заданий; архив
+        # закрывается в любом случае, чтобы ZIP остался читаемым. Потоки
+        # конвейера останавливаются раньше пула рендеринга, который они ждут
+        if stream is not None:
+            stream.close()
+        if render_executor is not None:
+            render_executor.shutdown(cancel_futures=not finished)
+        if archive is not None:
+            archive.close()
+        manifest.close()
+        if frame_pool is not None:
+            frame_pool.close()
+
+    return BatchReport(
+        settings=settings,
+        results=results,
+        error_log=error_log,
+        delta_report=delta_report,
+        resumed=resumed,
+        start_time=start_time,
+        end_time=end_time,
+        archive_files=archive.files_written,
+        cache_stats=stats_delta(cache_stats_before, get_image_cache().stats()),
+        pool_stats=pool_stats_delta(pool_stats_before, get_http_pool().stats()),
+        stage_stats=stage_stats,
+        host_timings=host_timings,
+        deferred_rows=sum(len(group.rows) for group in deferred),
+        preflight=preflight,
+        frame_stats=frame_stats
+    )
+
+
+def write_reports(df, settings, results, error_log, delta_report, archive, preflight=None):
+    """metadata.csv, error_log.csv, delta_report.csv и preflight_report.csv —
+    в архив и папку пакета"""
+    column_mapping = settings.column_mapping
+    # В режиме веера — строка отчёта на каждый файл варианта
+    primary = {'template': settings.template_name, 'export_format': settings.export_format}
+    files = [(result, output or dict(primary, arcname=result['filename']))
+             for result in results if result['status'] == 'success'
+             for output in result.get('outputs') or [None]]
+    successes = [result for result, _ in files]
+    indices = [result['index'] for result in successes]
+
+    def column_values(key):
+        column = column_mapping[key]
+        if column not in df.columns:
+            return [""] * len(indices)
+        return df[column].take(indices).map(str).tolist()
+
+    reports = {}
+    if successes:
+        reports["metadata.csv"] = pd.DataFrame({
+            'original_index': indices,
+            'filename': [output['arcname'] for _, output in files],
+            'product_name': column_values('top_left'),
+            'price': column_values('top_right'),
+            'image_url': column_values('image_url'),
+            'decode_ms': [round(result['decode_time'] * 1000, 1) if 'decode_time' in result else ""
+                          for result in successes],
+            'decode_mb': [round(result['decode_bytes'] / 1024 / 1024, 2) if 'decode_bytes' in result else ""
+                          for result in successes],
+            'template': [output.get('template', '') for _, output in files],
+            'export_format': [output.get('export_format', '') for _, output in files],
+            'file_bytes': [(output if 'outputs' in result else result).get('size', "")
+                           for result, output in files],
+            'quality': [(output if 'outputs' in result else result).get('quality', "")
+                        for result, output in files],
+            'processing_time': datetime.now().isoformat()
+        })
+    if error_log:
+        reports["error_log.csv"] = pd.DataFrame(error_log)
+    if delta_report:
+        reports["delta_report.csv"] = pd.DataFrame(delta_report).sort_values('index')
+    if preflight is not None and preflight.rows:
+        reports[PREFLIGHT_REPORT] = pd.DataFrame(preflight.rows)
+
+    for report_name, report_df in reports.items():
+        report_bytes = report_df.to_csv(index=False).encode('utf-8-sig')
+        archive.add_bytes(report_name, report_bytes)
+        if not settings.zip_only:
+            with open(os.path.join(settings.output_dir, report_name), "wb") as f:
+                f.write(report_bytes)
@@ -0,0 +1,134 @@
+"""Манифест контрольных точек для возобновления пакетов.
+
+Манифест — append-only JSONL-файл в папке пакета: одна строка на каждый
+завершённый результат. Последняя запись для строки таблицы побеждает,
+поэтому повторная попытка после ошибки просто дописывает новую запись.
+Оборванная при падении последняя строка при чтении игнорируется.
+Каждая запись хранит хэш настроек пакета: после смены шаблона, формата или
+водяного знака файлы с прежними настройками не считаются готовыми, даже
+если их имена не изменились.
+"""
+import json
+import os
+import threading
+import time
+
+MANIFEST_NAME = "checkpoint.jsonl"
+OUTPUT_KEYS = ('template', 'export_format', 'arcname', 'path')
+
+
+class CheckpointManifest:
+    """Журнал статусов строк пакета с периодическим fsync"""
+
+    def __init__(self, batch_dir, fsync_every=50, settings_digest=""):
+        self.batch_dir = batch_dir
+        self.settings_digest = settings_digest
+        self.path = os.path.join(batch_dir, MANIFEST_NAME)
+        self.fsync_every = fsync_every
+        self._lock = threading.Lock()
+        self._pending = 0
+        os.makedirs(batch_dir, exist_ok=True)
+        torn_tail = False
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn_tail = f.read(1) != b"\n"
+        self._file = open(self.path, "a", encoding="utf-8")
+        if torn_tail:
+            # Оборванная при падении строка не должна склеиться со следующей
+            self._file.write("\n")
+
+    @staticmethod
+    def load(batch_dir):
+        """Последняя запись по каждой строке: {index: record}"""
+        records = {}
+        path = os.path.join(batch_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return records
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 'index' in record:
+                    records[record['index']] = record
+        return records
+
+    @staticmethod
+    def load_settings(batch_dir):
+        """Настройки, с которыми пакет был запущен впервые"""
+        path = os.path.join(batch_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 'settings' in record:
+                    return record['settings']
+        return None
+
+    def write_settings(self, settings):
+        self._append({'settings': settings, 'ts': time.time()}, sync=True)
+
+    def record(self, result, row_hash=""):
+        record = {
+            'index': result['index'],
+            'row_hash': row_hash,
+            'status': result['status'],
+            'filename': result.get('filename'),
+            'path': result.get('path'),
+            'error': result.get('error'),
+            'settings': self.settings_digest,
+            'ts': time.time()
+        }
+        if 'outputs' in result:
+            # Веер вариантов: все файлы строки с их путями в архиве
+            record['outputs'] = [{key: output.get(key) for key in OUTPUT_KEYS}
+                                 for output in result['outputs']]
+        self._append(record)
+
+    def _append(self, record, sync=False):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._pending += 1
+            if sync or self._pending >= self.fsync_every:
+                os.fsync(self._file.fileno())
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+
+def completed_rows(records, settings_digest=None):
+    """Строки, результат которых можно переиспользовать без повторной обработки.
+
+    С ``settings_digest`` — только записи, сделанные с теми же настройками.
+    """
+    return {
+        index: record for index, record in records.items()
+        if record.get('status') == 'success'
+        and (settings_digest is None or record.get('settings') == settings_digest)
+        and record.get('path') and os.path.exists(record['path'])
+        and all(output['path'] and os.path.exists(output['path'])
+                for output in record.get('outputs', ()))
+    }
+
+
+def resumable_batches(root="output"):
+    """Папки пакетов с манифестом, от новых к старым"""
+    if not os.path.isdir(root):
+        return []
+    batches = [name for name in os.listdir(root)
+               if name.startswith("batch_")
+               and os.path.exists(os.path.join(root, name, MANIFEST_NAME))]
+    return sorted(batches, reverse=True)
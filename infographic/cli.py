@@ -0,0 +1,281 @@
+"""Командная строка для пакетной обработки без браузера.
+
+Примеры::
+
+    python -m infographic catalog.xlsx --map image_url="URL картинки" \\
+        --template Стандартный --render-workers 8 --download-concurrency 64
+
+    python -m infographic --sheet-id <ID> --credentials service_account.json
+"""
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from .batch import BatchSettings, new_batch_id, preflight_batch, run_batch
+from .config import Config
+from .download import get_image_cache
+from .ingest import load_table
+from .metrics import PROFILE_MODES, STAGE_LABELS
+from .preflight import PREFLIGHT_MODES, PREFLIGHT_REPORT
+from .prepare import NOT_USED
+from .render import DEFAULT_ENCODER_PROFILE, RENDER_BACKENDS, RENDER_MODES
+
+MAPPING_KEYS = ('top_left', 'image_url', 'top_right', 'bottom_left', 'bottom_right')
+
+
+def default_column_mapping(columns):
+    """То же соответствие столбцов, что предлагает интерфейс по умолчанию"""
+    columns = list(columns)
+    return {
+        'top_left': columns[0],
+        'image_url': columns[min(2, len(columns) - 1)] if len(columns) > 2 else columns[0],
+        'top_right': columns[min(3, len(columns) - 1)] if len(columns) > 3 else columns[0],
+        'bottom_left': NOT_USED,
+        'bottom_right': NOT_USED,
+    }
+
+
+def resolve_choice(value, choices, what):
+    """Точное имя или уникальная подстрока без учёта регистра (без эмодзи в консоли)"""
+    if value in choices:
+        return value
+    matches = [choice for choice in choices if value.lower() in choice.lower()]
+    if len(matches) == 1:
+        return matches[0]
+    raise SystemExit(f"Неизвестный {what}: {value}. Доступны: {', '.join(choices)}")
+
+
+def parse_mapping(pairs, columns):
+    mapping = default_column_mapping(columns)
+    for pair in pairs:
+        key, sep, column = pair.partition('=')
+        if not sep or key not in MAPPING_KEYS:
+            raise SystemExit(f"--map ожидает ключ=столбец, ключи: {', '.join(MAPPING_KEYS)}")
+        if column != NOT_USED and column not in columns:
+            raise SystemExit(f"Столбец не найден: {column}")
+        mapping[key] = column
+    return mapping
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m infographic",
+        description="Пакетная генерация инфографики без Streamlit"
+    )
+    source = parser.add_argument_group("источник данных")
+    source.add_argument("input", nargs="?", help="Excel (.xlsx/.xls), CSV или Parquet файл")
+    source.add_argument("--sheet-id", help="ID Google Таблицы вместо файла")
+    source.add_argument("--credentials", help="JSON ключ сервисного аккаунта для --sheet-id")
+    source.add_argument("--write-back", action="store_true",
+                        help="Записать статусы и имена файлов обратно в Google Таблицу")
+
+    design = parser.add_argument_group("оформление")
+    design.add_argument("--map", action="append", default=[], metavar="КЛЮЧ=СТОЛБЕЦ",
+                        help=f"Соответствие столбцов ({', '.join(MAPPING_KEYS)})")
+    design.add_argument("--template", default=list(Config.TEMPLATES)[0])
+    design.add_argument("--format", default="JPEG", choices=list(Config.EXPORT_FORMATS))
+    design.add_argument("--extra-template", action="append", default=[], metavar="ШАБЛОН",
+                        help="Ещё шаблон из той же загрузки (веер); файлы — в папке варианта")
+    design.add_argument("--extra-format", action="append", default=[],
+                        choices=list(Config.EXPORT_FORMATS),
+                        help="Ещё формат экспорта для каждого шаблона (веер)")
+    design.add_argument("--encoder-profile", default=DEFAULT_ENCODER_PROFILE,
+                        choices=list(Config.ENCODER_PROFILES),
+                        help="fast — быстрее кодирование, small — меньше файлы")
+    design.add_argument("--max-kb", type=int, default=0, metavar="КБ",
+                        help="Лимит размера файла: качество JPEG/WebP подбирается под него")
+    design.add_argument("--prefix", default="product_")
+    design.add_argument("--suffix", default="_promo")
+    design.add_argument("--watermark", default="")
+
+    workers = parser.add_argument_group("производительность")
+    workers.add_argument("--backend", default="threads", choices=list(RENDER_BACKENDS))
+    workers.add_argument("--render-mode", default="overlay", choices=list(RENDER_MODES),
+                         help="overlay — готовые плашки и водяной знак из кэша, direct — отрисовка заново")
+    workers.add_argument("--render-workers", type=int, default=8)
+    workers.add_argument("--no-shared-frames", action="store_true",
+                         help="Бэкенд processes: не держать основы в разделяемой памяти")
+    workers.add_argument("--download-concurrency", type=int, default=64)
+    workers.add_argument("--per-host-limit", type=int, default=8)
+    workers.add_argument("--no-adaptive", action="store_true",
+                         help="Постоянный лимит на хост без AIMD и без отсрочки недоступных хостов")
+    workers.add_argument("--retries", type=int, default=2)
+    workers.add_argument("--timeout", type=int, default=15)
+    workers.add_argument("--batch-size", type=int, default=100)
+    workers.add_argument("--cache-limit-mb", type=int, default=1024)
+
+    run = parser.add_argument_group("запуск")
+    run.add_argument("--rows", type=int, help="Сколько строк обработать (по умолчанию все)")
+    run.add_argument("--zip-only", action="store_true")
+    run.add_argument("--incremental", action="store_true")
+    run.add_argument("--no-dedup", action="store_true",
+                     help="Не объединять строки с одинаковым изображением")
+    run.add_argument("--preflight", choices=list(PREFLIGHT_MODES),
+                     help="Проверить ссылки перед рендерингом: flag — только отчёт, "
+                          "exclude — не обрабатывать битые строки")
+    run.add_argument("--preflight-only", action="store_true",
+                     help="Только проверить ссылки и сохранить preflight_report.csv")
+    run.add_argument("--resume", metavar="BATCH_ID", help="Возобновить пакет по его ID")
+    run.add_argument("--profile", choices=PROFILE_MODES,
+                     help="Профилировать выборку строк (отчёты в profiles/ папки пакета)")
+    run.add_argument("--profile-every", type=int, default=50, metavar="N",
+                     help="С --profile: каждая N-я строка")
+    run.add_argument("--output-root", default="output")
+    run.add_argument("--archive-dir", default=".")
+    return parser
+
+
+def print_preflight(preflight):
+    print(f"Предпроверка: строк {len(preflight.rows)}, ссылок {preflight.urls_checked} "
+          f"за {preflight.elapsed:.1f} сек | битых {len(preflight.errors)}, "
+          f"с предупреждениями {len(preflight.warnings)}")
+    for row in (preflight.errors + preflight.warnings)[:10]:
+        print(f"  строка {row['index']}: {row['problem']} — {row['image_url']}")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.sheet_id:
+        if not args.credentials:
+            raise SystemExit("--sheet-id требует --credentials")
+        from .sheets import open_worksheet, read_header, read_worksheet
+        with open(args.credentials, encoding="utf-8") as f:
+            credentials_json = json.load(f)
+        try:
+            # Сначала заголовок, затем только сопоставленные столбцы
+            worksheet = open_worksheet(credentials_json, args.sheet_id)
+            header = [name for name in read_header(worksheet) if name]
+            column_mapping = parse_mapping(args.map, header)
+            mapped_columns = {column for column in column_mapping.values() if column != NOT_USED}
+            df = read_worksheet(worksheet, columns=mapped_columns | ({'Название'} & set(header)))
+        except Exception as e:
+            raise SystemExit(f"Ошибка подключения: {e}")
+    elif args.input:
+        if args.write_back:
+            raise SystemExit("--write-back работает только с --sheet-id")
+        # Заголовок, затем только сопоставленные столбцы (+ «Название» для имён файлов)
+        header = load_table(args.input, args.input, max_rows=0).df.columns
+        column_mapping = parse_mapping(args.map, header)
+        mapped_columns = {column for column in column_mapping.values() if column != NOT_USED}
+        loaded = load_table(args.input, args.input,
+                            columns=mapped_columns | ({'Название'} & set(header)))
+        df = loaded.df
+        print(f"Загружено {len(df)} строк за {loaded.load_time:.2f} сек, "
+              f"{loaded.memory_bytes / 1024 / 1024:.1f} МБ в памяти", file=sys.stderr)
+    else:
+        raise SystemExit("Укажите файл или --sheet-id")
+
+    get_image_cache().max_bytes = args.cache_limit_mb * 1024 * 1024
+    settings = BatchSettings(
+        column_mapping=column_mapping,
+        template_name=resolve_choice(args.template, list(Config.TEMPLATES), "шаблон"),
+        export_format=args.format,
+        extra_templates=[resolve_choice(name, list(Config.TEMPLATES), "шаблон")
+                         for name in args.extra_template],
+        extra_formats=args.extra_format,
+        filename_prefix=args.prefix,
+        filename_suffix=args.suffix,
+        watermark_text=args.watermark,
+        render_backend=args.backend,
+        render_mode=args.render_mode,
+        encoder_profile=args.encoder_profile,
+        max_output_kb=args.max_kb,
+        render_workers=args.render_workers,
+        download_concurrency=args.download_concurrency,
+        per_host_limit=args.per_host_limit,
+        adaptive_concurrency=not args.no_adaptive,
+        retries=args.retries,
+        timeout=args.timeout,
+        batch_size=args.batch_size,
+        rows_to_process=args.rows,
+        zip_only=args.zip_only,
+        incremental=args.incremental,
+        dedup=not args.no_dedup,
+        shared_frames=not args.no_shared_frames,
+        preflight=args.preflight or "",
+        profile_mode=args.profile or "",
+        profile_every=args.profile_every if args.profile else 0,
+        batch_id=args.resume or new_batch_id(),
+        output_root=args.output_root,
+        archive_dir=args.archive_dir
+    )
+
+    if args.preflight_only:
+        preflight = preflight_batch(df, settings, on_progress=lambda checked, total: print(
+            f"\rПроверено ссылок: {checked}/{total}", end="", file=sys.stderr, flush=True))
+        print(file=sys.stderr)
+        os.makedirs(settings.output_dir, exist_ok=True)
+        report_path = os.path.join(settings.output_dir, PREFLIGHT_REPORT)
+        pd.DataFrame(preflight.rows).to_csv(report_path, index=False, encoding="utf-8-sig")
+        print_preflight(preflight)
+        print(f"Отчёт: {report_path}")
+        return 0 if not preflight.errors else 1
+
+    def on_progress(processed, errors, total):
+        print(f"\rОбработано: {processed}/{total} | Ошибки: {errors}",
+              end="", file=sys.stderr, flush=True)
+
+    def on_notice(level, message):
+        print(f"\n{message}", file=sys.stderr)
+
+    report = run_batch(df, settings, on_progress=on_progress, on_notice=on_notice)
+    print(file=sys.stderr)
+    print(f"Пакет: {settings.batch_id}")
+    if settings.fanout:
+        print(f"Вариантов на строку: {len(settings.variants)} — "
+              + ", ".join(f"{template} {export_format}" for template, export_format in settings.variants))
+    print(f"Обработано: {report.processed} | Ошибок: {report.errors} | "
+          f"Время: {report.processing_time:.1f} сек | "
+          f"Скорость: {report.processed / max(report.processing_time, 0.1):.1f} изобр./сек")
+    decode_stats = report.decode_stats
+    if decode_stats['images']:
+        print(f"Декодирование: {decode_stats['decode_time'] / decode_stats['images'] * 1000:.1f} мс/изобр. | "
+              f"Пик памяти: {decode_stats['peak_bytes'] / 1024 / 1024:.1f} МБ | "
+              f"Пикселей в памяти: {decode_stats['decoded_bytes'] / max(decode_stats['full_bytes'], 1):.0%} "
+              f"от полного декодирования")
+    if report.preflight is not None:
+        print_preflight(report.preflight)
+    format_stats = report.format_stats
+    if format_stats:
+        print(f"{'Формат':<8}{'файлов':>7}{'МБ':>8}{'КБ/файл':>9}{'кодир., мс':>12}"
+              f"{'качество':>10}{'сверх лимита':>14}")
+        for export_format, stats in format_stats.items():
+            quality = f"{stats['mean_quality']:.0f}" if stats['mean_quality'] is not None else "—"
+            print(f"{export_format:<8}{stats['files']:>7}{stats['bytes'] / 1024 / 1024:>8.1f}"
+                  f"{stats['bytes'] / stats['files'] / 1024:>9.0f}"
+                  f"{stats['encode_time'] / stats['files'] * 1000:>12.1f}{quality:>10}"
+                  f"{stats['over_budget']:>14}")
+    dedup_stats = report.dedup_stats
+    if dedup_stats['decodes_saved']:
+        print(f"Дедупликация: загрузок сэкономлено {dedup_stats['downloads_saved']} "
+              f"({dedup_stats['bytes_saved'] / 1024 / 1024:.1f} МБ), "
+              f"декодирований {dedup_stats['decodes_saved']}, ресайзов {dedup_stats['resizes_saved']} "
+              f"(≈{dedup_stats['time_saved']:.1f} сек); по содержимому: {dedup_stats['content_rows']} строк")
+    frame_stats = report.frame_stats
+    if frame_stats:
+        print(f"Разделяемая память: {frame_stats['slots']} ячеек, "
+              f"{frame_stats['total_bytes'] / 1024 / 1024:.0f} МБ | кадров записано {frame_stats['fills']}, "
+              f"взято готовыми {frame_stats['hits']}, ожиданий {frame_stats['waits']}")
+    pool_stats = report.pool_stats
+    if pool_stats.get('throttled') or pool_stats.get('circuit_opens') or report.deferred_rows:
+        limits = ", ".join(f"{host} — {limit:g}" for host, limit in pool_stats['limits'].items())
+        print(f"Ограничение хостами: ответов 429/503 {pool_stats['throttled']}, "
+              f"срабатываний выключателя {pool_stats['circuit_opens']}, "
+              f"отложено строк {report.deferred_rows} | лимиты: {limits}")
+    print(f"{'Стадия':<16}{'N':>7}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'всего, с':>10}")
+    for stage, stats in report.stage_stats.items():
+        print(f"{STAGE_LABELS.get(stage, stage):<16}{stats['count']:>7}{stats['p50'] * 1000:>10.1f}"
+              f"{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}{stats['total']:>10.2f}")
+    print(f"Архив: {settings.zip_path} ({os.path.getsize(settings.zip_path) / 1024 / 1024:.1f} МБ)")
+    if args.write_back:
+        from .sheets import write_batch_results
+        print(f"Записано ячеек в Google Таблицу: {write_batch_results(worksheet, df, report.results)}")
+    return 0 if report.errors == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
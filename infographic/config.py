@@ -0,0 +1,60 @@
+"""Шаблоны оформления и форматы экспорта."""
+
+
+class Config:
+    TEMPLATES = {
+        "📋 Стандартный": {
+            "size": (1200, 1200),
+            "font_sizes": {"top": 36, "bottom": 20},
+            "colors": {"top_left": (255, 255, 255), "top_right": (255, 215, 0),
+                      "bottom_left": (220, 220, 220), "bottom_right": (255, 107, 107)},
+            "background_opacity": 180, "text_shadow": True
+        },
+        "⭐ Премиум": {
+            "size": (1200, 1200),
+            "font_sizes": {"top": 32, "bottom": 18},
+            "colors": {"top_left": (255, 255, 255), "top_right": (200, 200, 200),
+                      "bottom_left": (180, 180, 180), "bottom_right": (160, 160, 160)},
+            "background_opacity": 220, "text_shadow": False
+        },
+        "🔥 Акционный": {
+            "size": (1200, 1200),
+            "font_sizes": {"top": 40, "bottom": 22},
+            "colors": {"top_left": (255, 255, 0), "top_right": (255, 50, 50),
+                      "bottom_left": (255, 255, 255), "bottom_right": (255, 150, 50)},
+            "background_opacity": 200, "text_shadow": True
+        },
+        "📱 Вертикальный": {
+            "size": (1080, 1920),
+            "font_sizes": {"top": 34, "bottom": 18},
+            "colors": {"top_left": (255, 255, 255), "top_right": (255, 105, 180),
+                      "bottom_left": (200, 230, 255), "bottom_right": (144, 238, 144)},
+            "background_opacity": 160, "text_shadow": True
+        }
+    }
+    
+    # quality — исходное качество (и верхняя граница подбора под лимит
+    # размера), min_quality — нижняя; профили — параметры кодировщика Pillow
+    EXPORT_FORMATS = {
+        "JPEG": {"quality": 85, "min_quality": 40, "extension": "jpg", "profiles": {
+            "fast": {},
+            "balanced": {"optimize": True},
+            "small": {"optimize": True, "progressive": True}
+        }},
+        "PNG": {"quality": 100, "extension": "png", "profiles": {
+            "fast": {"compress_level": 1},
+            "balanced": {"compress_level": 6},
+            "small": {"compress_level": 9, "optimize": True}
+        }},
+        "WebP": {"quality": 90, "min_quality": 40, "extension": "webp", "profiles": {
+            "fast": {"method": 0},
+            "balanced": {"method": 4},
+            "small": {"method": 6}
+        }}
+    }
+    
+    ENCODER_PROFILES = {
+        "fast": "Быстрое кодирование",
+        "balanced": "Баланс скорости и размера",
+        "small": "Минимальный размер"
+    }
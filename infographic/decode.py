@@ -0,0 +1,89 @@
+"""Декодирование исходных изображений сразу под размер шаблона.
+
+Фото поставщиков бывают 4000–6000 px, а шаблону нужно не больше 1920 px.
+JPEG декодируется в режиме draft (масштабирование DCT в 2/4/8 раз прямо
+в декодере), прочие форматы уменьшаются ``Image.reduce``. Обе операции
+оставляют каждую сторону не меньше целевой, так что итоговый LANCZOS-ресайз
+в ``create_infographic`` работает как раньше, но с гораздо меньшим
+исходником. Ориентация EXIF применяется, режим приводится к RGB один раз,
+а слишком большие изображения отклоняются до декодирования пикселей.
+"""
+import time
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image
+
+# Предел по числу пикселей исходника (защита от «декомпрессионных бомб»)
+MAX_IMAGE_PIXELS = 64_000_000
+# Ориентация EXIF -> преобразование (как в ImageOps.exif_transpose)
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+@dataclass
+class DecodedImage:
+    image: Image.Image
+    source_size: tuple
+    decode_time: float
+    # Память пикселей после декодирования и при полном декодировании
+    memory_bytes: int
+    full_memory_bytes: int
+    scale: int
+
+
+def _to_rgb(img):
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def decode_image(data, target_size=None, max_pixels=MAX_IMAGE_PIXELS):
+    """Декодирует байты в RGB не крупнее, чем нужно для ``target_size``"""
+    started = time.perf_counter()
+    img = Image.open(BytesIO(data))
+    source_size = img.size
+    if source_size[0] * source_size[1] > max_pixels:
+        raise ValueError(f"Изображение слишком большое: {source_size[0]}x{source_size[1]} "
+                         f"(лимит {max_pixels} пикселей)")
+    full_memory_bytes = source_size[0] * source_size[1] * len(img.getbands())
+
+    orientation = img.getexif().get(0x0112, 1)
+    if target_size:
+        # Цель задана после поворота, а декодер работает до него
+        target_w, target_h = target_size
+        if orientation in _TRANSPOSED_ORIENTATIONS:
+            target_w, target_h = target_h, target_w
+        if img.format == 'JPEG':
+            img.draft('RGB', (target_w, target_h))
+        else:
+            factor = min(source_size[0] // target_w, source_size[1] // target_h)
+            if factor > 1:
+                img = _to_rgb(img).reduce(factor)
+    img.load()
+    scale = max(1, source_size[0] // img.size[0])
+
+    img = _to_rgb(img)
+    if orientation in _ORIENTATION_TRANSPOSE:
+        img = img.transpose(_ORIENTATION_TRANSPOSE[orientation])
+    return DecodedImage(
+        image=img,
+        source_size=source_size,
+        decode_time=time.perf_counter() - started,
+        memory_bytes=img.size[0] * img.size[1] * len(img.getbands()),
+        full_memory_bytes=full_memory_bytes,
+        scale=scale
+    )
@@ -0,0 +1,151 @@
+"""Дедупликация исходных изображений внутри пакета.
+
+Варианты товара (цвет, размер) часто ссылаются на одно фото. Перед
+планированием строки группируются по нормализованному URL: группа
+загружается и декодируется один раз, а ресайз под шаблон делается один раз
+на группу — на каждую строку рисуется только текст. После загрузки
+изображения узнаются и по sha256 содержимого: одинаковые байты под разными
+URL берут уже отресайзенную основу из ``SourceCache``.
+"""
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .http_pool import DEFAULT_PORTS
+
+# Строк, которые читаются вперёд для группировки, и строк в одном задании:
+# большая группа делится, чтобы один воркер не рендерил её целиком
+DEDUP_WINDOW = 4096
+DEDUP_GROUP_ROWS = 16
+
+
+def normalize_url(url):
+    """Ключ URL: без пробелов и фрагмента, схема и хост в нижнем регистре,
+    без порта по умолчанию, параметры запроса отсортированы"""
+    url = (url or "").strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.hostname:
+        return url
+    scheme = parts.scheme.lower()
+    host = parts.hostname.lower()
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class SourceGroup(NamedTuple):
+    """Строки с одним исходным изображением; первая — ведущая"""
+    key: str
+    image_url: str
+    rows: tuple
+
+
+def group_rows(rows, window=DEDUP_WINDOW, max_rows=DEDUP_GROUP_ROWS):
+    """Группы строк по нормализованному URL в окнах по ``window`` строк.
+
+    Порядок групп — по первой строке; в памяти не больше одного окна.
+    """
+    rows = iter(rows)
+    while True:
+        groups = OrderedDict()
+        for _, row in zip(range(window), rows):
+            groups.setdefault(normalize_url(row.image_url), []).append(row)
+        if not groups:
+            return
+        for key, members in groups.items():
+            for start in range(0, len(members), max_rows):
+                chunk = tuple(members[start:start + max_rows])
+                yield SourceGroup(key, chunk[0].image_url, chunk)
+
+
+class SingleFlight:
+    """Один одновременный вызов на ключ: остальные ждут его результат.
+
+    ``do`` возвращает (значение, получено_от_другого_вызова).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event()}
+        if not leader:
+            call['done'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['value'], True
+        try:
+            call['value'] = func()
+            return call['value'], False
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class SourceCache:
+    """Отресайзенные основы по (sha256 содержимого, размер декодирования,
+    размер холста); LRU с бюджетом в байтах, общий для потоков процесса.
+
+    Значение — кортеж (изображение, секунд на его получение).
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._flight = SingleFlight()
+
+    @staticmethod
+    def _nbytes(entry):
+        image = entry[0]
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key, factory):
+        """(значение, взято_из_кэша); ``factory`` вызывается один раз на ключ"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry, True
+
+        def create():
+            with self._lock:
+                cached = self._entries.get(key)
+            if cached is not None:
+                return cached, True
+            entry = factory()
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = entry
+                    self._bytes += self._nbytes(entry)
+                    while self._bytes > self.max_bytes and len(self._entries) > 1:
+                        _, evicted = self._entries.popitem(last=False)
+                        self._bytes -= self._nbytes(evicted)
+            return entry, False
+
+        (entry, cached), shared = self._flight.do(key, create)
+        # Дождавшиеся чужого вызова тоже получили готовую основу
+        return entry, cached or shared
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+
+source_cache = SourceCache()
@@ -0,0 +1,86 @@
+"""Загрузка исходных изображений через общий дисковый кэш и пул соединений.
+
+Кэш, пул и индекс отпечатков — синглтоны процесса: в Streamlit-сервере
+они общие для всех сессий, в CLI живут до конца запуска.
+"""
+import threading
+import time
+
+from .adaptive import HostCircuitOpen, backoff_delay, is_retryable_error
+from .decode import decode_image
+from .http_pool import HostSessionPool
+from .image_cache import ImageCache
+from .incremental import FingerprintIndex
+
+_lock = threading.Lock()
+_instances = {}
+
+
+def _singleton(key, factory):
+    instance = _instances.get(key)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(key)
+            if instance is None:
+                instance = _instances[key] = factory()
+    return instance
+
+
+def get_image_cache(cache_dir=".cache/images"):
+    """Дисковый кэш изображений, общий для всех сессий"""
+    return _singleton(('cache', cache_dir), lambda: ImageCache(cache_dir))
+
+
+def get_fingerprint_index(path=".cache/incremental.sqlite3"):
+    """Отпечатки строк прошлых пакетов для инкрементального режима"""
+    return _singleton(('fingerprints', path), lambda: FingerprintIndex(path))
+
+
+def get_http_pool():
+    """Общий пул keep-alive соединений для загрузки изображений"""
+    return _singleton('http_pool', lambda: HostSessionPool(user_agent='Mozilla/5.0'))
+
+
+def image_version(url, timeout=15):
+    """Версия изображения — sha256 содержимого в дисковом кэше.
+
+    Свежая запись отвечает без сети; отсутствующая загружается, устаревшая
+    ревалидируется условным запросом. Пустая строка — версию узнать не удалось.
+    """
+    cache = get_image_cache()
+    entry = cache.lookup(url) if url else None
+    if entry is None or time.time() - entry.fetched_at >= cache.revalidate_after:
+        try:
+            cache.fetch(url, get_http_pool().get, timeout=timeout)
+        except Exception:
+            return ""
+        entry = cache.lookup(url)
+    return entry.blob_hash if entry is not None else ""
+
+
+def download_image_bytes(url, timeout=15, retries=2):
+    """Сырые байты изображения через дисковый кэш и общий пул соединений.
+
+    Повторяются только временные ошибки (сеть, таймаут, 429, 5xx) — с паузой
+    из Retry-After или экспоненциальной с джиттером; 404 и не-изображение
+    сразу считаются ошибкой. ``HostCircuitOpen`` пробрасывается как есть.
+    """
+    cache = get_image_cache()
+    http_pool = get_http_pool()
+    for attempt in range(retries + 1):
+        try:
+            data, _ = cache.fetch(url, http_pool.get, timeout=timeout)
+            return data
+        except HostCircuitOpen:
+            raise
+        except Exception as e:
+            if attempt == retries or not is_retryable_error(e):
+                raise Exception(f"Не удалось загрузить: {e}")
+            time.sleep(backoff_delay(attempt, e))
+    return None
+
+
+def download_image_decoded(url, target_size=None, timeout=15, retries=2):
+    """DecodedImage, декодированный не крупнее ``target_size``, или None"""
+    data = download_image_bytes(url, timeout=timeout, retries=retries)
+    return decode_image(data, target_size=target_size) if data else None
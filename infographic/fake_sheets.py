@@ -0,0 +1,142 @@
+"""Локальная подмена листа Google Sheets для офлайн-бенчмарков и отладки.
+
+``FakeWorksheet`` реализует те методы ``gspread.Worksheet``, которыми
+пользуется ``infographic.sheets``, хранит ячейки в памяти, считает вызовы
+API и переданные ячейки, умеет имитировать задержку сети и ошибки квоты
+(HTTP 429).
+"""
+import re
+import threading
+import time
+
+from gspread.utils import a1_to_rowcol
+
+_RANGE_RE = re.compile(r"^([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$")
+
+
+class FakeQuotaError(Exception):
+    """Ответ 429, как у ``gspread.exceptions.APIError``"""
+
+    class _Response:
+        status_code = 429
+
+    def __init__(self):
+        super().__init__("Quota exceeded for quota metric 'Read requests' (429)")
+        self.response = self._Response()
+
+
+def _column_index(letters):
+    return a1_to_rowcol(f"{letters}1")[1]
+
+
+class FakeWorksheet:
+    def __init__(self, rows, latency=0.0, quota_every=0):
+        self._lock = threading.Lock()
+        self._rows = [list(map(str, row)) for row in rows]
+        self.col_count = max((len(row) for row in self._rows), default=0)
+        self.latency = latency
+        # Каждый quota_every-й вызов отвечает ошибкой квоты (0 — никогда)
+        self.quota_every = quota_every
+        self.stats = {'calls': 0, 'cells_read': 0, 'cells_written': 0, 'quota_errors': 0}
+
+    @classmethod
+    def from_dataframe(cls, df, **kwargs):
+        rows = [list(df.columns)] + df.astype(object).where(df.notna(), "").values.tolist()
+        return cls(rows, **kwargs)
+
+    def _call(self):
+        self.stats['calls'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.quota_every and self.stats['calls'] % self.quota_every == 0:
+            self.stats['quota_errors'] += 1
+            raise FakeQuotaError()
+
+    def _cell(self, row, col):
+        if row <= len(self._rows) and col <= len(self._rows[row - 1]):
+            return self._rows[row - 1][col - 1]
+        return ""
+
+    def _set(self, row, col, value):
+        while len(self._rows) < row:
+            self._rows.append([])
+        line = self._rows[row - 1]
+        while len(line) < col:
+            line.append("")
+        line[col - 1] = "" if value is None else str(value)
+
+    def _bounds(self, a1_range):
+        match = _RANGE_RE.match(a1_range)
+        if match is None:
+            raise ValueError(f"Неподдерживаемый диапазон: {a1_range}")
+        first_col, first_row, last_col, last_row = match.groups()
+        if last_col is None:
+            # Одна ячейка ("C5") или целый столбец ("C")
+            last_col, last_row = first_col, first_row
+        first_row = int(first_row or 1)
+        last_row = int(last_row) if last_row else max(len(self._rows), first_row)
+        return first_row, _column_index(first_col), last_row, _column_index(last_col)
+
+    # --- методы gspread.Worksheet ---
+
+    def row_values(self, row, **kwargs):
+        with self._lock:
+            self._call()
+            values = list(self._rows[row - 1]) if row <= len(self._rows) else []
+            while values and values[-1] == "":
+                values.pop()
+            self.stats['cells_read'] += len(values)
+            return values
+
+    def get_all_values(self, **kwargs):
+        with self._lock:
+            self._call()
+            width = self.col_count
+            values = [[self._cell(r, c) for c in range(1, width + 1)]
+                      for r in range(1, len(self._rows) + 1)]
+            self.stats['cells_read'] += sum(len(row) for row in values)
+            return values
+
+    def batch_get(self, ranges, major_dimension="ROWS", **kwargs):
+        with self._lock:
+            self._call()
+            result = []
+            for a1_range in ranges:
+                first_row, first_col, last_row, last_col = self._bounds(a1_range)
+                grid = [[self._cell(r, c) for c in range(first_col, last_col + 1)]
+                        for r in range(first_row, last_row + 1)]
+                if major_dimension == "COLUMNS":
+                    grid = [list(column) for column in zip(*grid)]
+                # Как и API, отбрасываем пустые хвосты
+                grid = [line[:max((i + 1 for i, v in enumerate(line) if v != ""), default=0)]
+                        for line in grid]
+                while grid and not grid[-1]:
+                    grid.pop()
+                self.stats['cells_read'] += sum(len(line) for line in grid)
+                result.append(grid)
+            return result
+
+    def batch_update(self, data, **kwargs):
+        with self._lock:
+            self._call()
+            for item in data:
+                first_row, first_col, _, _ = self._bounds(item['range'])
+                for r, line in enumerate(item['values']):
+                    for c, value in enumerate(line):
+                        self._set(first_row + r, first_col + c, value)
+                        self.stats['cells_written'] += 1
+            self.col_count = max(self.col_count, max((len(row) for row in self._rows), default=0))
+            return {'totalUpdatedCells': self.stats['cells_written']}
+
+    def update(self, range_name, values, **kwargs):
+        return self.batch_update([{'range': range_name, 'values': values}])
+
+    def clear(self):
+        with self._lock:
+            self._call()
+            self._rows = []
+
+    def add_cols(self, cols):
+        with self._lock:
+            self._call()
+            self.col_count += cols
@@ -0,0 +1,71 @@
+"""Имена выходных файлов.
+
+Транслитерация, замена пробелов и удаление запрещённых символов выполняются
+одним проходом ``str.translate`` по заранее собранной таблице. Хэш в имени
+файла считается только по сопоставленным полям строки, а не по repr всей
+строки таблицы.
+"""
+import hashlib
+import os
+import re
+
+TRANSLIT_MAP = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ы': 'y', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    # Украинские и белорусские буквы
+    'і': 'i', 'ї': 'yi', 'є': 'ye', 'ґ': 'g', 'ў': 'w',
+}
+FORBIDDEN_CHARS = '<>:"/\\|?*'
+MAX_NAME_LENGTH = 100
+HASH_LENGTH = 8
+
+
+def _build_table():
+    table = {}
+    for cyr, lat in TRANSLIT_MAP.items():
+        table[cyr] = lat
+        table[cyr.upper()] = lat.upper()
+    table[' '] = '_'
+    for char in FORBIDDEN_CHARS:
+        table[char] = None
+    return str.maketrans(table)
+
+
+FILENAME_TABLE = _build_table()
+
+
+def sanitize_filename(filename):
+    return filename.translate(FILENAME_TABLE)[:MAX_NAME_LENGTH]
+
+
+def sanitize_filenames(filenames):
+    """sanitize_filename для списка имён"""
+    table = FILENAME_TABLE
+    return [name.translate(table)[:MAX_NAME_LENGTH] for name in filenames]
+
+
+def variant_dirname(template_name, export_format):
+    """Папка варианта в архиве: «📱 Вертикальный» + WebP → Vertikalnyy_webp"""
+    name = re.sub(r'[^A-Za-z0-9_-]', '', sanitize_filename(template_name)).strip('_')
+    return f"{name or 'template'}_{export_format.lower()}"
+
+
+def variant_filename(filename, extension):
+    """Имя файла строки с расширением формата варианта"""
+    return f"{os.path.splitext(filename)[0]}.{extension}"
+
+
+def fields_hash(values):
+    """Короткий хэш значений сопоставленных полей одной строки"""
+    payload = "\x1f".join(values)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+
+
+def fields_hashes(columns):
+    """fields_hash для каждой строки; ``columns`` — списки значений по полям"""
+    md5 = hashlib.md5
+    return [md5("\x1f".join(values).encode('utf-8')).hexdigest()[:HASH_LENGTH]
+            for values in zip(*columns)]
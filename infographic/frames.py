@@ -0,0 +1,201 @@
+"""Кадры исходников в разделяемой памяти для бэкенда процессов.
+
+В пуле потоков отресайзенные основы общие через ``source_cache``, а у
+каждого процесса-воркера свой кэш: одинаковое содержимое в разных
+процессах декодировалось бы заново. ``SharedFramePool`` держит один
+сегмент разделяемой памяти с ячейками фиксированного размера — по классу
+на размер холста шаблона (1200x1200, 1080x1920), 4 байта на пиксель
+(RGBX: в этом виде Pillow отображает буфер без копирования).
+
+Ячейками распоряжается только главный процесс: перед отправкой задания он
+берёт ячейку на каждый размер холста его шаблонов (шаблоны одного размера
+делят кадр) и либо находит в ней готовый кадр по ключу
+(sha256 содержимого, размер декодирования, размер холста), либо поручает
+воркеру заполнить её. Воркер декодирует один раз, пишет кадр в ячейку и
+читает кадры через ``Image.frombuffer`` без копирования пикселей: копией
+становится только RGB-холст, на котором рисуется текст. После
+результата ячейки явно возвращаются в пул; незанятые кадры остаются в нём
+как LRU-кэш, пока ячейка не понадобится другому ключу. Число ячеек
+ограничено, поэтому память известна заранее.
+"""
+import itertools
+import threading
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+from PIL import Image
+
+BYTES_PER_PIXEL = 4
+FRAME_MODE = 'RGBX'
+
+_attached = {}
+_attached_lock = threading.Lock()
+
+
+class FrameRef(NamedTuple):
+    """Адрес кадра в разделяемой памяти; сериализуется в задание"""
+    shm_name: str
+    offset: int
+    width: int
+    height: int
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def nbytes(self):
+        return self.width * self.height * BYTES_PER_PIXEL
+
+
+def _segment(name):
+    """Сегмент по имени, подключённый один раз на процесс"""
+    with _attached_lock:
+        shm = _attached.get(name)
+        if shm is None:
+            # Трекер ресурсов воркеры наследуют от главного процесса, который
+            # и удаляет сегмент в ``SharedFramePool.close``
+            shm = _attached[name] = shared_memory.SharedMemory(name=name)
+        return shm
+
+
+def write_frame(ref, image):
+    """Записывает RGB-кадр размера ``ref.size`` в ячейку"""
+    if image.size != ref.size:
+        raise ValueError(f"Размер кадра {image.size} не совпадает с ячейкой {ref.size}")
+    _segment(ref.shm_name).buf[ref.offset:ref.offset + ref.nbytes] = \
+        image.tobytes('raw', FRAME_MODE)
+
+
+def read_frame(ref):
+    """Кадр из ячейки как RGBX-изображение поверх разделяемой памяти, без
+    копирования пикселей. Единственная копия — RGB-холст, который из него
+    делает ``create_infographic``; кадр нельзя держать дольше аренды ячейки"""
+    view = _segment(ref.shm_name).buf[ref.offset:ref.offset + ref.nbytes]
+    return Image.frombuffer(FRAME_MODE, ref.size, view, 'raw', FRAME_MODE, 0, 1)
+
+
+class FrameLease(NamedTuple):
+    """Ячейка, выданная заданию: ``fill`` — кадр должен записать воркер"""
+    key: tuple
+    ref: FrameRef
+    fill: bool
+
+
+class SharedFramePool:
+    """Ячейки кадров по классам размеров; живёт в главном процессе.
+
+    ``slots`` — {(ширина, высота): число ячеек}.
+    """
+
+    def __init__(self, slots):
+        self._classes = {}
+        offset = 0
+        for size, count in slots.items():
+            nbytes = size[0] * size[1] * BYTES_PER_PIXEL
+            self._classes[tuple(size)] = [offset + i * nbytes for i in range(count)]
+            offset += count * nbytes
+        self.total_bytes = offset
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self._cond = threading.Condition()
+        self._free = {size: list(offsets) for size, offsets in self._classes.items()}
+        # Ключ -> запись; незанятые готовые кадры — в _idle в порядке LRU
+        self._entries = {}
+        self._idle = OrderedDict()
+        self._anonymous = itertools.count()
+        self._stats = {'hits': 0, 'fills': 0, 'waits': 0, 'evictions': 0}
+
+    @classmethod
+    def for_templates(cls, sizes, workers, spare=None):
+        """Ячеек на класс: по одной каждому потоку рендеринга (задание берёт
+        одну ячейку на размер) плюс запас под кэш"""
+        spare = max(2, workers // 2) if spare is None else spare
+        return cls({tuple(size): workers + spare for size in sizes})
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def _take_slot(self, size):
+        free = self._free[size]
+        if free:
+            return free.pop()
+        for key in self._idle:
+            if self._entries[key]['ref'].size == size:
+                del self._idle[key]
+                offset = self._entries.pop(key)['ref'].offset
+                self._stats['evictions'] += 1
+                return offset
+        return None
+
+    def acquire(self, key, size):
+        """``FrameLease`` на кадр ``key`` размера ``size``; ``key=None`` — кадр
+        без повторного использования.
+
+        Если такой кадр сейчас заполняет другое задание, ждёт его; если все
+        ячейки класса заняты — ждёт освобождения. Кадр, который заполняет
+        сам вызывающий поток, не дождаться никогда — это ``RuntimeError``.
+        """
+        size = tuple(size)
+        if key is None:
+            key = ('anonymous', next(self._anonymous))
+        owner = threading.get_ident()
+        with self._cond:
+            while True:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    if entry['ready']:
+                        entry['refs'] += 1
+                        self._idle.pop(key, None)
+                        self._stats['hits'] += 1
+                        return FrameLease(key, entry['ref'], False)
+                    if entry['owner'] == owner:
+                        raise RuntimeError(f"Кадр {key} уже заполняет этот же поток")
+                else:
+                    offset = self._take_slot(size)
+                    if offset is not None:
+                        ref = FrameRef(self._shm.name, offset, size[0], size[1])
+                        self._entries[key] = {'ref': ref, 'refs': 1, 'ready': False,
+                                              'cost': 0.0, 'reuse': key[0] != 'anonymous',
+                                              'owner': owner}
+                        self._stats['fills'] += 1
+                        return FrameLease(key, ref, True)
+                self._stats['waits'] += 1
+                self._cond.wait()
+
+    def cost(self, lease):
+        """Секунд на декодирование и ресайз, сэкономленных попаданием"""
+        with self._cond:
+            return self._entries[lease.key]['cost']
+
+    def filled(self, lease, cost=0.0):
+        """Кадр записан воркером — его могут брать другие задания"""
+        with self._cond:
+            entry = self._entries[lease.key]
+            entry['ready'], entry['cost'] = True, cost
+            self._cond.notify_all()
+
+    def release(self, lease):
+        """Возвращает ячейку в пул. Незаполненный кадр (воркер не смог его
+        записать) освобождает ячейку сразу: ждущие его задания получат новую
+        и заполнят её сами; готовый кадр остаётся в кэше до вытеснения"""
+        with self._cond:
+            entry = self._entries[lease.key]
+            entry['refs'] -= 1
+            if entry['refs'] == 0:
+                if entry['ready'] and entry['reuse']:
+                    self._idle[lease.key] = True
+                else:
+                    del self._entries[lease.key]
+                    self._free[entry['ref'].size].append(entry['ref'].offset)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, slots=sum(len(offsets) for offsets in self._classes.values()),
+                        total_bytes=self.total_bytes, cached=len(self._idle))
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,192 @@
+"""Общий пул HTTP-сессий для загрузки изображений.
+
+Одна ``requests.Session`` с keep-alive и пулом соединений на каждый хост,
+размер которого подстраивается под число потоков, плюс адаптивный лимит
+одновременных запросов к одному CDN и выключатель для хостов, которые
+раз за разом отвечают ошибками (см. ``adaptive``).
+"""
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .adaptive import (THROTTLE_STATUSES, AdaptiveLimit, CircuitBreaker,
+                       retry_after_seconds)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def host_of(url):
+    """Ключ хоста вида ``host:port`` — совпадает с ключами пулов urllib3"""
+    parts = urlsplit(url)
+    port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+    return f"{(parts.hostname or '').lower()}:{port}"
+
+
+class HostSessionPool:
+    """Потокобезопасный пул соединений с лимитами на хост"""
+
+    def __init__(self, pool_size=8, per_host_limit=8, max_hosts=64,
+                 user_agent='Mozilla/5.0', adaptive=True, max_retry_after=60.0):
+        self.pool_size = pool_size
+        self.per_host_limit = per_host_limit
+        self.max_hosts = max_hosts
+        self.adaptive = adaptive
+        self.max_retry_after = max_retry_after
+        self._lock = threading.Lock()
+        self._host_limits = {}
+        self._breakers = {}
+        self._host_stats = {}
+        self._retired_connections = {}
+        self.session = requests.Session()
+        # Общая сессия используется из многих потоков — cookie не храним
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.session.headers['User-Agent'] = user_agent
+        self._mount()
+
+    def _mount(self):
+        self._adapter = HTTPAdapter(pool_connections=self.max_hosts,
+                                    pool_maxsize=self.pool_size,
+                                    pool_block=False)
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+
+    def configure(self, pool_size, per_host_limit=None, adaptive=None):
+        """Подстраивает размер пула под число потоков"""
+        per_host_limit = per_host_limit or pool_size
+        adaptive = self.adaptive if adaptive is None else adaptive
+        with self._lock:
+            if per_host_limit != self.per_host_limit or adaptive != self.adaptive:
+                self.per_host_limit = per_host_limit
+                self.adaptive = adaptive
+                self._host_limits = {}
+            if pool_size != self.pool_size:
+                for host, count in self._connections_by_host().items():
+                    self._retired_connections[host] = \
+                        self._retired_connections.get(host, 0) + count
+                self.pool_size = pool_size
+                old_adapter = self._adapter
+                self._mount()
+                old_adapter.close()
+
+    def _host_limit(self, host):
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = AdaptiveLimit(self.per_host_limit,
+                                                                adaptive=self.adaptive)
+            return limit
+
+    def breaker(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker()
+            return breaker
+
+    def get(self, url, timeout=15, headers=None, stream=False):
+        """Аналог ``requests.get`` через общий пул соединений.
+
+        Если выключатель хоста разомкнут, сразу бросает ``HostCircuitOpen``.
+        """
+        host = host_of(url)
+        breaker = self.breaker(host)
+        breaker.check(host)
+        limit = self._host_limit(host)
+        wait_started = time.perf_counter()
+        limit.acquire()
+        waited = time.perf_counter() - wait_started
+        started = time.perf_counter()
+        ok = throttled = quota = False
+        try:
+            response = self.session.get(url, timeout=timeout, headers=headers, stream=stream)
+            throttled = response.status_code in THROTTLE_STATUSES
+            # 429 — хост жив, но просит сбавить темп: это дело лимита, не выключателя
+            quota = response.status_code == 429
+            ok = response.status_code < 500 and not throttled
+            retry_after = retry_after_seconds(response) if throttled else None
+            if retry_after:
+                limit.pause(min(retry_after, self.max_retry_after))
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            limit.release(elapsed, ok=ok, throttled=throttled)
+            opened = not quota and breaker.record(ok)
+            self._record(host, waited, elapsed, ok, throttled, opened)
+
+    def _record(self, host, waited, elapsed, ok=True, throttled=False, opened=False):
+        with self._lock:
+            stats = self._host_stats.setdefault(
+                host, {'requests': 0, 'wait_time': 0.0, 'request_time': 0.0,
+                       'throttled': 0, 'failures': 0, 'circuit_opens': 0})
+            stats['requests'] += 1
+            stats['wait_time'] += waited
+            stats['request_time'] += elapsed
+            stats['throttled'] += int(throttled)
+            stats['failures'] += int(not ok)
+            stats['circuit_opens'] += int(opened)
+
+    def limits(self):
+        """Текущий адаптивный лимит одновременных запросов по хостам"""
+        with self._lock:
+            return {host: round(limit.limit, 1) for host, limit in self._host_limits.items()}
+
+    def _connections_by_host(self):
+        """Число открытых TCP/TLS соединений по данным пулов urllib3"""
+        pools = self._adapter.poolmanager.pools
+        counts = {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{key.key_host.lower()}:{key.key_port or DEFAULT_PORTS.get(key.key_scheme)}"
+            counts[host] = counts.get(host, 0) + pool.num_connections
+        return counts
+
+    def stats(self):
+        with self._lock:
+            connections = dict(self._retired_connections)
+            for host, count in self._connections_by_host().items():
+                connections[host] = connections.get(host, 0) + count
+            hosts = {}
+            for host, stats in self._host_stats.items():
+                hosts[host] = dict(stats, connections=connections.get(host, 0))
+        total_requests = sum(h['requests'] for h in hosts.values())
+        total_connections = sum(h['connections'] for h in hosts.values())
+        return {
+            'requests': total_requests,
+            'connections': total_connections,
+            'reused': max(total_requests - total_connections, 0),
+            'wait_time': sum(h['wait_time'] for h in hosts.values()),
+            'hosts': hosts,
+            'limits': self.limits(),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def pool_stats_delta(before, after):
+    """Разница двух снимков ``HostSessionPool.stats()``"""
+    hosts = {}
+    for host, stats in after['hosts'].items():
+        prev = before['hosts'].get(host, {})
+        delta = {key: value - prev.get(key, 0) for key, value in stats.items()}
+        if delta['requests']:
+            hosts[host] = delta
+    requests_count = sum(h['requests'] for h in hosts.values())
+    connections = sum(h['connections'] for h in hosts.values())
+    return {
+        'requests': requests_count,
+        'connections': connections,
+        'reused': max(requests_count - connections, 0),
+        'wait_time': sum(h['wait_time'] for h in hosts.values()),
+        'throttled': sum(h.get('throttled', 0) for h in hosts.values()),
+        'circuit_opens': sum(h.get('circuit_opens', 0) for h in hosts.values()),
+        'hosts': hosts,
+        # Лимиты — не счётчики: берутся из последнего снимка
+        'limits': {host: limit for host, limit in after.get('limits', {}).items() if host in hosts},
+    }
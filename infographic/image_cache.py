@@ -0,0 +1,209 @@
+"""Дисковый кэш исходных изображений.
+
+Хранит сырые байты ответов (а не декодированные PIL-объекты) в
+content-addressed хранилище: файл называется по sha256 содержимого,
+а индекс URL -> хэш ведётся в SQLite. Поддерживаются ревалидация по
+ETag/Last-Modified и вытеснение LRU по бюджету в байтах.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    blob_hash: str
+    size: int
+    content_type: str
+    etag: str
+    last_modified: str
+    fetched_at: float
+
+
+class ImageCache:
+    """Потокобезопасный дисковый кэш, общий для сессий и пакетов"""
+
+    def __init__(self, cache_dir=".cache/images", max_bytes=1024 * 1024 * 1024,
+                 revalidate_after=3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0, 'misses': 0, 'revalidated': 0,
+            'bytes_saved': 0, 'bytes_downloaded': 0, 'evictions': 0
+        }
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"),
+                                   timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                blob_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_access ON entries(last_access)")
+        self._db.commit()
+
+    # ---------- низкоуровневые операции ----------
+    def _blob_path(self, blob_hash):
+        return os.path.join(self.cache_dir, "objects", blob_hash[:2], blob_hash)
+
+    def lookup(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, blob_hash, size, content_type, etag, last_modified, fetched_at "
+                "FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row)
+        if not os.path.exists(self._blob_path(entry.blob_hash)):
+            self._delete(url)
+            return None
+        return entry
+
+    def read(self, entry):
+        with open(self._blob_path(entry.blob_hash), "rb") as f:
+            return f.read()
+
+    def store(self, url, data, headers):
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, blob_hash, len(data), headers.get('content-type', ''),
+                 headers.get('etag', ''), headers.get('last-modified', ''), now, now)
+            )
+            self._db.commit()
+        self._evict()
+        return blob_hash
+
+    def touch(self, url, refreshed=False):
+        now = time.time()
+        with self._lock:
+            if refreshed:
+                self._db.execute("UPDATE entries SET last_access = ?, fetched_at = ? "
+                                 "WHERE url = ?", (now, now, url))
+            else:
+                self._db.execute("UPDATE entries SET last_access = ? WHERE url = ?",
+                                 (now, url))
+            self._db.commit()
+
+    def _delete(self, url):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._db.commit()
+
+    def total_bytes(self):
+        """Размер уникальных объектов (одинаковые байты хранятся один раз)"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM "
+                "(SELECT blob_hash, MAX(size) AS size FROM entries GROUP BY blob_hash)"
+            ).fetchone()
+        return row[0]
+
+    def _evict(self):
+        """Вытеснение наименее давно использованных записей сверх бюджета"""
+        if self.max_bytes is None:
+            return
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, blob_hash, size FROM entries ORDER BY last_access ASC"
+            ).fetchall()
+            removed_blobs = set()
+            for url, blob_hash, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._counters['evictions'] += 1
+                still_used = self._db.execute(
+                    "SELECT 1 FROM entries WHERE blob_hash = ? LIMIT 1", (blob_hash,)
+                ).fetchone()
+                if not still_used:
+                    removed_blobs.add(blob_hash)
+                    total -= size
+            self._db.commit()
+        for blob_hash in removed_blobs:
+            try:
+                os.remove(self._blob_path(blob_hash))
+            except FileNotFoundError:
+                pass
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._counters[key] += value
+
+    # ---------- загрузка с ревалидацией ----------
+    def fetch(self, url, get, timeout=15, headers=None):
+        """Возвращает (bytes, content_type) из кэша или через HTTP.
+
+        ``get`` — функция с сигнатурой ``requests.get``. Свежие записи
+        отдаются без сети, устаревшие ревалидируются условным запросом.
+        """
+        headers = dict(headers or {})
+        entry = self.lookup(url)
+        if entry is not None and time.time() - entry.fetched_at < self.revalidate_after:
+            data = self.read(entry)
+            self.touch(url)
+            self._count(hits=1, bytes_saved=entry.size)
+            return data, entry.content_type
+
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        response = get(url, timeout=timeout, headers=headers)
+        if entry is not None and response.status_code == 304:
+            data = self.read(entry)
+            self.touch(url, refreshed=True)
+            self._count(revalidated=1, bytes_saved=entry.size)
+            return data, entry.content_type
+
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '')
+        if 'image' not in content_type:
+            raise ValueError("URL не ведет к изображению")
+        data = response.content
+        self.store(url, data, {k.lower(): v for k, v in response.headers.items()})
+        self._count(misses=1, bytes_downloaded=len(data))
+        return data, content_type
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._counters)
+        snapshot['stored_bytes'] = self.total_bytes()
+        return snapshot
+
+
+def stats_delta(before, after):
+    """Разница счётчиков между двумя снимками ``ImageCache.stats()``"""
+    delta = {key: after[key] - before.get(key, 0) for key in after}
+    delta['stored_bytes'] = after['stored_bytes']
+    return delta
@@ -0,0 +1,137 @@
+"""Инкрементальная перегенерация: пропуск строк с неизменившимися входами.
+
+Отпечаток строки — sha256 от значений сопоставленных столбцов, URL
+изображения вместе с хэшем его содержимого из дискового кэша (устаревшие
+записи перед этим параллельно ревалидируются), а также шаблона и настроек экспорта. Если такой отпечаток уже встречался в одном
+из прошлых пакетов и файл того пакета цел, результат берётся оттуда без
+загрузки и рендеринга.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DELTA_UNCHANGED = "unchanged"
+DELTA_CHANGED = "changed"
+DELTA_NEW = "new"
+
+
+def row_fingerprint(text_data, image_url, image_validator, settings):
+    payload = json.dumps({
+        'text': text_data,
+        'image_url': image_url,
+        'image': image_validator,
+        'settings': settings,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def image_validator(cache, url, revalidated=None, check_age=True):
+    """Версия изображения по данным дискового кэша, без сетевого запроса.
+
+    Запись старше ``cache.revalidate_after`` могла устареть: картинку могли
+    заменить по тому же URL. Её версия берётся из ``revalidated`` — итога
+    ``revalidate_stale`` этого запуска, а без него неизвестна (пустая
+    строка, строка считается изменившейся). ``check_age=False`` — запись
+    только что загружена и заведомо актуальна.
+    """
+    entry = cache.lookup(url) if url else None
+    if entry is None:
+        return ""
+    if check_age and time.time() - entry.fetched_at >= cache.revalidate_after:
+        return (revalidated or {}).get(url, "")
+    return entry.blob_hash or entry.etag or entry.last_modified
+
+
+def revalidate_stale(cache, urls, get, timeout=15, concurrency=16):
+    """Параллельно ревалидирует устаревшие записи кэша для ``urls`` условными
+    запросами (ETag/Last-Modified) через ``get``; изменившееся изображение
+    при этом загружается заново. Возвращает {url: версия} проверенных
+    записей; URL, которые проверить не удалось, в результат не входят.
+    """
+    now = time.time()
+    stale = []
+    for url in dict.fromkeys(urls):
+        entry = cache.lookup(url) if url else None
+        if entry is not None and now - entry.fetched_at >= cache.revalidate_after:
+            stale.append(url)
+
+    def revalidate(url):
+        try:
+            cache.fetch(url, get, timeout=timeout)
+        except Exception:
+            return url, ""
+        entry = cache.lookup(url)
+        return url, entry.blob_hash if entry is not None else ""
+
+    if not stale:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(stale))),
+                            thread_name_prefix="revalidate") as executor:
+        return {url: version for url, version in executor.map(revalidate, stale) if version}
+
+
+class FingerprintIndex:
+    """Отпечатки строк и пути к готовым результатам прошлых пакетов"""
+
+    def __init__(self, path=".cache/incremental.sqlite3"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outputs (
+                fingerprint TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                batch_id TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS rows (
+                row_key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                batch_id TEXT NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def lookup(self, fingerprint):
+        """Путь к готовому файлу с тем же отпечатком или None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, batch_id FROM outputs WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return {'path': row[0], 'batch_id': row[1]}
+
+    def classify(self, row_key, fingerprint):
+        """Статус строки относительно прошлого запуска"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fingerprint FROM rows WHERE row_key = ?", (row_key,)
+            ).fetchone()
+        if row is None:
+            return DELTA_NEW
+        return DELTA_UNCHANGED if row[0] == fingerprint else DELTA_CHANGED
+
+    def remember(self, row_key, fingerprint, path, batch_id):
+        with self._lock:
+            if path:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?)",
+                    (fingerprint, path, batch_id, time.time())
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+                (row_key, fingerprint, batch_id)
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,164 @@
+"""Загрузка каталогов из Excel, CSV и Parquet.
+
+Читаются только нужные столбцы: Excel (.xlsx) — потоково через openpyxl
+в режиме read_only кусками по ``chunk_size`` строк, CSV — ``read_csv``
+кусками, Parquet — только выбранные столбцы файла. Результат кэшируется по
+sha256 содержимого файла, поэтому перезапуск скрипта Streamlit не разбирает
+файл повторно.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+
+import pandas as pd
+
+SUPPORTED_EXTENSIONS = ('xlsx', 'xls', 'csv', 'parquet')
+CSV_ENCODINGS = ('utf-8-sig', 'cp1251')
+CACHE_ENTRIES = 8
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+@dataclass
+class LoadedTable:
+    df: pd.DataFrame
+    load_time: float
+    memory_bytes: int
+    file_bytes: int
+    cached: bool
+
+
+def file_kind(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Неподдерживаемый формат файла: {filename} "
+                         f"(поддерживаются: {', '.join(SUPPORTED_EXTENSIONS)})")
+    return extension
+
+
+def file_digest(source):
+    """sha256 байтов или файла по пути"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _open(source):
+    return BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def _column_filter(columns):
+    return None if columns is None else (lambda name: name in columns)
+
+
+def _read_xlsx(source, columns, max_rows, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(_open(source), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        names = [str(name) if name is not None else f"Unnamed: {i}"
+                 for i, name in enumerate(header)]
+        keep = [i for i, name in enumerate(names) if columns is None or name in columns]
+        kept_names = [names[i] for i in keep]
+        chunks, buffer = [], []
+        for count, row in enumerate(rows):
+            if max_rows is not None and count >= max_rows:
+                break
+            buffer.append([row[i] if i < len(row) else None for i in keep])
+            if len(buffer) >= chunk_size:
+                chunks.append(pd.DataFrame(buffer, columns=kept_names))
+                buffer = []
+        if buffer or not chunks:
+            chunks.append(pd.DataFrame(buffer, columns=kept_names))
+    finally:
+        workbook.close()
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    # Как read_excel: пустые строки в конце листа (оформление) отбрасываются
+    filled = df.notna().any(axis=1)
+    return df.iloc[:filled[::-1].idxmax() + 1] if filled.any() else df.iloc[:0]
+
+
+def _read_csv(source, columns, max_rows, chunk_size):
+    for encoding in CSV_ENCODINGS:
+        try:
+            if max_rows == 0:
+                return pd.read_csv(_open(source), usecols=_column_filter(columns), nrows=0,
+                                   encoding=encoding)
+            reader = pd.read_csv(_open(source), usecols=_column_filter(columns), nrows=max_rows,
+                                 chunksize=chunk_size, encoding=encoding)
+            return pd.concat(reader, ignore_index=True)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Не удалось определить кодировку CSV (ожидается UTF-8 или Windows-1251)")
+
+
+def _read_parquet(source, columns, max_rows):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Для чтения Parquet установите pyarrow")
+    parquet_file = pq.ParquetFile(_open(source))
+    if columns is not None:
+        columns = [name for name in parquet_file.schema_arrow.names if name in columns]
+    if max_rows is None:
+        return parquet_file.read(columns=columns).to_pandas()
+    batch = next(parquet_file.iter_batches(batch_size=max(max_rows, 1), columns=columns), None)
+    if batch is None or max_rows == 0:
+        schema = parquet_file.schema_arrow
+        if columns is not None:
+            schema = pa.schema([schema.field(name) for name in columns])
+        return schema.empty_table().to_pandas()
+    return batch.to_pandas().iloc[:max_rows]
+
+
+def read_table(source, filename, columns=None, max_rows=None, chunk_size=50_000):
+    """DataFrame из файла без кэша; ``columns=None`` — все столбцы"""
+    kind = file_kind(filename)
+    columns = None if columns is None else set(columns)
+    if kind == 'xlsx':
+        return _read_xlsx(source, columns, max_rows, chunk_size)
+    if kind == 'csv':
+        return _read_csv(source, columns, max_rows, chunk_size)
+    if kind == 'parquet':
+        return _read_parquet(source, columns, max_rows)
+    return pd.read_excel(_open(source), usecols=_column_filter(columns), nrows=max_rows)
+
+
+def load_table(source, filename, columns=None, max_rows=None, chunk_size=50_000):
+    """``LoadedTable`` из байтов или пути; повторные вызовы берутся из кэша"""
+    started = time.perf_counter()
+    file_bytes = len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+    key = (file_digest(source), file_kind(filename),
+           None if columns is None else tuple(sorted(columns)), max_rows)
+    with _lock:
+        df = _cache.get(key)
+        if df is not None:
+            _cache.move_to_end(key)
+    cached = df is not None
+    if df is None:
+        df = read_table(source, filename, columns=columns, max_rows=max_rows,
+                        chunk_size=chunk_size)
+        with _lock:
+            _cache[key] = df
+            while len(_cache) > CACHE_ENTRIES:
+                _cache.popitem(last=False)
+    return LoadedTable(
+        df=df,
+        load_time=time.perf_counter() - started,
+        memory_bytes=int(df.memory_usage(deep=True).sum()),
+        file_bytes=file_bytes,
+        cached=cached
+    )
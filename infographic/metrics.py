@@ -0,0 +1,185 @@
+"""Поэтапные таймеры пакетной обработки и выборочное профилирование.
+
+``StageMetrics`` собирает длительности стадий (загрузка, декодирование,
+ресайз, текст, кодирование, запись на диск, ZIP) и считает по ним
+p50/p95/p99, а для загрузки — ещё и по каждому хосту. Итоги сохраняются в
+``stage_timings.json`` и ``stage_timings.csv`` в папке пакета.
+"""
+import cProfile
+import csv
+import io
+import json
+import math
+import os
+import pstats
+import threading
+import tracemalloc
+from array import array
+
+STAGES = ('download', 'decode', 'resize', 'draw', 'encode', 'write', 'zip')
+STAGE_LABELS = {
+    'download': "Загрузка",
+    'decode': "Декодирование",
+    'resize': "Ресайз",
+    'draw': "Текст",
+    'encode': "Кодирование",
+    'write': "Запись на диск",
+    'zip': "ZIP",
+}
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+TIMINGS_JSON = "stage_timings.json"
+TIMINGS_CSV = "stage_timings.csv"
+PROFILES_DIR = "profiles"
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по отсортированным значениям (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(values):
+    values = sorted(values)
+    total = sum(values)
+    return {
+        'count': len(values),
+        'total': total,
+        'mean': total / len(values) if values else 0.0,
+        'p50': percentile(values, 0.50),
+        'p95': percentile(values, 0.95),
+        'p99': percentile(values, 0.99),
+        'max': values[-1] if values else 0.0,
+    }
+
+
+class StageMetrics:
+    """Потокобезопасный сборщик длительностей стадий (в секундах)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._hosts = {}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._stages.setdefault(stage, array('d')).append(seconds)
+
+    def add_many(self, timings):
+        with self._lock:
+            for stage, seconds in timings.items():
+                self._stages.setdefault(stage, array('d')).append(seconds)
+
+    def add_download(self, host, seconds, size=0, ok=True):
+        with self._lock:
+            self._stages.setdefault('download', array('d')).append(seconds)
+            host_stats = self._hosts.setdefault(host, {'times': array('d'), 'bytes': 0, 'errors': 0})
+            host_stats['times'].append(seconds)
+            host_stats['bytes'] += size
+            host_stats['errors'] += 0 if ok else 1
+
+    def stage_summary(self):
+        with self._lock:
+            stages = {stage: list(values) for stage, values in self._stages.items()}
+        ordered = [stage for stage in STAGES if stage in stages] + \
+                  [stage for stage in stages if stage not in STAGES]
+        return {stage: summarize(stages[stage]) for stage in ordered}
+
+    def host_summary(self):
+        with self._lock:
+            hosts = {host: dict(stats, times=list(stats['times']))
+                     for host, stats in self._hosts.items()}
+        return {
+            host: dict(summarize(stats['times']), bytes=stats['bytes'], errors=stats['errors'])
+            for host, stats in sorted(hosts.items())
+        }
+
+    def export(self, batch_dir, extra=None):
+        """stage_timings.json (стадии, хосты, ``extra``) и stage_timings.csv"""
+        stages = self.stage_summary()
+        hosts = self.host_summary()
+        os.makedirs(batch_dir, exist_ok=True)
+        with open(os.path.join(batch_dir, TIMINGS_JSON), "w", encoding="utf-8") as f:
+            json.dump({'stages': stages, 'hosts': hosts, **(extra or {})},
+                      f, ensure_ascii=False, indent=2)
+        fields = ['scope', 'name', 'count', 'total', 'mean', 'p50', 'p95', 'p99', 'max',
+                  'bytes', 'errors']
+        with open(os.path.join(batch_dir, TIMINGS_CSV), "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, restval="")
+            writer.writeheader()
+            for stage, summary in stages.items():
+                writer.writerow({'scope': 'stage', 'name': stage, **summary})
+            for host, summary in hosts.items():
+                writer.writerow({'scope': 'host', 'name': host, **summary})
+        return stages, hosts
+
+
+def should_profile(index, every):
+    """Выборка строк для профилирования: каждая ``every``-я"""
+    return every > 0 and index % every == 0
+
+
+class RowProfiler:
+    """Профиль одной строки: cProfile (текущий поток) или разница tracemalloc"""
+
+    def __init__(self, mode):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.mode = mode
+        self.limit = 25
+        self._profile = None
+        self._snapshot = None
+        self._report = ""
+
+    def __enter__(self):
+        global _tracing_users
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            # tracemalloc общий на процесс: в пуле потоков соседние строки
+            # попадают в ту же разницу снимков, цифры приблизительные.
+            # Трассировка включена, только пока идёт хотя бы одна выборка
+            with _tracing_lock:
+                if _tracing_users == 0:
+                    tracemalloc.start()
+                _tracing_users += 1
+            tracemalloc.reset_peak()
+            self._snapshot = tracemalloc.take_snapshot()
+        return self
+
+    def __exit__(self, *exc):
+        global _tracing_users
+        if self._profile is not None:
+            self._profile.disable()
+            stream = io.StringIO()
+            pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(self.limit)
+            self._report = stream.getvalue()
+            return False
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        lines = [f"traced: {current / 1024 / 1024:.1f} MiB, peak: {peak / 1024 / 1024:.1f} MiB"]
+        lines += [str(stat) for stat in snapshot.compare_to(self._snapshot, 'lineno')[:self.limit]]
+        self._report = "\n".join(lines) + "\n"
+        with _tracing_lock:
+            _tracing_users -= 1
+            if _tracing_users == 0:
+                tracemalloc.stop()
+        return False
+
+    def report(self):
+        """Текстовый отчёт для сохранения в папку profiles/"""
+        return self._report
+
+
+def write_profile(batch_dir, index, mode, report):
+    directory = os.path.join(batch_dir, PROFILES_DIR)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"row_{index:06d}_{mode}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(report)
+    return path
@@ -0,0 +1,198 @@
+"""Двухстадийный конвейер пакетной обработки.
+
+Стадия загрузки работает в отдельном потоке с собственным asyncio-циклом
+и держит в полёте до ``download_concurrency`` запросов. Загруженные байты
+попадают в ограниченную очередь, которую разбирает отдельный пул потоков
+рендеринга. Если рендеринг не успевает, очередь заполняется и загрузка
+притормаживает — память не растёт.
+
+Задания читаются из итератора лениво: одновременно в работе находится не
+больше ``max_in_flight`` единиц окна, и следующее задание допускается
+только после того, как потребитель забрал готовый результат предыдущего.
+Задание занимает ``job_weight(job)`` единиц (по умолчанию одну) — так окно
+считает строки, а не группы строк.
+"""
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_STOP = object()
+
+
+class DownloadRenderPipeline:
+    """Конвейер «асинхронная загрузка -> очередь -> пул рендеринга»
+
+    ``fetch(job)`` — блокирующая загрузка, возвращает байты изображения.
+    ``render(job, data)`` — рендеринг и сохранение, возвращает словарь
+    результата. ``on_error(job, exc)`` формирует результат для задачи,
+    которую не удалось загрузить. ``job_weight(job)`` — сколько единиц окна
+    занимает задание.
+    """
+
+    def __init__(self, fetch, render, on_error, download_concurrency=64,
+                 render_workers=4, queue_size=None, max_in_flight=None, job_weight=None):
+        self.fetch = fetch
+        self.render = render
+        self.on_error = on_error
+        self.job_weight = job_weight
+        self.download_concurrency = download_concurrency
+        self.render_workers = render_workers
+        self.queue_size = queue_size or render_workers * 2
+        self.max_in_flight = max(max_in_flight or download_concurrency + self.queue_size, 1)
+
+    def _weight(self, job):
+        """Единиц окна на задание; не больше всего окна, иначе оно не войдёт"""
+        if self.job_weight is None:
+            return 1
+        return max(1, min(self.job_weight(job), self.max_in_flight))
+
+    def _acquire_window(self, window, job, stop):
+        for _ in range(self._weight(job) - 1):
+            if stop.is_set():
+                return
+            window.acquire()
+
+    async def _download_one(self, loop, io_executor, slots, job, render_queue, results, stop):
+        try:
+            try:
+                data = await loop.run_in_executor(io_executor, self.fetch, job)
+            except Exception as e:
+                results.put((self.on_error(job, e), self._weight(job)))
+                return
+            # Блокирующий put выполняется вне цикла: пока очередь полна,
+            # слот загрузки остаётся занятым — это и есть обратное давление
+            await loop.run_in_executor(io_executor, _put, render_queue, (job, data), stop)
+        finally:
+            slots.release()
+
+    async def _download_stage(self, jobs, render_queue, results, window, stop, state):
+        loop = asyncio.get_running_loop()
+        state['loop'], state['task'] = loop, asyncio.current_task()
+        slots = asyncio.Semaphore(self.download_concurrency)
+        # +1 поток, чтобы put в очередь не конкурировал со слотами загрузки
+        io_executor = ThreadPoolExecutor(max_workers=self.download_concurrency + 1,
+                                         thread_name_prefix="download")
+        try:
+            tasks = set()
+            while True:
+                # Окно заданий освобождает потребитель результатов в run();
+                # следующая строка читается из итератора только после этого
+                await loop.run_in_executor(None, window.acquire)
+                job = _STOP if stop.is_set() else next(jobs, _STOP)
+                if job is _STOP:
+                    break
+                # Первая единица окна уже взята — остальные по весу задания
+                await loop.run_in_executor(None, self._acquire_window, window, job, stop)
+                if stop.is_set():
+                    break
+                await slots.acquire()
+                task = asyncio.ensure_future(self._download_one(
+                    loop, io_executor, slots, job, render_queue, results, stop))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            # После остановки не ждём зависшие загрузки: их результат не нужен
+            io_executor.shutdown(wait=not stop.is_set(), cancel_futures=stop.is_set())
+
+    def _download_thread(self, jobs, render_queue, results, window, stop, state):
+        try:
+            asyncio.run(self._download_stage(jobs, render_queue, results, window, stop, state))
+        except asyncio.CancelledError:
+            pass
+        except BaseException as e:
+            results.put(e)
+        finally:
+            for _ in range(self.render_workers):
+                _put(render_queue, _STOP, stop)
+
+    def _render_worker(self, render_queue, results, stop):
+        while True:
+            item = render_queue.get()
+            if item is _STOP:
+                results.put(_STOP)
+                return
+            if stop.is_set():
+                # Потребитель ушёл — оставшиеся задания только выбираются из очереди
+                continue
+            job, data = item
+            weight = self._weight(job)
+            try:
+                result = self.render(job, data)
+            except Exception as e:
+                result = self.on_error(job, e)
+            # Байты изображения не должны жить до следующего задания
+            del item, job, data
+            results.put((result, weight))
+            del result
+
+    def run(self, jobs):
+        """Итерирует результаты по мере готовности (порядок не гарантирован).
+
+        Если потребитель перестал итерировать (исключение, отмена, закрытие
+        генератора), потоки конвейера останавливаются и присоединяются.
+        """
+        render_queue = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue()
+        window = threading.Semaphore(self.max_in_flight)
+        stop = threading.Event()
+        state = {}
+        workers = [threading.Thread(target=self._render_worker,
+                                    args=(render_queue, results, stop),
+                                    name=f"render-{i}", daemon=True)
+                   for i in range(self.render_workers)]
+        threads = [threading.Thread(target=self._download_thread,
+                                    args=(iter(jobs), render_queue, results, window, stop, state),
+                                    name="download-loop", daemon=True)] + workers
+        for thread in threads:
+            thread.start()
+
+        try:
+            running = self.render_workers
+            while running:
+                item = results.get()
+                if item is _STOP:
+                    running -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    result, weight = item
+                    del item
+                    yield result
+                    del result
+                    window.release(weight)
+        finally:
+            self._stop(threads, workers, render_queue, window, stop, state)
+
+    def _stop(self, threads, workers, render_queue, window, stop, state):
+        stop.set()
+        # Загрузка может ждать окно или слот — будим её и отменяем задачи
+        window.release(self.max_in_flight)
+        loop = state.get('loop')
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(state['task'].cancel)
+            except RuntimeError:
+                pass  # цикл уже завершился
+        for _ in workers:
+            while any(worker.is_alive() for worker in workers):
+                try:
+                    render_queue.put(_STOP, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+        for thread in threads:
+            thread.join()
+
+
+def _put(render_queue, item, stop):
+    """put в ограниченную очередь, который прекращается после остановки конвейера"""
+    while not stop.is_set():
+        try:
+            render_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
@@ -0,0 +1,208 @@
+"""Предварительная проверка ссылок на изображения до запуска пакета.
+
+Каждый уникальный URL проверяется одним лёгким запросом с
+``Range: bytes=0-65535``: код ответа, Content-Type, полный размер (из
+Content-Range или Content-Length) и размеры изображения из первых байтов
+файла. Свежие записи дискового кэша проверяются без сети. Проверка идёт
+параллельно через общий пул соединений, поэтому действуют лимиты на хост
+и выключатель. Битые строки либо только отмечаются, либо исключаются из
+пакета и сразу попадают в журнал ошибок.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image
+
+from .adaptive import RETRY_STATUSES, HostCircuitOpen, is_retryable_error
+from .decode import MAX_IMAGE_PIXELS, _TRANSPOSED_ORIENTATIONS
+from .dedup import normalize_url
+from .download import get_http_pool, get_image_cache
+
+PROBE_BYTES = 64 * 1024
+PREFLIGHT_MODES = {
+    'flag': "Отметить битые строки в отчёте",
+    'exclude': "Исключить битые строки из пакета",
+}
+PREFLIGHT_REPORT = "preflight_report.csv"
+STATUS_OK = 'ok'
+STATUS_WARNING = 'warning'
+STATUS_ERROR = 'error'
+
+
+def _webp_size(data):
+    """Размеры WebP из заголовка RIFF: Pillow не открывает обрезанный WebP"""
+    if len(data) < 30 or data[:4] != b'RIFF' or data[8:12] != b'WEBP':
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8X':
+        return (1 + int.from_bytes(data[24:27], 'little'),
+                1 + int.from_bytes(data[27:30], 'little'))
+    if chunk == b'VP8 ' and data[23:26] == b'\x9d\x01\x2a':
+        return (int.from_bytes(data[26:28], 'little') & 0x3fff,
+                int.from_bytes(data[28:30], 'little') & 0x3fff)
+    if chunk == b'VP8L' and data[20] == 0x2f:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    return None
+
+
+def header_size(data):
+    """(ширина, высота) с учётом EXIF-ориентации по первым байтам файла или None"""
+    try:
+        img = Image.open(BytesIO(data))
+        width, height = img.size
+        try:
+            orientation = img.getexif().get(0x0112, 1)
+        except Exception:
+            orientation = 1
+    except Exception:
+        return _webp_size(data)
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return width, height
+
+
+def _total_size(response):
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and content_range.rsplit('/', 1)[1].isdigit():
+        return int(content_range.rsplit('/', 1)[1])
+    length = response.headers.get('Content-Length', '')
+    if response.status_code == 200 and length.isdigit():
+        return int(length)
+    return None
+
+
+def probe_url(url, timeout=15):
+    """Результат проверки одного URL: код, тип, размер файла и изображения"""
+    started = time.perf_counter()
+    result = {'http_status': None, 'content_type': '', 'bytes': None,
+              'width': None, 'height': None, 'source': 'network'}
+    cache = get_image_cache()
+    entry = cache.lookup(url)
+    if entry is not None and time.time() - entry.fetched_at < cache.revalidate_after:
+        head = cache.read(entry)[:PROBE_BYTES]
+        result.update(http_status=200, content_type=entry.content_type or '',
+                      bytes=entry.size, source='cache')
+    else:
+        try:
+            response = get_http_pool().get(url, timeout=timeout, stream=True,
+                                           headers={'Range': f"bytes=0-{PROBE_BYTES - 1}"})
+        except Exception as e:
+            result.update(error=f"Не удалось подключиться: {e}",
+                          transient=isinstance(e, HostCircuitOpen) or is_retryable_error(e),
+                          time=time.perf_counter() - started)
+            return result
+        try:
+            result.update(http_status=response.status_code,
+                          content_type=response.headers.get('content-type', ''),
+                          bytes=_total_size(response))
+            # Сервер без поддержки Range отдаёт файл целиком — читаем только начало
+            head = response.raw.read(PROBE_BYTES, decode_content=True) if response.ok else b""
+        finally:
+            response.close()
+    size = header_size(head) if head else None
+    if size:
+        result['width'], result['height'] = size
+    result['time'] = time.perf_counter() - started
+    return result
+
+
+def classify(result, target_size=None, max_pixels=MAX_IMAGE_PIXELS):
+    """(статус, описание проблемы) для результата ``probe_url``.
+
+    Ошибкой считаются только окончательные отказы (404/410 и прочие 4xx,
+    не изображение, слишком большое изображение). 429, 5xx, сбои сети и
+    таймауты — предупреждения: загрузчик повторит такие запросы сам.
+    """
+    if result.get('error'):
+        if result.get('transient'):
+            return STATUS_WARNING, f"{result['error']} (временная ошибка, загрузка повторит)"
+        return STATUS_ERROR, result['error']
+    status = result['http_status']
+    if status in RETRY_STATUSES or status >= 500:
+        return STATUS_WARNING, f"HTTP {status} (временная ошибка, загрузка повторит)"
+    if status >= 400:
+        return STATUS_ERROR, f"HTTP {status}"
+    if 'image' not in result['content_type']:
+        return STATUS_ERROR, "URL не ведет к изображению"
+    if result['width'] is None:
+        return STATUS_WARNING, "Не удалось прочитать размеры изображения по заголовку"
+    if result['width'] * result['height'] > max_pixels:
+        return STATUS_ERROR, (f"Изображение слишком большое: {result['width']}x{result['height']} "
+                              f"(лимит {max_pixels} пикселей)")
+    if target_size and result['width'] < target_size[0] and result['height'] < target_size[1]:
+        return STATUS_WARNING, (f"Низкое разрешение: {result['width']}x{result['height']} "
+                                f"меньше шаблона {target_size[0]}x{target_size[1]}")
+    return STATUS_OK, ""
+
+
+@dataclass
+class PreflightReport:
+    """Результаты проверки по строкам (``index``, ``image_url``, статус и поля проверки)"""
+    rows: list
+    urls_checked: int
+    elapsed: float
+
+    @property
+    def errors(self):
+        return [row for row in self.rows if row['status'] == STATUS_ERROR]
+
+    @property
+    def warnings(self):
+        return [row for row in self.rows if row['status'] == STATUS_WARNING]
+
+    @property
+    def failed(self):
+        """Индекс строки -> описание ошибки"""
+        return {row['index']: row['problem'] for row in self.errors}
+
+
+def run_preflight(rows, target_size=None, concurrency=32, timeout=15, on_progress=None):
+    """Проверяет ``rows`` — пары (индекс строки, URL) — и возвращает ``PreflightReport``.
+
+    Одинаковые после нормализации URL проверяются один раз.
+    ``on_progress(checked, total)`` вызывается после каждого URL.
+    """
+    started = time.perf_counter()
+    rows = list(rows)
+    urls = {}
+    for _, url in rows:
+        urls.setdefault(normalize_url(url), url)
+
+    def check(url):
+        if not url.strip():
+            return {'error': "Пустая ссылка на изображение"}
+        try:
+            return probe_url(url, timeout=timeout)
+        except Exception as e:
+            return {'error': str(e)}
+
+    checked = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(urls) or 1)),
+                            thread_name_prefix="preflight") as executor:
+        for key, result in zip(urls, executor.map(check, urls.values())):
+            checked[key] = result
+            if on_progress is not None:
+                on_progress(len(checked), len(urls))
+
+    report_rows = []
+    for index, url in rows:
+        result = checked[normalize_url(url)]
+        status, problem = classify(result, target_size)
+        report_rows.append({
+            'index': index,
+            'image_url': url,
+            'status': status,
+            'problem': problem,
+            'http_status': result.get('http_status'),
+            'content_type': result.get('content_type', ''),
+            'bytes': result.get('bytes'),
+            'width': result.get('width'),
+            'height': result.get('height'),
+            'source': result.get('source', ''),
+            'check_ms': round(result.get('time', 0.0) * 1000, 1),
+        })
+    return PreflightReport(rows=report_rows, urls_checked=len(urls),
+                           elapsed=time.perf_counter() - started)
@@ -0,0 +1,73 @@
+"""Подготовка строк таблицы к обработке по столбцам, а не по строкам.
+
+Тексты, URL и имена файлов вычисляются сразу для куска таблицы операциями
+над столбцами pandas. Воркеры получают лёгкие кортежи ``PreparedRow``
+вместо копий ``Series`` и не вызывают ``df.iloc``/``pd.notna`` на каждую
+строку. Таблица обрабатывается кусками, поэтому память не растёт с её
+размером.
+"""
+from typing import NamedTuple
+
+from .filenames import fields_hashes, sanitize_filenames
+
+NOT_USED = 'Не использовать'
+OPTIONAL_FIELDS = ('bottom_left', 'bottom_right')
+TEXT_FIELDS = ('top_left', 'top_right', 'bottom_left', 'bottom_right')
+
+
+class PreparedRow(NamedTuple):
+    index: int
+    text_data: dict
+    image_url: str
+    filename: str
+    row_hash: str
+
+
+def _text_column(chunk, column, optional):
+    if (optional and column == NOT_USED) or column not in chunk.columns:
+        return [""] * len(chunk)
+    values = chunk[column]
+    return values.map(str).where(values.notna(), "").tolist()
+
+
+def _str_column(chunk, column):
+    if column not in chunk.columns:
+        return [""] * len(chunk)
+    return chunk[column].map(str).tolist()
+
+
+def prepare_chunk(chunk, column_mapping, start, prefix="", suffix="", extension="jpg"):
+    """PreparedRow для каждой строки куска; ``start`` — позиция первой строки"""
+    texts = {field: _text_column(chunk, column_mapping[field], field in OPTIONAL_FIELDS)
+             for field in TEXT_FIELDS}
+    image_urls = _str_column(chunk, column_mapping['image_url'])
+    labels = chunk.index.tolist()
+    if 'Название' in chunk.columns:
+        base_names = chunk['Название'].map(str).tolist()
+    else:
+        base_names = [f'product_{label}' for label in labels]
+    base_names = sanitize_filenames(base_names)
+    hashes = fields_hashes([texts[field] for field in TEXT_FIELDS] + [image_urls])
+
+    prepared = []
+    for offset, label in enumerate(labels):
+        filename = (f"{prefix}{base_names[offset]}{suffix}"
+                    f"_{hashes[offset]}_{label:06d}.{extension}")
+        prepared.append(PreparedRow(
+            index=start + offset,
+            text_data={field: texts[field][offset] for field in TEXT_FIELDS},
+            image_url=image_urls[offset],
+            filename=filename,
+            row_hash=hashes[offset]
+        ))
+    return prepared
+
+
+def iter_prepared_rows(df, column_mapping, start=0, stop=None, prefix="", suffix="",
+                       extension="jpg", chunk_size=1024):
+    """Лениво отдаёт PreparedRow для строк ``df.iloc[start:stop]``"""
+    stop = len(df) if stop is None else min(stop, len(df))
+    for chunk_start in range(start, stop, chunk_size):
+        chunk = df.iloc[chunk_start:min(chunk_start + chunk_size, stop)]
+        yield from prepare_chunk(chunk, column_mapping, chunk_start,
+                                 prefix=prefix, suffix=suffix, extension=extension)
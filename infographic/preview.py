@@ -0,0 +1,134 @@
+"""Кэш предпросмотра и уменьшенный режим рендеринга.
+
+Streamlit перезапускает скрипт при любом изменении виджета, поэтому
+готовые превью хранятся в ``PreviewCache`` по ключу (строка, версия
+изображения, шаблон, соответствие столбцов, водяной знак, масштаб) и
+показываются повторно без загрузки и рендеринга. Исходник декодируется один раз под самый крупный из
+выбранных шаблонов и переиспользуется для сравнения шаблонов рядом.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from .config import Config
+from .render import create_infographic
+
+# Масштаб быстрого предпросмотра относительно размера шаблона
+PREVIEW_SCALE = 0.4
+
+
+def scaled_template(template_config, scale):
+    """Конфигурация шаблона для холста, уменьшенного в ``scale`` раз"""
+    if scale == 1:
+        return template_config
+    width, height = template_config['size']
+    return dict(
+        template_config,
+        size=(round(width * scale), round(height * scale)),
+        font_sizes={name: max(1, round(size * scale))
+                    for name, size in template_config['font_sizes'].items()},
+        scale=scale
+    )
+
+
+class PreviewCache:
+    """LRU готовых превью и отдельный LRU декодированных исходников.
+
+    Ключи включают версию изображения (sha256 содержимого из дискового
+    кэша, см. ``image_version``): если картинку заменили по тому же URL,
+    превью перерисовывается из нового исходника. У исходников свой бюджет,
+    чтобы крупные декодированные изображения не вытесняли готовые превью.
+    """
+
+    def __init__(self, max_entries=32, max_sources=4):
+        self.max_entries = max_entries
+        self.max_sources = max_sources
+        self._lock = threading.Lock()
+        self._renders = OrderedDict()
+        self._sources = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'decodes': 0, 'render_time': 0.0}
+
+    @staticmethod
+    def key(row, template_name, column_mapping, watermark_text, scale, version=""):
+        # row_hash зависит только от сопоставленных полей и URL изображения
+        return ('render', row.index, row.row_hash, row.image_url, version, template_name,
+                tuple(sorted(column_mapping.items())), watermark_text, scale)
+
+    def _get(self, entries, key):
+        with self._lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            return value
+
+    def _put(self, entries, key, value, limit):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > limit:
+                entries.popitem(last=False)
+
+    def cached(self, row, template_names, column_mapping, watermark_text, scale, version=""):
+        """Готовые превью для всех шаблонов или None, если хоть одного нет"""
+        images = {}
+        for name in template_names:
+            image = self._get(self._renders, self.key(row, name, column_mapping,
+                                                      watermark_text, scale, version))
+            if image is None:
+                return None
+            images[name] = image
+        with self._lock:
+            self._stats['hits'] += len(images)
+        return images
+
+    def render(self, row, template_names, column_mapping, watermark_text, scale, fetch,
+               version=""):
+        """Превью для шаблонов ``template_names``.
+
+        ``fetch(url, target_size)`` возвращает ``DecodedImage``; вызывается
+        не больше одного раза, и только если чего-то нет в кэше. ``version`` —
+        версия изображения по ``row.image_url``.
+        """
+        configs = {name: scaled_template(Config.TEMPLATES[name], scale)
+                   for name in template_names}
+        images = {}
+        decoded = None
+        for name, template_config in configs.items():
+            key = self.key(row, name, column_mapping, watermark_text, scale, version)
+            image = self._get(self._renders, key)
+            if image is not None:
+                with self._lock:
+                    self._stats['hits'] += 1
+                images[name] = image
+                continue
+            if decoded is None:
+                decoded = self._source(row.image_url, version, configs, fetch)
+            started = time.perf_counter()
+            image = create_infographic(decoded.image, row.text_data, template_config,
+                                       add_watermark=bool(watermark_text),
+                                       watermark_text=watermark_text)
+            with self._lock:
+                self._stats['misses'] += 1
+                self._stats['render_time'] += time.perf_counter() - started
+            self._put(self._renders, key, image, self.max_entries)
+            images[name] = image
+        return images, decoded
+
+    def _source(self, image_url, version, configs, fetch):
+        # Один исходник на все шаблоны: не меньше самого крупного холста
+        target_size = (max(cfg['size'][0] for cfg in configs.values()),
+                       max(cfg['size'][1] for cfg in configs.values()))
+        key = ('source', image_url, version, target_size)
+        decoded = self._get(self._sources, key)
+        if decoded is None:
+            decoded = fetch(image_url, target_size)
+            if decoded is None:
+                raise ValueError("Не удалось загрузить изображение")
+            with self._lock:
+                self._stats['decodes'] += 1
+            self._put(self._sources, key, decoded, self.max_sources)
+        return decoded
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._renders), sources=len(self._sources))
@@ -0,0 +1,407 @@
+"""Рендеринг инфографики и бэкенды для его параллельного выполнения.
+
+Модуль не зависит от Streamlit: задания описываются сериализуемыми
+``RenderJob``, поэтому их можно отправлять как в пул потоков, так и в
+пул процессов, где кодирование и ресайз не упираются в GIL.
+
+В режиме ``overlay`` плашки с текстом и водяной знак берутся готовыми
+RGBA-фрагментами из реестра ресурсов и накладываются одним ``paste`` на
+фрагмент; режим ``direct`` рисует всё заново на каждом изображении.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from .config import Config
+from .decode import decode_image
+from .dedup import source_cache
+from .frames import read_frame, write_frame
+from .metrics import RowProfiler
+from .resources import registry
+
+
+def add_text_with_background(draw, position, text, font, text_color, 
+                            bg_color, bg_opacity=180, padding=10):
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    bg_x1, bg_y1 = position[0] - padding, position[1] - padding
+    bg_x2, bg_y2 = position[0] + text_width + padding, position[1] + text_height + padding
+    bg_color_with_alpha = (*bg_color[:3], bg_opacity)
+    draw.rectangle([bg_x1, bg_y1, bg_x2, bg_y2], fill=bg_color_with_alpha)
+    draw.text(position, text, fill=text_color, font=font)
+    return (bg_x1, bg_y1, bg_x2, bg_y2)
+
+
+def paste_tile(img, position, tile):
+    """Накладывает готовый фрагмент ``OverlayTile`` в точку привязки"""
+    x, y = position[0] + tile.offset[0], position[1] + tile.offset[1]
+    img.paste(tile.image, (x, y), tile.image)
+    return (position[0] + tile.box[0], position[1] + tile.box[1],
+            position[0] + tile.box[2], position[1] + tile.box[3]) if tile.box else None
+
+
+RENDER_MODES = {
+    "overlay": "Готовые слои наложения (быстрее)",
+    "direct": "Отрисовка на каждом изображении",
+}
+DEFAULT_ENCODER_PROFILE = "balanced"
+
+# Поле шаблона: (шрифт, цвет фона плашки)
+FIELD_STYLES = {
+    'top_left': ('bold', (0, 0, 0, 180)),
+    'top_right': ('bold', (0, 0, 0, 180)),
+    'bottom_left': ('regular', (0, 0, 0, 150)),
+    'bottom_right': ('regular', (0, 0, 0, 150)),
+}
+
+
+def create_infographic(original_img, text_data, template_config, 
+                      add_watermark=False, watermark_text="", timings=None,
+                      render_mode="overlay"):
+    started = time.perf_counter()
+    if original_img.size == tuple(template_config['size']):
+        # Основа уже нужного размера (в том числе кадр из разделяемой памяти):
+        # холст — единственная копия
+        img = original_img.convert('RGB') if original_img.mode != 'RGB' else original_img.copy()
+    else:
+        img = original_img.resize(template_config['size'], Image.Resampling.LANCZOS)
+    resized = time.perf_counter()
+    
+    resources = registry.template(template_config)
+    font_bold, font_regular = resources.font_bold, resources.font_regular
+    positions = resources.positions
+    width, height = img.size
+    # Уменьшенный предпросмотр: отступы масштабируются вместе с холстом
+    scale = template_config.get('scale', 1)
+    padding = round(10 * scale)
+    watermark_position = (width // 2, height - round(30 * scale))
+    
+    if render_mode == "overlay":
+        fonts = {'bold': font_bold, 'regular': font_regular}
+        for field, (font_name, bg_color) in FIELD_STYLES.items():
+            if text_data.get(field):
+                tile = registry.label(text_data[field], fonts[font_name],
+                                      template_config['colors'][field], bg_color,
+                                      template_config['background_opacity'], padding)
+                paste_tile(img, positions[field], tile)
+        if add_watermark and watermark_text:
+            paste_tile(img, watermark_position,
+                       registry.watermark(img.size, watermark_position, watermark_text))
+        if timings is not None:
+            timings['resize'] = resized - started
+            timings['draw'] = time.perf_counter() - resized
+        return img
+    if render_mode != "direct":
+        raise ValueError(f"Неизвестный режим рендеринга: {render_mode}")
+    
+    draw = ImageDraw.Draw(img, 'RGBA')
+    if text_data.get('top_left'):
+        add_text_with_background(draw, positions["top_left"], text_data['top_left'], 
+                                font_bold, template_config['colors']['top_left'],
+                                (0, 0, 0, 180), template_config['background_opacity'], padding)
+    
+    if text_data.get('top_right'):
+        add_text_with_background(draw, positions["top_right"], text_data['top_right'],
+                                font_bold, template_config['colors']['top_right'],
+                                (0, 0, 0, 180), template_config['background_opacity'], padding)
+    
+    if text_data.get('bottom_left'):
+        add_text_with_background(draw, positions["bottom_left"], text_data['bottom_left'],
+                                font_regular, template_config['colors']['bottom_left'],
+                                (0, 0, 0, 150), template_config['background_opacity'], padding)
+    
+    if text_data.get('bottom_right'):
+        add_text_with_background(draw, positions["bottom_right"], text_data['bottom_right'],
+                                font_regular, template_config['colors']['bottom_right'],
+                                (0, 0, 0, 150), template_config['background_opacity'], padding)
+    
+    if add_watermark and watermark_text:
+        watermark_font = registry.default_font()
+        draw.text(watermark_position, watermark_text, fill=(255, 255, 255, 128),
+                 font=watermark_font, anchor="mm")
+    
+    if timings is not None:
+        timings['resize'] = resized - started
+        timings['draw'] = time.perf_counter() - resized
+    return img
+
+
+@dataclass
+class RenderJob:
+    """Сериализуемое описание одного изображения для рендеринга"""
+    index: int
+    image_bytes: bytes
+    text_data: dict
+    template_name: str
+    export_format: str
+    output_path: str
+    watermark_text: str = ""
+    # write_file=False + return_bytes=True: результат только в памяти (для ZIP)
+    write_file: bool = True
+    return_bytes: bool = False
+    # "cprofile" или "tracemalloc": текстовый профиль строки в result['profile']
+    profile: str = ""
+    render_mode: str = "overlay"
+    # Веер вариантов: ((шаблон, формат, путь, имя в архиве), ...) из одного
+    # декодирования; пусто — только template_name/export_format/output_path
+    variants: tuple = ()
+    # Другие строки с тем же исходником: ((index, text_data, output_path,
+    # variants), ...) — рисуется только их текст; результаты в result['shared']
+    shared_rows: tuple = ()
+    # sha256 байтов исходника: основа берётся из SourceCache, если такие же
+    # байты уже приходили под другим URL
+    content_hash: str = ""
+    # Бэкенд процессов: ((шаблон, FrameRef, заполнить), ...) — основы в
+    # разделяемой памяти; с заполнить=False байты исходника не нужны
+    frames: tuple = ()
+    # Профиль кодировщика и лимит размера файла в байтах (0 — без лимита)
+    encoder_profile: str = DEFAULT_ENCODER_PROFILE
+    max_bytes: int = 0
+
+
+def render_job(job):
+    """Рендерит и сохраняет одно изображение; безопасно для пула процессов"""
+    if job.profile:
+        with RowProfiler(job.profile) as profiler:
+            result = _render_job(job)
+        result['profile'] = profiler.report()
+        return result
+    return _render_job(job)
+
+
+def _encode(img, export_format, params):
+    buffer = BytesIO()
+    img.save(buffer, format=export_format.upper(), **params)
+    return buffer.getvalue()
+
+
+def encode_image(img, export_format, profile=DEFAULT_ENCODER_PROFILE, max_bytes=0, details=None):
+    """Кодирует изображение в памяти по профилю из ``Config.EXPORT_FORMATS``.
+
+    ``max_bytes`` — лимит размера файла: для JPEG и WebP подбирается самое
+    высокое качество между ``min_quality`` и ``quality``, при котором файл
+    помещается в лимит (бинарный поиск). PNG без потерь кодируется как есть.
+    В ``details`` записываются итоговое качество, число попыток и превышение.
+    """
+    export_config = Config.EXPORT_FORMATS[export_format]
+    params = dict(export_config['profiles'][profile])
+    lossy = 'min_quality' in export_config
+    quality = export_config['quality']
+    if lossy:
+        params['quality'] = quality
+    data = _encode(img, export_format, params)
+    attempts = 1
+    if max_bytes and lossy and len(data) > max_bytes:
+        low, high = export_config['min_quality'], quality - 1
+        best = None
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = _encode(img, export_format, dict(params, quality=middle))
+            attempts += 1
+            if len(candidate) <= max_bytes:
+                best, low = (middle, candidate), middle + 1
+            else:
+                high = middle - 1
+                if middle == export_config['min_quality']:
+                    # Даже минимальное качество не помещается — остаётся оно
+                    best = best or (middle, candidate)
+        if best is not None:
+            quality, data = best
+    if details is not None:
+        details.update(quality=quality if lossy else None, attempts=attempts,
+                       over_budget=bool(max_bytes) and len(data) > max_bytes)
+    return data
+
+
+def variants_target_size(template_names):
+    """Размер декодирования, которого хватает на все холсты веера"""
+    sizes = [Config.TEMPLATES[name]['size'] for name in template_names]
+    return max(size[0] for size in sizes), max(size[1] for size in sizes)
+
+
+def _source_bases(job, template_names, target_size, timings):
+    """Отресайзенные под каждый шаблон основы: не больше одного декодирования.
+
+    Возвращает (основы, DecodedImage или None, сэкономлено секунд), где
+    экономия — стоимость основ, взятых из ``source_cache`` по хэшу содержимого.
+    """
+    if job.frames:
+        return _frame_bases(job, target_size, timings)
+    decoded = None
+    bases = {}
+    saved = 0.0
+
+    def build(size):
+        nonlocal decoded
+        cost = 0.0
+        if decoded is None:
+            decoded = decode_image(job.image_bytes, target_size=target_size)
+            timings['decode'] = cost = decoded.decode_time
+        started = time.perf_counter()
+        image = decoded.image.resize(size, Image.Resampling.LANCZOS)
+        elapsed = time.perf_counter() - started
+        timings['resize'] = timings.get('resize', 0.0) + elapsed
+        return image, cost + elapsed
+
+    for name in template_names:
+        size = tuple(Config.TEMPLATES[name]['size'])
+        if job.content_hash:
+            (image, cost), cached = source_cache.get((job.content_hash, target_size, size),
+                                                     lambda size=size: build(size))
+            saved += cost if cached else 0.0
+        else:
+            image, _ = build(size)
+        bases[name] = image
+    return bases, decoded, saved
+
+
+def _frame_bases(job, target_size, timings):
+    """Основы из ячеек разделяемой памяти; пустые ячейки воркер заполняет сам"""
+    decoded = None
+    bases = {}
+    for name, ref, fill in job.frames:
+        if fill:
+            if decoded is None:
+                decoded = decode_image(job.image_bytes, target_size=target_size)
+                timings['decode'] = decoded.decode_time
+            started = time.perf_counter()
+            write_frame(ref, decoded.image.resize(ref.size, Image.Resampling.LANCZOS))
+            timings['resize'] = timings.get('resize', 0.0) + time.perf_counter() - started
+        bases[name] = read_frame(ref)
+    return bases, decoded, 0.0
+
+
+def _render_row(job, index, text_data, output_path, variants, bases):
+    """Текст, кодирование и запись всех вариантов одной строки"""
+    timings = {}
+    outputs = []
+    try:
+        for template_name, export_format, variant_path, arcname in variants:
+            # Стадии вариантов суммируются: таймеры — на строку, а не на файл
+            variant_timings = {}
+            # Основа уже нужного размера: холст — её единственная копия
+            infographic_img = create_infographic(
+                bases[template_name], text_data, Config.TEMPLATES[template_name],
+                add_watermark=bool(job.watermark_text),
+                watermark_text=job.watermark_text,
+                timings=variant_timings,
+                render_mode=job.render_mode
+            )
+            started = time.perf_counter()
+            encode_details = {}
+            data = encode_image(infographic_img, export_format, profile=job.encoder_profile,
+                                max_bytes=job.max_bytes, details=encode_details)
+            variant_timings['encode'] = time.perf_counter() - started
+            if job.write_file:
+                started = time.perf_counter()
+                os.makedirs(os.path.dirname(variant_path) or ".", exist_ok=True)
+                with open(variant_path, "wb") as f:
+                    f.write(data)
+                variant_timings['write'] = time.perf_counter() - started
+            for stage, seconds in variant_timings.items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+            output = {
+                'template': template_name,
+                'export_format': export_format,
+                'arcname': arcname or os.path.basename(variant_path),
+                'path': variant_path if job.write_file else None,
+                'size': len(data),
+                'encode_time': variant_timings['encode'],
+                **encode_details
+            }
+            if job.return_bytes:
+                output['data'] = data
+            outputs.append(output)
+    except Exception as e:
+        return {'index': index, 'status': 'error', 'error': str(e)}
+    primary = outputs[0]
+    result = {
+        'index': index,
+        'status': 'success',
+        'filename': os.path.basename(output_path),
+        'path': primary['path'],
+        'size': sum(output['size'] for output in outputs),
+        'timings': timings
+    }
+    if job.variants:
+        result['outputs'] = outputs
+    else:
+        result.update({key: primary[key] for key in ('encode_time', 'quality', 'over_budget')})
+        if job.return_bytes:
+            result['data'] = primary['data']
+    return result
+
+
+def _render_job(job):
+    font_stats = registry.stats()
+    rows = ((job.index, job.text_data, job.output_path, job.variants),) + tuple(job.shared_rows)
+    try:
+        first_variants = job.variants or ((job.template_name, job.export_format,
+                                           job.output_path, None),)
+        template_names = list(dict.fromkeys(name for name, _, _, _ in first_variants))
+        source_timings = {}
+        bases, decoded, saved = _source_bases(job, template_names,
+                                              variants_target_size(template_names),
+                                              source_timings)
+    except Exception as e:
+        results = [{'index': index, 'status': 'error', 'error': str(e)}
+                   for index, _, _, _ in rows]
+    else:
+        results = [
+            _render_row(job, index, text_data, output_path,
+                        variants or ((job.template_name, job.export_format, output_path, None),),
+                        bases)
+            for index, text_data, output_path, variants in rows
+        ]
+        leader = results[0]
+        if job.frames:
+            # Кадры записаны: главный процесс отдаст их другим заданиям
+            leader['frame_cost'] = sum(source_timings.values())
+        if leader['status'] == 'success':
+            # Декодирование и ресайз — на счёт ведущей строки группы
+            for stage, seconds in source_timings.items():
+                leader['timings'][stage] = leader['timings'].get(stage, 0.0) + seconds
+            if decoded is not None:
+                leader.update(decode_time=decoded.decode_time,
+                              decode_bytes=decoded.memory_bytes,
+                              decode_full_bytes=decoded.full_memory_bytes)
+            else:
+                leader['dedup'] = 'content'
+            if saved:
+                leader['saved_time'] = saved
+        source_cost = sum(source_timings.values()) or saved
+        for result in results[1:]:
+            if result['status'] == 'success':
+                result.update(dedup='url', saved_time=source_cost,
+                              source_bytes=len(job.image_bytes))
+    # Статистика шрифтов живёт в процессе воркера — передаём её с результатом
+    font_stats_after = registry.stats()
+    result = results[0]
+    result['font_loads'] = font_stats_after['font_loads'] - font_stats['font_loads']
+    result['font_load_time'] = font_stats_after['font_load_time'] - font_stats['font_load_time']
+    if job.shared_rows:
+        result['shared'] = results[1:]
+    return result
+
+
+RENDER_BACKENDS = {
+    "threads": "Потоки (ThreadPoolExecutor)",
+    "processes": "Процессы (ProcessPoolExecutor)",
+}
+
+
+def create_render_executor(backend="threads", workers=None):
+    """Executor для ``render_job``: потоки или отдельные процессы на всех ядрах"""
+    if backend == "processes":
+        # spawn не наследует потоки и состояние Streamlit-сервера
+        return ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                   mp_context=multiprocessing.get_context("spawn"))
+    if backend == "threads":
+        return ThreadPoolExecutor(max_workers=workers or os.cpu_count(),
+                                  thread_name_prefix="render")
+    raise ValueError(f"Неизвестный бэкенд рендеринга: {backend}")
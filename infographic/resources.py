@@ -0,0 +1,215 @@
+"""Реестр шрифтов и раскладок шаблонов, общий для всех рендеров процесса.
+
+Каждый шрифт нужного размера и раскладка ``positions`` для каждого
+размера холста создаются один раз на процесс (в пуле процессов — один
+раз на воркер) и затем переиспользуются всеми потоками. Там же хранятся
+готовые слои наложения: водяной знак для размера холста и плашки с
+текстом для повторяющихся строк (цены, скидки, состав).
+"""
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_BOLD = "fonts/Roboto-Bold.ttf"
+FONT_REGULAR = "fonts/Roboto-Regular.ttf"
+# Системные шрифты с кириллицей на случай, если fonts/ не развернули
+FALLBACK_FONTS = {
+    FONT_BOLD: ["DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"],
+    FONT_REGULAR: ["DejaVuSans.ttf", "LiberationSans-Regular.ttf"],
+}
+
+
+@dataclass(frozen=True)
+class TemplateResources:
+    font_bold: object
+    font_regular: object
+    positions: dict
+
+
+@dataclass(frozen=True)
+class OverlayTile:
+    """Готовый RGBA-фрагмент наложения и смещение его угла от точки привязки"""
+    image: object
+    offset: tuple
+    # Прямоугольник плашки относительно точки привязки (как у add_text_with_background)
+    box: tuple = ()
+
+    @property
+    def nbytes(self):
+        return self.image.width * self.image.height * 4
+
+
+def _text_layer(size, origin, text, font, color, alpha=255, anchor=None):
+    """Текст цвета ``color`` на прозрачном слое: альфа — покрытие глифов"""
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).text(origin, text, fill=alpha, font=font, anchor=anchor)
+    layer = Image.new("RGBA", size, (*color[:3], 0))
+    layer.putalpha(mask)
+    return layer
+
+
+def build_label(text, font, text_color, bg_color, bg_opacity=180, padding=10):
+    """Плашка с текстом — те же пиксели, что у ``add_text_with_background``.
+
+    Прямоугольник повторяет размеры по ``textbbox``, а глифы, выходящие за
+    него (выносные элементы), остаются на плитке целиком.
+    """
+    left, top, right, bottom = font.getbbox(text)
+    box = (-padding, -padding, right - left + padding, bottom - top + padding)
+    x1, y1 = min(box[0], left), min(box[1], top)
+    x2, y2 = max(box[2] + 1, right), max(box[3] + 1, bottom)
+    size = (x2 - x1, y2 - y1)
+    panel = Image.new("RGBA", size, (0, 0, 0, 0))
+    ImageDraw.Draw(panel).rectangle([box[0] - x1, box[1] - y1, box[2] - x1, box[3] - y1],
+                                    fill=(*bg_color[:3], bg_opacity))
+    text = _text_layer(size, (-x1, -y1), text, font, text_color)
+    return OverlayTile(Image.alpha_composite(panel, text), (x1, y1), box)
+
+
+def build_watermark(canvas_size, position, text, font, alpha=255):
+    """Белый водяной знак, обрезанный до своих границ.
+
+    ``draw.text`` на RGB-холсте не учитывает альфу заливки (128), поэтому
+    в режиме ``direct`` знак непрозрачный — слой по умолчанию такой же.
+    """
+    left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox(
+        position, text, font=font, anchor="mm")
+    left, top = max(left, 0), max(top, 0)
+    right, bottom = min(right, canvas_size[0]), min(bottom, canvas_size[1])
+    size = (max(right - left, 1), max(bottom - top, 1))
+    layer = _text_layer(size, (position[0] - left, position[1] - top), text, font,
+                        (255, 255, 255), alpha=alpha, anchor="mm")
+    return OverlayTile(layer, (left - position[0], top - position[1]))
+
+
+def layout_positions(size, scale=1.0):
+    """Позиции четырёх текстовых блоков для холста заданного размера.
+
+    ``scale`` — масштаб холста относительно шаблона (уменьшенный предпросмотр):
+    отступы масштабируются вместе с ним.
+    """
+    width, height = size
+    inset, block_width, bottom = (round(value * scale) for value in (50, 450, 150))
+    return {
+        "top_left": (inset, inset),
+        "top_right": (width - block_width, inset),
+        "bottom_left": (inset, height - bottom),
+        "bottom_right": (width - block_width, height - bottom)
+    }
+
+
+class ResourceRegistry:
+    """Потокобезопасный кэш шрифтов и раскладок"""
+
+    def __init__(self, overlay_bytes=64 * 1024 * 1024):
+        self._lock = threading.Lock()
+        self._fonts = {}
+        self._templates = {}
+        self._overlays = OrderedDict()
+        self._overlay_bytes = 0
+        self.overlay_limit = overlay_bytes
+        self._stats = {'font_loads': 0, 'font_load_time': 0.0, 'missing_fonts': [],
+                       'overlay_hits': 0, 'overlay_misses': 0}
+
+    def font(self, path, size):
+        key = (path, size)
+        font = self._fonts.get(key)
+        if font is not None:
+            return font
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is None:
+                font = self._load_font(path, size)
+                self._fonts[key] = font
+            return font
+
+    def _load_font(self, path, size):
+        started = time.perf_counter()
+        font = None
+        if path is None:
+            font = ImageFont.load_default()
+            path = getattr(font, 'path', None)
+        for candidate in ([path] + FALLBACK_FONTS.get(path, [])) if font is None else []:
+            try:
+                font = ImageFont.truetype(candidate, size)
+                break
+            except OSError:
+                continue
+        if font is None:
+            font = ImageFont.load_default()
+        if getattr(font, 'path', None) != path and path not in self._stats['missing_fonts']:
+            self._stats['missing_fonts'].append(path)
+            warnings.warn(f"Шрифт {path} не найден, используется "
+                          f"{getattr(font, 'path', 'встроенный шрифт PIL')}")
+        self._stats['font_loads'] += 1
+        self._stats['font_load_time'] += time.perf_counter() - started
+        return font
+
+    def default_font(self):
+        """Встроенный шрифт PIL (водяной знак)"""
+        return self.font(None, 0)
+
+    def template(self, template_config):
+        """Шрифты и раскладка для конфигурации шаблона из ``Config.TEMPLATES``"""
+        key = (tuple(template_config['size']),
+               template_config['font_sizes']['top'],
+               template_config['font_sizes']['bottom'],
+               template_config.get('scale', 1))
+        resources = self._templates.get(key)
+        if resources is None:
+            resources = TemplateResources(
+                font_bold=self.font(FONT_BOLD, key[1]),
+                font_regular=self.font(FONT_REGULAR, key[2]),
+                positions=layout_positions(key[0], key[3])
+            )
+            with self._lock:
+                resources = self._templates.setdefault(key, resources)
+        return resources
+
+    def overlay(self, key, factory):
+        """Слой наложения из LRU-кэша (ограничен ``overlay_limit`` байтами)"""
+        with self._lock:
+            tile = self._overlays.get(key)
+            if tile is not None:
+                self._overlays.move_to_end(key)
+                self._stats['overlay_hits'] += 1
+                return tile
+        tile = factory()
+        with self._lock:
+            self._stats['overlay_misses'] += 1
+            if key not in self._overlays:
+                self._overlays[key] = tile
+                self._overlay_bytes += tile.nbytes
+                while self._overlay_bytes > self.overlay_limit and len(self._overlays) > 1:
+                    _, evicted = self._overlays.popitem(last=False)
+                    self._overlay_bytes -= evicted.nbytes
+        return tile
+
+    def label(self, text, font, text_color, bg_color, bg_opacity=180, padding=10):
+        """Плашка с текстом; шрифты живут в реестре, поэтому ключ — их id"""
+        key = ('label', id(font), text, tuple(text_color), tuple(bg_color[:3]),
+               bg_opacity, padding)
+        return self.overlay(key, lambda: build_label(text, font, text_color, bg_color,
+                                                     bg_opacity, padding))
+
+    def watermark(self, canvas_size, position, text):
+        font = self.default_font()
+        key = ('watermark', tuple(canvas_size), tuple(position), text)
+        return self.overlay(key, lambda: build_watermark(canvas_size, position, text, font))
+
+    def preload(self, templates):
+        for template_config in templates.values():
+            self.template(template_config)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, missing_fonts=list(self._stats['missing_fonts']),
+                        cached_fonts=len(self._fonts), cached_templates=len(self._templates),
+                        cached_overlays=len(self._overlays), overlay_bytes=self._overlay_bytes)
+
+
+registry = ResourceRegistry()
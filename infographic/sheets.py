@@ -0,0 +1,190 @@
+"""Загрузка и сохранение данных в Google Sheets.
+
+Клиент gspread создаётся один раз на сервисный аккаунт и переиспользуется.
+Читаются только нужные столбцы (диапазоны вида ``C2:C``) одним запросом
+``batch_get``; результаты пакета записываются обратно одним или несколькими
+``batch_update`` только в изменившиеся ячейки статуса и имени файла.
+Ошибки квоты (429) и временные 5xx повторяются с экспоненциальной паузой.
+"""
+import random
+import threading
+import time
+
+import gspread
+import pandas as pd
+from google.oauth2 import service_account
+from gspread.utils import rowcol_to_a1
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets',
+          'https://www.googleapis.com/auth/drive']
+STATUS_COLUMN = 'Статус генерации'
+FILENAME_COLUMN = 'Файл инфографики'
+RETRY_STATUSES = (429, 500, 502, 503)
+
+_lock = threading.Lock()
+_clients = {}
+_worksheets = {}
+
+
+def is_retryable(error):
+    """Ошибка квоты или временный сбой API"""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status in RETRY_STATUSES
+
+
+def with_backoff(func, *args, retries=5, base_delay=1.0, max_delay=32.0, **kwargs):
+    """Вызов API с повтором при 429/5xx: пауза 1, 2, 4... сек со случайной добавкой"""
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay + random.uniform(0, delay / 2))
+
+
+def get_client(credentials_json):
+    """Клиент gspread, общий для всех вызовов с этим сервисным аккаунтом"""
+    key = (credentials_json.get('client_email'), credentials_json.get('private_key_id'))
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            credentials = service_account.Credentials.from_service_account_info(
+                credentials_json, scopes=SCOPES
+            )
+            client = _clients[key] = gspread.authorize(credentials)
+        return client
+
+
+def open_worksheet(credentials_json, spreadsheet_id):
+    """Первый лист таблицы; метаданные таблицы запрашиваются один раз"""
+    key = (credentials_json.get('client_email'), spreadsheet_id)
+    with _lock:
+        worksheet = _worksheets.get(key)
+    if worksheet is None:
+        client = get_client(credentials_json)
+        spreadsheet = with_backoff(client.open_by_key, spreadsheet_id)
+        worksheet = with_backoff(lambda: spreadsheet.sheet1)
+        with _lock:
+            worksheet = _worksheets.setdefault(key, worksheet)
+    return worksheet
+
+
+def _column_letter(col):
+    return rowcol_to_a1(1, col)[:-1]
+
+
+def read_header(worksheet):
+    return with_backoff(worksheet.row_values, 1)
+
+
+def read_worksheet(worksheet, columns=None, max_rows=None):
+    """DataFrame из выбранных столбцов листа.
+
+    ``columns=None`` — все столбцы с заголовком; ``max_rows`` ограничивает
+    число строк данных. Индекс DataFrame — номер строки листа минус 2.
+    """
+    header = read_header(worksheet)
+    if columns is not None:
+        columns = set(columns)
+    wanted = [(position, name) for position, name in enumerate(header, start=1)
+              if name and (columns is None or name in columns)]
+    # Дубликаты заголовков: берём первый столбец, как pandas при чтении
+    seen = set()
+    wanted = [(position, name) for position, name in wanted
+              if not (name in seen or seen.add(name))]
+    if not wanted:
+        return pd.DataFrame()
+
+    last_row = str(max_rows + 1) if max_rows else ""
+    ranges = [f"{_column_letter(position)}2:{_column_letter(position)}{last_row}"
+              for position, _ in wanted]
+    value_ranges = with_backoff(worksheet.batch_get, ranges, major_dimension="COLUMNS")
+    column_values = [value_range[0] if value_range else [] for value_range in value_ranges]
+    height = max(len(values) for values in column_values)
+    rows = [[values[i] if i < len(values) else "" for values in column_values]
+            for i in range(height)]
+    # Тот же разбор типов, что у gspread_dataframe.get_as_dataframe
+    df = pd.io.parsers.TextParser([[name for _, name in wanted]] + rows).read()
+    return df.dropna(how='all')
+
+
+def init_google_sheets_connection(credentials_json, spreadsheet_id, columns=None, max_rows=None):
+    """Инициализация подключения к Google Sheets"""
+    try:
+        worksheet = open_worksheet(credentials_json, spreadsheet_id)
+        return read_worksheet(worksheet, columns=columns, max_rows=max_rows), None
+    except Exception as e:
+        return None, str(e)
+
+
+def result_cells(result):
+    """Значения столбцов статуса и имени файла для результата пакета"""
+    if result['status'] == 'success':
+        return "OK", result.get('filename') or ""
+    return f"Ошибка: {result.get('error', '')}", ""
+
+
+def write_batch_results(worksheet, df, results, chunk_size=500):
+    """Записывает статус и имя файла по каждой строке; возвращает число ячеек.
+
+    ``df`` — таблица, прочитанная ``read_worksheet``: по её индексу позиция
+    результата переводится в номер строки листа. Неизменившиеся ячейки не
+    отправляются.
+    """
+    header = read_header(worksheet)
+    updates = []
+    positions = {}
+    for name in (STATUS_COLUMN, FILENAME_COLUMN):
+        if name in header:
+            positions[name] = header.index(name) + 1
+        else:
+            header.append(name)
+            positions[name] = len(header)
+            updates.append({'range': rowcol_to_a1(1, positions[name]), 'values': [[name]]})
+    if len(header) > worksheet.col_count:
+        with_backoff(worksheet.add_cols, len(header) - worksheet.col_count)
+
+    ranges = [f"{_column_letter(positions[name])}2:{_column_letter(positions[name])}"
+              for name in (STATUS_COLUMN, FILENAME_COLUMN)]
+    current = [value_range[0] if value_range else []
+               for value_range in with_backoff(worksheet.batch_get, ranges,
+                                               major_dimension="COLUMNS")]
+
+    changed = {STATUS_COLUMN: {}, FILENAME_COLUMN: {}}
+    for result in results:
+        sheet_row = int(df.index[result['index']]) + 2
+        for name, value, existing in zip((STATUS_COLUMN, FILENAME_COLUMN),
+                                         result_cells(result), current):
+            offset = sheet_row - 2
+            if (existing[offset] if offset < len(existing) else "") != value:
+                changed[name][sheet_row] = value
+
+    # Соседние изменившиеся ячейки столбца уходят одним диапазоном
+    cells = len(updates)
+    for name, values in changed.items():
+        letter = _column_letter(positions[name])
+        run = []
+        for sheet_row in sorted(values) + [None]:
+            if run and (sheet_row is None or sheet_row != run[-1] + 1):
+                updates.append({'range': f"{letter}{run[0]}:{letter}{run[-1]}",
+                                'values': [[values[row]] for row in run]})
+                run = []
+            if sheet_row is not None:
+                run.append(sheet_row)
+        cells += len(values)
+
+    for start in range(0, len(updates), chunk_size):
+        with_backoff(worksheet.batch_update, updates[start:start + chunk_size],
+                     value_input_option="RAW")
+    return cells
+
+
+def save_results_to_google_sheets(df, results, credentials_json, spreadsheet_id):
+    """Сохранение статусов пакета обратно в Google Sheets"""
+    try:
+        worksheet = open_worksheet(credentials_json, spreadsheet_id)
+        return write_batch_results(worksheet, df, results), None
+    except Exception as e:
+        return 0, str(e)
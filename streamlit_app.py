@@ -1,22 +1,29 @@
 import streamlit as st
 import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
-import requests
-from io import BytesIO
 import os
 import json
 import time
-import hashlib
-import zipfile
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import tempfile
-import shutil
-import re
-import gspread
-from google.oauth2 import service_account
-from gspread_dataframe import get_as_dataframe, set_with_dataframe
-import gc
+from io import BytesIO
+from infographic.config import Config
+from infographic.render import DEFAULT_ENCODER_PROFILE, RENDER_BACKENDS, RENDER_MODES
+from infographic.resources import registry
+from infographic.checkpoint import CheckpointManifest, resumable_batches
+from infographic.incremental import DELTA_CHANGED, DELTA_NEW, DELTA_UNCHANGED
+from infographic.download import download_image_decoded, get_image_cache, image_version
+from infographic.sheets import init_google_sheets_connection, save_results_to_google_sheets
+from infographic.batch import BatchSettings, new_batch_id, preflight_batch, run_batch
+from infographic.prepare import NOT_USED, iter_prepared_rows
+from infographic.ingest import SUPPORTED_EXTENSIONS, load_table
+from infographic.metrics import PROFILE_MODES, STAGE_LABELS, TIMINGS_JSON
+from infographic.preview import PREVIEW_SCALE, PreviewCache
+from infographic.preflight import PREFLIGHT_MODES
+
+NEW_BATCH = "🆕 Новый пакет"
+LOCAL_FILE = "📁 Локальный Excel файл"
+GOOGLE_SHEETS = "☁️ Google Таблица"
+# Строк, читаемых из файла или Google Таблицы для настройки столбцов до выбора соответствия
+SAMPLE_ROWS = 50
 
 # ==================== НАСТРОЙКА СТРАНИЦЫ ====================
 st.set_page_config(
@@ -37,181 +44,11 @@ if 'processing_stats' not in st.session_state:
         'start_time': None, 'end_time': None
     }
 if 'batch_id' not in st.session_state:
-    st.session_state.batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-# ==================== КОНФИГУРАЦИЯ ====================
-class Config:
-    TEMPLATES = {
-        "📋 Стандартный": {
-            "size": (1200, 1200),
-            "font_sizes": {"top": 36, "bottom": 20},
-            "colors": {"top_left": (255, 255, 255), "top_right": (255, 215, 0),
-                      "bottom_left": (220, 220, 220), "bottom_right": (255, 107, 107)},
-            "background_opacity": 180, "text_shadow": True
-        },
-        "⭐ Премиум": {
-            "size": (1200, 1200),
-            "font_sizes": {"top": 32, "bottom": 18},
-            "colors": {"top_left": (255, 255, 255), "top_right": (200, 200, 200),
-                      "bottom_left": (180, 180, 180), "bottom_right": (160, 160, 160)},
-            "background_opacity": 220, "text_shadow": False
-        },
-        "🔥 Акционный": {
-            "size": (1200, 1200),
-            "font_sizes": {"top": 40, "bottom": 22},
-            "colors": {"top_left": (255, 255, 0), "top_right": (255, 50, 50),
-                      "bottom_left": (255, 255, 255), "bottom_right": (255, 150, 50)},
-            "background_opacity": 200, "text_shadow": True
-        },
-        "📱 Вертикальный": {
-            "size": (1080, 1920),
-            "font_sizes": {"top": 34, "bottom": 18},
-            "colors": {"top_left": (255, 255, 255), "top_right": (255, 105, 180),
-                      "bottom_left": (200, 230, 255), "bottom_right": (144, 238, 144)},
-            "background_opacity": 160, "text_shadow": True
-        }
-    }
-    
-    EXPORT_FORMATS = {
-        "JPEG": {"quality": 85, "extension": "jpg"},
-        "PNG": {"quality": 100, "extension": "png"},
-        "WebP": {"quality": 90, "extension": "webp"}
-    }
-
-# ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ====================
-def sanitize_filename(filename):
-    filename = filename.replace(' ', '_')
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-    translit_map = {'а':'a','б':'b','в':'v','г':'g','д':'d','е':'e','ё':'yo',
-                   'ж':'zh','з':'z','и':'i','й':'y','к':'k','л':'l','м':'m',
-                   'н':'n','о':'o','п':'p','р':'r','с':'s','т':'t','у':'u',
-                   'ф':'f','х':'kh','ц':'ts','ч':'ch','ш':'sh','щ':'shch',
-                   'ы':'y','э':'e','ю':'yu','я':'ya'}
-    for rus, eng in translit_map.items():
-        filename = filename.replace(rus, eng).replace(rus.upper(), eng.upper())
-    return filename[:100]
-
-def create_output_filename(row, prefix="", suffix="", add_hash=True):
-    base_name = str(row.get('Название', f'product_{row.name}'))
-    base_name = sanitize_filename(base_name)
-    filename = f"{prefix}{base_name}{suffix}"
-    if add_hash:
-        hash_str = hashlib.md5(str(row).encode()).hexdigest()[:8]
-        filename = f"{filename}_{hash_str}"
-    filename = f"{filename}_{row.name:06d}"
-    return filename
-
-@st.cache_data(ttl=300)
-def download_image_cached(url, timeout=15, retries=2):
-    for attempt in range(retries + 1):
-        try:
-            response = requests.get(url, timeout=timeout, 
-                                   headers={'User-Agent': 'Mozilla/5.0'})
-            response.raise_for_status()
-            if 'image' not in response.headers.get('content-type', ''):
-                raise ValueError(f"URL не ведет к изображению")
-            return Image.open(BytesIO(response.content))
-        except Exception as e:
-            if attempt == retries:
-                raise Exception(f"Не удалось загрузить: {e}")
-            time.sleep(1)
-    return None
-
-def add_text_with_background(draw, position, text, font, text_color, 
-                            bg_color, bg_opacity=180, padding=10):
-    bbox = draw.textbbox((0, 0), text, font=font)
-    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    bg_x1, bg_y1 = position[0] - padding, position[1] - padding
-    bg_x2, bg_y2 = position[0] + text_width + padding, position[1] + text_height + padding
-    bg_color_with_alpha = (*bg_color, bg_opacity)
-    draw.rectangle([bg_x1, bg_y1, bg_x2, bg_y2], fill=bg_color_with_alpha)
-    draw.text(position, text, fill=text_color, font=font)
-    return (bg_x1, bg_y1, bg_x2, bg_y2)
-
-def create_infographic(original_img, text_data, template_config, 
-                      add_watermark=False, watermark_text=""):
-    img = original_img.resize(template_config['size'], Image.Resampling.LANCZOS)
-    draw = ImageDraw.Draw(img, 'RGBA')
-    
-    try:
-        font_bold = ImageFont.truetype("fonts/Roboto-Bold.ttf", 
-                                      template_config['font_sizes']['top"])
-        font_regular = ImageFont.truetype("fonts/Roboto-Regular.ttf", 
-                                         template_config['font_sizes']['bottom'])
-    except:
-        font_bold = ImageFont.load_default()
-        font_regular = ImageFont.load_default()
-    
-    width, height = img.size
-    positions = {
-        "top_left": (50, 50),
-        "top_right": (width - 450, 50),
-        "bottom_left": (50, height - 150),
-        "bottom_right": (width - 450, height - 150)
-    }
-    
-    if text_data.get('top_left'):
-        add_text_with_background(draw, positions["top_left"], text_data['top_left'], 
-                                font_bold, template_config['colors']['top_left'],
-                                (0, 0, 0, 180), template_config['background_opacity'])
-    
-    if text_data.get('top_right'):
-        add_text_with_background(draw, positions["top_right"], text_data['top_right'],
-                                font_bold, template_config['colors']['top_right'],
-                                (0, 0, 0, 180), template_config['background_opacity'])
-    
-    if text_data.get('bottom_left'):
-        add_text_with_background(draw, positions["bottom_left"], text_data['bottom_left'],
-                                font_regular, template_config['colors']['bottom_left'],
-                                (0, 0, 0, 150), template_config['background_opacity'])
-    
-    if text_data.get('bottom_right'):
-        add_text_with_background(draw, positions["bottom_right"], text_data['bottom_right'],
-                                font_regular, template_config['colors']['bottom_right'],
-                                (0, 0, 0, 150), template_config['background_opacity'])
-    
-    if add_watermark and watermark_text:
-        watermark_font = ImageFont.load_default()
-        watermark_position = (width // 2, height - 30)
-        draw.text(watermark_position, watermark_text, fill=(255, 255, 255, 128),
-                 font=watermark_font, anchor="mm")
-    
-    return img
-
-# ==================== ФУНКЦИИ ДЛЯ GOOGLE SHEETS ====================
-def init_google_sheets_connection(credentials_json, spreadsheet_id):
-    """Инициализация подключения к Google Sheets"""
-    try:
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_json,
-            scopes=['https://www.googleapis.com/auth/spreadsheets',
-                   'https://www.googleapis.com/auth/drive']
-        )
-        gc = gspread.authorize(credentials)
-        spreadsheet = gc.open_by_key(spreadsheet_id)
-        worksheet = spreadsheet.sheet1
-        df = get_as_dataframe(worksheet, evaluate_formulas=True)
-        df = df.dropna(how='all')
-        return df, None
-    except Exception as e:
-        return None, str(e)
-
-def save_to_google_sheets(df, credentials_json, spreadsheet_id):
-    """Сохранение данных обратно в Google Sheets"""
-    try:
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_json,
-            scopes=['https://www.googleapis.com/auth/spreadsheets',
-                   'https://www.googleapis.com/auth/drive']
-        )
-        gc = gspread.authorize(credentials)
-        spreadsheet = gc.open_by_key(spreadsheet_id)
-        worksheet = spreadsheet.sheet1
-        worksheet.clear()
-        set_with_dataframe(worksheet, df)
-        return True, None
-    except Exception as e:
-        return False, str(e)
+    st.session_state.batch_id = new_batch_id()
+if 'preview_cache' not in st.session_state:
+    st.session_state.preview_cache = PreviewCache()
+if 'preview_request' not in st.session_state:
+    st.session_state.preview_request = None
 
 # ==================== ОСНОВНОЙ ИНТЕРФЕЙС ====================
 st.title("🎯 Генератор Инфографики v3.0 (Excel + Google Sheets)")
@@ -221,13 +58,13 @@ with st.sidebar:
     st.header("📋 Источник данных")
     data_source = st.radio(
         "Выберите источник данных:",
-        ["📁 Локальный Excel файл", "☁️ Google Таблица"],
+        [LOCAL_FILE, GOOGLE_SHEETS],
         index=0
     )
     
     st.session_state.data_source = data_source
     
-    if data_source == "☁️ Google Таблица":
+    if data_source == GOOGLE_SHEETS:
         st.subheader("Настройки Google Sheets")
         
         spreadsheet_id = st.text_input(
@@ -246,8 +83,10 @@ with st.sidebar:
                 try:
                     credentials_json = json.loads(creds_json_str)
                     with st.spinner("Подключение к Google Sheets..."):
+                        # Для настройки столбцов хватает первых строк; полные
+                        # данные читаются позже и только по выбранным столбцам
                         df, error = init_google_sheets_connection(
-                            credentials_json, spreadsheet_id
+                            credentials_json, spreadsheet_id, max_rows=SAMPLE_ROWS
                         )
                         
                         if error:
@@ -262,7 +101,8 @@ with st.sidebar:
                             st.session_state.df = df
                             st.session_state.gs_creds = credentials_json
                             st.session_state.gs_id = spreadsheet_id
-                            st.success(f"✅ Загружено {len(df)} строк")
+                            st.session_state.gs_mapped_key = None
+                            st.success(f"✅ Загружено {len(df.columns)} столбцов и {len(df)} строк для настройки")
                 except json.JSONDecodeError:
                     st.error("Неверный формат JSON")
     
@@ -274,6 +114,18 @@ with st.sidebar:
         list(Config.EXPORT_FORMATS.keys()),
         index=0
     )
+    encoder_profile = st.selectbox(
+        "Профиль кодирования",
+        list(Config.ENCODER_PROFILES),
+        index=list(Config.ENCODER_PROFILES).index(DEFAULT_ENCODER_PROFILE),
+        format_func=Config.ENCODER_PROFILES.get,
+        help="Меньше файлы — дольше кодирование: optimize/progressive для JPEG, method для WebP, "
+             "уровень сжатия для PNG"
+    )
+    max_output_kb = st.number_input(
+        "Лимит размера файла, КБ (0 — без лимита)", 0, 10000, 0, step=50,
+        help="Для JPEG и WebP качество подбирается под лимит для каждого изображения отдельно"
+    )
     
     st.subheader("📝 Имена файлов")
     filename_prefix = st.text_input("Префикс", "product_")
@@ -281,27 +133,38 @@ with st.sidebar:
     add_watermark = st.checkbox("Добавить водяной знак")
     if add_watermark:
         watermark_text = st.text_input("Текст водяного знака", "© ВашБренд 2024")
+    
+    st.subheader("💾 Кэш изображений")
+    cache_limit_mb = st.number_input(
+        "Лимит кэша (МБ)", 100, 100000, 1024, step=100,
+        help="Сырые байты изображений хранятся на диске; при превышении лимита удаляются давно не использованные"
+    )
+    get_image_cache().max_bytes = cache_limit_mb * 1024 * 1024
 
 # ==================== ЗАГРУЗКА ДАННЫХ ====================
 st.header("1. 📊 Загрузка данных")
 
-if st.session_state.data_source == "📁 Локальный Excel файл":
+uploaded_file = None
+if st.session_state.data_source == LOCAL_FILE:
     uploaded_file = st.file_uploader(
         "Загрузите Excel-файл",
-        type=['xlsx', 'xls'],
-        help="Файл должен содержать колонки: Название, URL картинки, Цена"
+        type=list(SUPPORTED_EXTENSIONS),
+        help="Excel, CSV или Parquet с колонками: Название, URL картинки, Цена"
     )
     
     if uploaded_file:
         try:
-            df = pd.read_excel(uploaded_file)
-            st.session_state.df = df
-            st.success(f"✅ Успешно загружено {len(df)} строк")
+            # Для настройки столбцов — первые строки; полностью читаются
+            # только выбранные столбцы (ниже). Разбор кэшируется по хэшу файла
+            sample = load_table(uploaded_file.getvalue(), uploaded_file.name, max_rows=SAMPLE_ROWS)
+            st.session_state.df = sample.df
+            load_status = st.empty()
             
             with st.expander("📋 Предпросмотр данных", expanded=True):
-                st.dataframe(df.head(10), use_container_width=True)
+                st.dataframe(sample.df.head(10), use_container_width=True)
                 
         except Exception as e:
+            uploaded_file = None
             st.error(f"❌ Ошибка при чтении файла: {str(e)}")
 
 # Если данные загружены (из любого источника)
@@ -334,17 +197,49 @@ if st.session_state.df is not None:
     
     with col2:
         st.subheader("Дополнительные данные")
-        features_options = ['Не использовать'] + list(df.columns)
+        features_options = [NOT_USED] + list(df.columns)
         column_mapping['bottom_left'] = st.selectbox(
             "Столбец с характеристиками", 
             features_options
         )
-        discount_options = ['Не использовать'] + list(df.columns)
+        discount_options = [NOT_USED] + list(df.columns)
         column_mapping['bottom_right'] = st.selectbox(
             "Столбец со скидкой", 
             discount_options
         )
     
+    # Полные данные читаются только по сопоставленным столбцам (+ «Название»
+    # для имён файлов); повторное чтение — лишь при смене набора столбцов
+    mapped_columns = tuple(sorted(
+        {column for column in column_mapping.values() if column != NOT_USED}
+        | ({'Название'} & set(df.columns))
+    ))
+    if uploaded_file:
+        try:
+            loaded = load_table(uploaded_file.getvalue(), uploaded_file.name, columns=mapped_columns)
+        except Exception as e:
+            st.error(f"❌ Ошибка при чтении файла: {str(e)}")
+            st.stop()
+        df = loaded.df
+        load_status.success(
+            f"✅ Успешно загружено {len(df)} строк · {len(df.columns)} столбцов · "
+            f"{loaded.load_time:.2f} сек{' (из кэша)' if loaded.cached else ''} · "
+            f"{loaded.memory_bytes/1024/1024:.1f} МБ в памяти (файл {loaded.file_bytes/1024/1024:.1f} МБ)"
+        )
+    elif data_source == GOOGLE_SHEETS and st.session_state.get('gs_id'):
+        if st.session_state.gs_mapped_key != mapped_columns:
+            with st.spinner("Загрузка выбранных столбцов из Google Sheets..."):
+                mapped_df, error = init_google_sheets_connection(
+                    st.session_state.gs_creds, st.session_state.gs_id, columns=mapped_columns
+                )
+            if error:
+                st.error(f"Ошибка загрузки столбцов: {error}")
+                st.stop()
+            st.session_state.gs_mapped_df = mapped_df
+            st.session_state.gs_mapped_key = mapped_columns
+        df = st.session_state.gs_mapped_df
+        st.caption(f"☁️ Из Google Таблицы загружено {len(df)} строк по столбцам: {', '.join(mapped_columns)}")
+    
     # ==================== 3. ВЫБОР ШАБЛОНА ====================
     st.header("3. 🎭 Выбор шаблона")
     
@@ -379,46 +274,77 @@ if st.session_state.df is not None:
     with col2:
         preview_timeout = st.number_input("Таймаут (сек)", 5, 60, 15)
     
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        compare_templates = st.multiselect(
+            "Сравнить шаблоны рядом",
+            [name for name in template_names if name != selected_template],
+            help="Исходное изображение загружается и декодируется один раз для всех шаблонов"
+        )
+    with col2:
+        fast_preview = st.checkbox(
+            "⚡ Быстрый предпросмотр", value=True,
+            help=f"Рендеринг в масштабе {PREVIEW_SCALE:.0%}; полное разрешение — при сохранении тестового файла"
+        )
+    
+    preview_templates = [selected_template] + compare_templates
+    preview_scale = PREVIEW_SCALE if fast_preview else 1
+    preview_watermark = watermark_text if add_watermark and 'watermark_text' in locals() else ""
+    preview_cache = st.session_state.preview_cache
+    
+    def fetch_preview_source(url, target_size):
+        return download_image_decoded(url, target_size=target_size, timeout=preview_timeout)
+    
     if st.button("🔄 Сгенерировать предпросмотр", type="secondary"):
+        st.session_state.preview_request = preview_row
+    
+    # Превью переживает перезапуски скрипта: при смене виджетов показывается
+    # из кэша, а недостающие шаблоны дорисовываются из того же исходника
+    if st.session_state.preview_request is not None and st.session_state.preview_request < len(df):
         with st.spinner("Создание превью..."):
             try:
-                row = df.iloc[preview_row]
+                row = next(iter_prepared_rows(df, column_mapping,
+                                              start=st.session_state.preview_request,
+                                              stop=st.session_state.preview_request + 1))
+                started = time.perf_counter()
+                # Версия по дисковому кэшу: замена картинки по тому же URL
+                # видна после ревалидации, а не только в новой сессии
+                version = image_version(row.image_url, timeout=preview_timeout)
+                images, decoded = preview_cache.render(
+                    row, preview_templates, column_mapping, preview_watermark,
+                    preview_scale, fetch_preview_source, version=version
+                )
+                elapsed = time.perf_counter() - started
                 
-                text_data = {
-                    'top_left': str(row[column_mapping['top_left']]) if column_mapping['top_left'] in df.columns and pd.notna(row[column_mapping['top_left']]) else "",
-                    'top_right': str(row[column_mapping['top_right']]) if column_mapping['top_right'] in df.columns and pd.notna(row[column_mapping['top_right']]) else "",
-                    'bottom_left': str(row[column_mapping['bottom_left']]) if column_mapping['bottom_left'] != 'Не использовать' and column_mapping['bottom_left'] in df.columns and pd.notna(row[column_mapping['bottom_left']]) else "",
-                    'bottom_right': str(row[column_mapping['bottom_right']]) if column_mapping['bottom_right'] != 'Не использовать' and column_mapping['bottom_right'] in df.columns and pd.notna(row[column_mapping['bottom_right']]) else ""
-                }
+                preview_columns = st.columns(len(images))
+                for column, (name, image) in zip(preview_columns, images.items()):
+                    with column:
+                        st.image(image, caption=f"🎯 {name}", use_container_width=True)
                 
-                img_url = str(row[column_mapping['image_url']]) if column_mapping['image_url'] in df.columns else ""
-                original_img = download_image_cached(img_url, timeout=preview_timeout)
+                if decoded is not None:
+                    st.caption(
+                        f"Исходник {decoded.source_size[0]}x{decoded.source_size[1]} → "
+                        f"декодировано {decoded.image.size[0]}x{decoded.image.size[1]} "
+                        f"за {decoded.decode_time*1000:.0f} мс, "
+                        f"{decoded.memory_bytes/1024/1024:.1f} МБ вместо {decoded.full_memory_bytes/1024/1024:.1f} МБ"
+                    )
+                else:
+                    st.caption(f"Из кэша предпросмотра за {elapsed*1000:.0f} мс")
                 
-                if original_img:
-                    infographic_img = create_infographic(
-                        original_img, text_data, template_config,
-                        add_watermark=add_watermark,
-                        watermark_text=watermark_text if 'watermark_text' in locals() else ""
+                # Тестовый файл всегда в полном разрешении выбранного шаблона
+                if st.button("💾 Подготовить тестовый файл (полное разрешение)"):
+                    full_images, _ = preview_cache.render(
+                        row, [selected_template], column_mapping, preview_watermark, 1,
+                        fetch_preview_source, version=version
+                    )
+                    buffer = BytesIO()
+                    full_images[selected_template].save(buffer, "JPEG", quality=95)
+                    st.download_button(
+                        "Скачать тестовый файл",
+                        buffer.getvalue(),
+                        file_name=f"preview_{st.session_state.batch_id}.jpg",
+                        mime="image/jpeg"
                     )
-                    
-                    col_before, col_after = st.columns(2)
-                    with col_before:
-                        st.image(original_img, caption="🖼️ Оригинал", 
-                                use_container_width=True)
-                    with col_after:
-                        st.image(infographic_img, caption="🎯 Инфографика", 
-                                use_container_width=True)
-                    
-                    if st.button("💾 Сохранить тестовый файл"):
-                        test_filename = f"preview_{st.session_state.batch_id}.jpg"
-                        infographic_img.save(test_filename, quality=95)
-                        with open(test_filename, "rb") as file:
-                            st.download_button(
-                                "Скачать тестовый файл",
-                                file,
-                                file_name=test_filename,
-                                mime="image/jpeg"
-                            )
                 
             except Exception as e:
                 st.error(f"❌ Ошибка предпросмотра: {str(e)}")
@@ -429,71 +355,118 @@ if st.session_state.df is not None:
     with st.expander("⚙️ Настройки обработки", expanded=True):
         col1, col2 = st.columns(2)
         with col1:
-            num_threads = st.slider("Количество потоков", 1, 16, 8,
-                                   help="Используйте ThreadPoolExecutor вместо ProcessPool для совместимости[citation:1]")
+            render_backend = st.selectbox(
+                "Бэкенд рендеринга",
+                list(RENDER_BACKENDS.keys()),
+                format_func=RENDER_BACKENDS.get,
+                help="Процессы используют все ядра CPU для ресайза и кодирования без ограничений GIL"
+            )
+            render_mode = st.selectbox(
+                "Режим наложения текста",
+                list(RENDER_MODES.keys()),
+                format_func=RENDER_MODES.get,
+                help="Плашки с повторяющимся текстом (цены, скидки) и водяной знак готовятся один раз и накладываются на каждое изображение"
+            )
+            num_threads = st.slider("Воркеров рендеринга", 1, max(16, os.cpu_count() or 1),
+                                   8 if render_backend == "threads" else (os.cpu_count() or 1),
+                                   help="Рендеринг (ресайз, текст, кодирование) выполняется отдельным пулом воркеров")
+            download_concurrency = st.slider("Параллельных загрузок", 1, 256, 64,
+                                             help="Асинхронная стадия загрузки держит столько запросов в полёте независимо от потоков рендеринга")
             retry_count = st.slider("Повторные попытки", 0, 5, 2)
+            per_host_limit = st.slider("Соединений на один хост", 1, 64, min(download_concurrency, 8),
+                                       help="Ограничивает одновременные запросы к одному CDN, чтобы медленный хост не занимал все загрузки")
+            adaptive_concurrency = st.checkbox(
+                "Адаптивный лимит на хост", value=True,
+                help="Лимит снижается при ответах 429/503 и росте задержки и медленно растёт обратно до "
+                     "значения выше; хосты с серией ошибок откладываются в конец пакета"
+            )
         with col2:
-            batch_size = st.slider("Размер пакета", 10, 500, 100)
+            batch_size = st.slider("Размер пакета", 10, 500, 100,
+                                   help="Максимум строк в работе одновременно: следующая строка берётся только после завершения предыдущей, поэтому память не растёт с числом строк")
             rows_to_process = st.number_input("Сколько строк обработать",
                                             1, len(df), min(500, len(df)))
-    
-    def process_single_image_wrapper(args):
-        """Обертка для обработки одного изображения"""
-        idx, row = args
-        try:
-            text_data = {
-                'top_left': str(row[column_mapping['top_left']]) if column_mapping['top_left'] in df.columns and pd.notna(row[column_mapping['top_left']]) else "",
-                'top_right': str(row[column_mapping['top_right']]) if column_mapping['top_right'] in df.columns and pd.notna(row[column_mapping['top_right']]) else "",
-                'bottom_left': str(row[column_mapping['bottom_left']]) if column_mapping['bottom_left'] != 'Не использовать' and column_mapping['bottom_left'] in df.columns and pd.notna(row[column_mapping['bottom_left']]) else "",
-                'bottom_right': str(row[column_mapping['bottom_right']]) if column_mapping['bottom_right'] != 'Не использовать' and column_mapping['bottom_right'] in df.columns and pd.notna(row[column_mapping['bottom_right']]) else ""
-            }
-            
-            img_url = str(row[column_mapping['image_url']]) if column_mapping['image_url'] in df.columns else ""
-            original_img = download_image_cached(img_url, timeout=15, retries=retry_count)
-            
-            if not original_img:
-                raise Exception("Не удалось загрузить изображение")
-            
-            infographic_img = create_infographic(
-                original_img, text_data, template_config,
-                add_watermark=add_watermark,
-                watermark_text=watermark_text if 'watermark_text' in locals() else ""
+            zip_only = st.checkbox("Только ZIP-архив (не сохранять отдельные файлы)",
+                                   help="Изображения пишутся в архив прямо из памяти, папка output/ не используется")
+            incremental_mode = st.checkbox(
+                "Инкрементальный режим",
+                help="Строки, у которых не изменились тексты, изображение, шаблон и формат, "
+                     "берутся из прошлых пакетов без загрузки и рендеринга"
             )
-            
-            filename_base = create_output_filename(
-                row, 
-                prefix=filename_prefix,
-                suffix=filename_suffix,
-                add_hash=True
+            dedup_mode = st.checkbox(
+                "Дедупликация изображений", value=True,
+                help="Строки с одинаковым URL (или одинаковыми байтами под разными URL) загружаются, "
+                     "декодируются и масштабируются один раз — на каждую строку рисуется только текст"
             )
-            
-            output_dir = f"output/batch_{st.session_state.batch_id}"
-            os.makedirs(output_dir, exist_ok=True)
-            
-            export_config = Config.EXPORT_FORMATS[export_format]
-            output_path = os.path.join(
-                output_dir,
-                f"{filename_base}.{export_config['extension']}"
+            preflight_mode = st.selectbox(
+                "Предпроверка ссылок",
+                [""] + list(PREFLIGHT_MODES),
+                format_func=lambda mode: PREFLIGHT_MODES.get(mode, "Выключена"),
+                help="Перед рендерингом каждая ссылка проверяется лёгким запросом (код ответа, тип, "
+                     "размер файла и изображения) — битые строки не тратят время на загрузку и повторы"
+            )
+            profile_mode = st.selectbox(
+                "Профилирование выборки строк",
+                [""] + list(PROFILE_MODES),
+                format_func=lambda mode: mode or "Выключено",
+                help="cProfile или tracemalloc для каждой N-й строки; отчёты в папке profiles/ пакета"
+            )
+            profile_every = st.number_input("Профилировать каждую N-ю строку", 1, 10000, 50,
+                                            disabled=not profile_mode)
+            write_back = st.checkbox(
+                "Записать статусы в Google Таблицу",
+                disabled=not (data_source == GOOGLE_SHEETS and st.session_state.get('gs_id')),
+                help="Столбцы «Статус генерации» и «Файл инфографики»; отправляются только изменившиеся ячейки"
+            )
+            extra_templates = st.multiselect(
+                "Дополнительные шаблоны",
+                [name for name in template_names if name != selected_template],
+                help="Каждое изображение загружается и декодируется один раз и рендерится во все "
+                     "выбранные шаблоны и форматы; в архиве — папка на каждый вариант"
+            )
+            extra_formats = st.multiselect(
+                "Дополнительные форматы",
+                [name for name in Config.EXPORT_FORMATS if name != export_format]
+            )
+            resume_choice = st.selectbox(
+                "Возобновить пакет",
+                [NEW_BATCH] + resumable_batches(),
+                help="Готовые строки из контрольной точки не обрабатываются повторно, ошибки повторяются. "
+                     "Переиспользуются только сохранённые файлы — в режиме «только ZIP» строки будут обработаны заново"
             )
-            
-            save_params = {'quality': export_config['quality']} if export_format == 'JPEG' else {}
-            infographic_img.save(output_path, **save_params)
-            
-            return {
-                'index': idx,
-                'status': 'success',
-                'filename': os.path.basename(output_path),
-                'path': output_path
-            }
-            
-        except Exception as e:
-            return {
-                'index': idx,
-                'status': 'error',
-                'error': str(e)
-            }
+    
+    def show_preflight(preflight):
+        st.info(f"""
+        **Предпроверка ссылок:**
+        - Строк: {len(preflight.rows)} | Уникальных ссылок: {preflight.urls_checked} | Время: {preflight.elapsed:.1f} сек
+        - Битых: {len(preflight.errors)} | С предупреждениями: {len(preflight.warnings)}
+        """)
+        problems = preflight.errors + preflight.warnings
+        if problems:
+            with st.expander(f"🔍 Проблемные ссылки ({len(problems)})"):
+                st.dataframe(pd.DataFrame(problems)[['index', 'status', 'problem', 'image_url',
+                                                     'http_status', 'width', 'height', 'bytes']],
+                             use_container_width=True)
+    
+    if st.button("🔍 Проверить ссылки"):
+        check_settings = BatchSettings(
+            column_mapping=column_mapping,
+            template_name=selected_template,
+            extra_templates=extra_templates,
+            download_concurrency=download_concurrency,
+            rows_to_process=rows_to_process
+        )
+        check_progress = st.progress(0)
+        with st.spinner("Проверка ссылок..."):
+            preflight = preflight_batch(df, check_settings, on_progress=lambda checked, total:
+                                        check_progress.progress(checked / total))
+        show_preflight(preflight)
     
     if st.button("🚀 Запустить массовую обработку", type="primary"):
+        if resume_choice != NEW_BATCH:
+            st.session_state.batch_id = resume_choice[len("batch_"):]
+        elif CheckpointManifest.load_settings(f"output/batch_{st.session_state.batch_id}") is not None:
+            # Новый пакет не должен дописываться в манифест предыдущего запуска
+            st.session_state.batch_id = new_batch_id()
         st.session_state.processing = True
         st.session_state.processing_stats = {
             'total': rows_to_process,
@@ -503,102 +476,169 @@ if st.session_state.df is not None:
             'end_time': None
         }
         
-        output_dir = f"output/batch_{st.session_state.batch_id}"
-        os.makedirs(output_dir, exist_ok=True)
+        batch_settings = BatchSettings(
+            column_mapping=column_mapping,
+            template_name=selected_template,
+            export_format=export_format,
+            extra_templates=extra_templates,
+            extra_formats=extra_formats,
+            filename_prefix=filename_prefix,
+            filename_suffix=filename_suffix,
+            watermark_text=watermark_text if add_watermark else "",
+            render_backend=render_backend,
+            render_mode=render_mode,
+            encoder_profile=encoder_profile,
+            max_output_kb=max_output_kb,
+            render_workers=num_threads,
+            download_concurrency=download_concurrency,
+            per_host_limit=per_host_limit,
+            adaptive_concurrency=adaptive_concurrency,
+            retries=retry_count,
+            batch_size=batch_size,
+            rows_to_process=rows_to_process,
+            zip_only=zip_only,
+            incremental=incremental_mode,
+            dedup=dedup_mode,
+            preflight=preflight_mode,
+            profile_mode=profile_mode,
+            profile_every=profile_every if profile_mode else 0,
+            batch_id=st.session_state.batch_id
+        )
         
         progress_bar = st.progress(0)
         status_text = st.empty()
-        results = []
-        error_log = []
+        
+        def on_progress(processed, errors, total):
+            st.session_state.processing_stats['processed'] = processed
+            st.session_state.processing_stats['errors'] = errors
+            progress_bar.progress(processed / total)
+            status_text.text(
+                f"Обработано: {processed}/"
+                f"{total} | "
+                f"Ошибки: {errors}"
+            )
+        
+        def on_notice(level, message):
+            (st.warning if level == "warning" else st.info)(message)
         
         try:
-            # Используем ThreadPoolExecutor вместо ProcessPoolExecutor[citation:1]
-            with ThreadPoolExecutor(max_workers=num_threads) as executor:
-                # Подготавливаем задачи
-                tasks = [(i, df.iloc[i]) for i in range(min(rows_to_process, len(df)))]
-                
-                # Отправляем задачи на выполнение
-                future_to_idx = {
-                    executor.submit(process_single_image_wrapper, task): task[0] 
-                    for task in tasks
-                }
-                
-                # Обрабатываем результаты по мере их поступления
-                for future in as_completed(future_to_idx):
-                    result = future.result()
-                    results.append(result)
-                    
-                    if result['status'] == 'error':
-                        st.session_state.processing_stats['errors'] += 1
-                        error_log.append(result)
-                    else:
-                        st.session_state.processing_stats['processed'] += 1
-                    
-                    # Обновляем прогресс
-                    progress = st.session_state.processing_stats['processed'] / rows_to_process
-                    progress_bar.progress(progress)
-                    
-                    status_text.text(
-                        f"Обработано: {st.session_state.processing_stats['processed']}/"
-                        f"{rows_to_process} | "
-                        f"Ошибки: {st.session_state.processing_stats['errors']}"
-                    )
-            
-            # Явно вызываем сборщик мусора для освобождения памяти[citation:6]
-            gc.collect()
-            
-            # Сохраняем метаданные
-            metadata = []
-            for result in results:
-                if result['status'] == 'success':
-                    row = df.iloc[result['index']]
-                    metadata.append({
-                        'original_index': result['index'],
-                        'filename': result['filename'],
-                        'product_name': str(row[column_mapping['top_left']]) if column_mapping['top_left'] in df.columns else "",
-                        'price': str(row[column_mapping['top_right']]) if column_mapping['top_right'] in df.columns else "",
-                        'image_url': str(row[column_mapping['image_url']]) if column_mapping['image_url'] in df.columns else "",
-                        'template': selected_template,
-                        'export_format': export_format,
-                        'processing_time': datetime.now().isoformat()
-                    })
-            
-            if metadata:
-                metadata_df = pd.DataFrame(metadata)
-                metadata_path = os.path.join(output_dir, "metadata.csv")
-                metadata_df.to_csv(metadata_path, index=False, encoding='utf-8-sig')
-            
-            if error_log:
-                error_df = pd.DataFrame(error_log)
-                error_path = os.path.join(output_dir, "error_log.csv")
-                error_df.to_csv(error_path, index=False, encoding='utf-8-sig')
-            
-            # Создаем ZIP архив
-            zip_path = f"batch_{st.session_state.batch_id}.zip"
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
-                for root, dirs, files in os.walk(output_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        zipf.write(file_path, os.path.relpath(file_path, output_dir))
+            report = run_batch(df, batch_settings, on_progress=on_progress, on_notice=on_notice)
+            results = report.results
+            delta_report = report.delta_report
+            zip_path = batch_settings.zip_path
             
-            st.session_state.processing_stats['end_time'] = datetime.now()
+            st.session_state.processing_stats['end_time'] = report.end_time
             st.session_state.processing = False
             
             st.success("✅ Обработка завершена успешно!")
             
             # Показываем статистику
-            processing_time = (
-                st.session_state.processing_stats['end_time'] - 
-                st.session_state.processing_stats['start_time']
-            ).total_seconds()
+            processing_time = report.processing_time
             
             st.info(f"""
             **Статистика обработки:**
-            - Всего обработано: {st.session_state.processing_stats['processed']}
-            - Ошибок: {st.session_state.processing_stats['errors']}
+            - Всего обработано: {report.processed}
+            - Ошибок: {report.errors}
             - Время обработки: {processing_time:.1f} сек
-            - Скорость: {st.session_state.processing_stats['processed']/max(processing_time, 0.1):.1f} изобр./сек
+            - Скорость: {report.processed/max(processing_time, 0.1):.1f} изобр./сек
+            - Размер архива: {os.path.getsize(zip_path)/1024/1024:.1f} МБ ({report.archive_files} файлов)
+            - Загрузок шрифтов: {sum(r.get('font_loads', 0) for r in results)} за {sum(r.get('font_load_time', 0) for r in results)*1000:.0f} мс
             """)
+            if report.preflight is not None:
+                show_preflight(report.preflight)
+            decode_stats = report.decode_stats
+            if decode_stats['images']:
+                st.info(f"""
+                **Декодирование исходников:**
+                - Среднее время: {decode_stats['decode_time']/decode_stats['images']*1000:.1f} мс | Пик памяти на изображение: {decode_stats['peak_bytes']/1024/1024:.1f} МБ
+                - Пикселей в памяти: {decode_stats['decoded_bytes']/1024/1024:.0f} МБ вместо {decode_stats['full_bytes']/1024/1024:.0f} МБ при полном декодировании
+                """)
+            format_stats = report.format_stats
+            if format_stats:
+                with st.expander("🗜️ Размер файлов и кодирование по форматам", expanded=bool(max_output_kb)):
+                    st.dataframe(pd.DataFrame([
+                        {'Формат': export_format, 'Файлов': stats['files'],
+                         'Всего, МБ': stats['bytes'] / 1024 / 1024,
+                         'Средний файл, КБ': stats['bytes'] / stats['files'] / 1024,
+                         'Кодирование, мс/файл': stats['encode_time'] / stats['files'] * 1000,
+                         'Качество (среднее)': stats['mean_quality'],
+                         'Сверх лимита': stats['over_budget']}
+                        for export_format, stats in format_stats.items()
+                    ]).round(1), use_container_width=True)
+            frame_stats = report.frame_stats
+            if frame_stats:
+                st.info(f"""
+                **Кадры в разделяемой памяти (бэкенд процессов):**
+                - Ячеек: {frame_stats['slots']} ({frame_stats['total_bytes']/1024/1024:.0f} МБ) | Записано кадров: {frame_stats['fills']} | Взято готовыми: {frame_stats['hits']} | Ожиданий: {frame_stats['waits']}
+                """)
+            dedup_stats = report.dedup_stats
+            if dedup_stats['decodes_saved']:
+                st.info(f"""
+                **Дедупликация изображений:**
+                - Загрузок сэкономлено: {dedup_stats['downloads_saved']} ({dedup_stats['bytes_saved']/1024/1024:.1f} МБ) | Совпадений по содержимому: {dedup_stats['content_rows']}
+                - Декодирований: {dedup_stats['decodes_saved']} | Ресайзов: {dedup_stats['resizes_saved']} | Время: ≈{dedup_stats['time_saved']:.1f} сек
+                """)
+            if delta_report:
+                delta_counts = pd.Series([d['delta'] for d in delta_report]).value_counts()
+                st.info(f"""
+                **Инкрементальный режим:**
+                - Переиспользовано: {sum(1 for d in delta_report if d['reused_from'])} | Перегенерировано: {sum(1 for d in delta_report if not d['reused_from'])}
+                - Без изменений: {delta_counts.get(DELTA_UNCHANGED, 0)} | Изменено: {delta_counts.get(DELTA_CHANGED, 0)} | Новых: {delta_counts.get(DELTA_NEW, 0)}
+                """)
+            missing_fonts = registry.stats()['missing_fonts']
+            if missing_fonts:
+                st.warning(f"Шрифты не найдены, использована замена: {', '.join(missing_fonts)}")
+            
+            cache_stats = report.cache_stats
+            st.info(f"""
+            **Кэш изображений:**
+            - Попаданий: {cache_stats['hits']} | Ревалидировано (304): {cache_stats['revalidated']} | Промахов: {cache_stats['misses']}
+            - Сэкономлено трафика: {cache_stats['bytes_saved']/1024/1024:.1f} МБ | Загружено: {cache_stats['bytes_downloaded']/1024/1024:.1f} МБ
+            - Размер кэша: {cache_stats['stored_bytes']/1024/1024:.1f} МБ | Вытеснено записей: {cache_stats['evictions']}
+            """)
+            
+            pool_stats = report.pool_stats
+            st.info(f"""
+            **HTTP-соединения:**
+            - Запросов: {pool_stats['requests']} | Новых соединений (TCP+TLS): {pool_stats['connections']} | Повторно использовано: {pool_stats['reused']}
+            - Ожидание лимита хоста: {pool_stats['wait_time']:.1f} сек
+            """)
+            if pool_stats['throttled'] or pool_stats['circuit_opens'] or report.deferred_rows:
+                st.warning(f"""
+                **Хосты ограничивали загрузку:**
+                - Ответов 429/503: {pool_stats['throttled']} | Срабатываний выключателя: {pool_stats['circuit_opens']} | Отложено строк: {report.deferred_rows}
+                - Лимиты на хост: {', '.join(f"{host} — {limit:g}" for host, limit in pool_stats['limits'].items())}
+                """)
+            with st.expander("⏱️ Время по стадиям", expanded=True):
+                st.dataframe(pd.DataFrame([
+                    {'Стадия': STAGE_LABELS.get(stage, stage), 'Операций': stats['count'],
+                     'p50, мс': stats['p50'] * 1000, 'p95, мс': stats['p95'] * 1000,
+                     'p99, мс': stats['p99'] * 1000, 'Максимум, мс': stats['max'] * 1000,
+                     'Всего, сек': stats['total']}
+                    for stage, stats in report.stage_stats.items()
+                ]).round(1), use_container_width=True)
+                st.caption(f"Сохранено в {os.path.join(batch_settings.output_dir, TIMINGS_JSON)} и stage_timings.csv")
+            
+            if pool_stats['hosts'] or report.host_timings:
+                with st.expander("🌐 Статистика по хостам"):
+                    hosts = sorted(set(pool_stats['hosts']) | set(report.host_timings))
+                    st.dataframe(pd.DataFrame([
+                        {'host': host, **pool_stats['hosts'].get(host, {}),
+                         'limit': pool_stats['limits'].get(host),
+                         **{f"download_{key}": value for key, value
+                            in report.host_timings.get(host, {}).items()}}
+                        for host in hosts
+                    ]), use_container_width=True)
+            
+            if write_back:
+                with st.spinner("Запись статусов в Google Таблицу..."):
+                    updated_cells, error = save_results_to_google_sheets(
+                        df, results, st.session_state.gs_creds, st.session_state.gs_id
+                    )
+                if error:
+                    st.error(f"Ошибка записи в Google Таблицу: {error}")
+                else:
+                    st.info(f"📝 В Google Таблицу записано ячеек: {updated_cells}")
             
             # Кнопка для скачивания
             with open(zip_path, "rb") as f:
@@ -619,23 +659,42 @@ with st.expander("🔧 Технические детали реализации"
     ### 🛠️ Ключевые улучшения в версии 3.0
     
     **1. Исправление проблем с многопоточностью:**
-    - Используется `ThreadPoolExecutor` вместо `ProcessPoolExecutor`
-    - Решает проблемы с pickle сериализацией в Streamlit[citation:1][citation:8]
+    - Рендеринг принимает сериализуемые задания `RenderJob` (байты, тексты, имя шаблона, формат)
+    - В пуле процессов отресайзенные основы лежат в ячейках разделяемой памяти фиксированного размера: воркеры читают их без копирования и пиклинга, число ячеек ограничено
+    - Поэтому доступен и `ProcessPoolExecutor` на всех ядрах — без проблем с pickle замыканий Streamlit
+    - Загрузка вынесена в отдельную asyncio-стадию: сотни запросов в полёте не занимают потоки рендеринга
     - Более стабильная работа на Windows
     
     **2. Оптимизация памяти:**
-    - Кэширование загрузки изображений с `@st.cache_data`[citation:10]
+    - Дисковый кэш исходных изображений (сырые байты, ревалидация ETag/Last-Modified, LRU по лимиту)
     - Явный вызов `gc.collect()` после обработки[citation:6]
+    - Окно заданий размером «Размер пакета»: строки читаются лениво, пиковая память не зависит от числа строк
     - Лимитирование отображаемых данных[citation:5]
+    - Шрифты и раскладки шаблонов загружаются один раз на процесс, а не на каждое изображение
+    - ZIP-архив пополняется из памяти по мере готовности изображений (режим «только ZIP» не пишет файлы на диск)
+    - Исходники декодируются сразу под размер шаблона (JPEG draft, `reduce`), с учётом EXIF-ориентации и лимитом по пикселям
+    - Предпросмотр кэшируется по (строка, шаблон, столбцы, водяной знак) и рендерится в уменьшенном масштабе; сравнение шаблонов использует один декодированный исходник
     
     **3. Двойной способ ввода данных:**
-    - Локальные Excel файлы (простота использования)
-    - Google Sheets API (для командной работы)
+    - Локальные Excel, CSV и Parquet файлы: читаются только выбранные столбцы, Excel — потоково по кускам, разбор кэшируется по хэшу файла
+    - Google Sheets API (для командной работы): клиент переиспользуется, читаются только выбранные столбцы,
+      статусы пишутся пакетными обновлениями с повтором при ошибках квоты
+    - Без браузера: `python -m infographic catalog.xlsx --template Стандартный` (тот же конвейер, что и в интерфейсе)
     
     **4. Улучшенная обработка ошибок:**
     - Контроль времени ожидания для загрузки изображений
-    - Повторные попытки при сбоях сети
+    - Повторные попытки только временных сбоев (сеть, 429, 5xx) с паузой из Retry-After или экспоненциальной с джиттером
+    - Профили кодировщика (optimize/progressive, WebP method, уровень сжатия PNG) и подбор качества JPEG/WebP под лимит размера файла прямо в памяти
+    - Предпроверка ссылок ранжированным GET до рендеринга: код, тип, размер файла и изображения; битые строки отмечаются или исключаются
+    - Адаптивный AIMD-лимит запросов на хост и выключатель для хостов с серией ошибок: их строки откладываются в конец пакета
     - Детальное логирование ошибок
+    - Инкрементальный режим: строки с неизменившимся отпечатком берутся из прошлых пакетов, отчёт `delta_report.csv`
+    - Контрольная точка `checkpoint.jsonl`: прерванный пакет возобновляется без повторной обработки готовых строк
+    - Общий пул keep-alive соединений с лимитом запросов на хост
+    - Дедупликация: строки с одинаковым URL или содержимым изображения загружаются, декодируются и масштабируются один раз
+    - Веер вариантов: несколько шаблонов и форматов из одной загрузки и декодирования, папка на вариант в архиве
+    - Готовые слои наложения: плашки повторяющихся строк и водяной знак кэшируются и накладываются одним `paste`
+    - Таймеры стадий (загрузка, декодирование, ресайз, текст, кодирование, запись, ZIP) с p50/p95/p99 в `stage_timings.json`/`.csv`, выборочный cProfile/tracemalloc
     
     ### 📊 Рекомендации по развертыванию
     
@@ -651,9 +710,14 @@ with st.expander("🔧 Технические детали реализации"
     3. **Google Cloud Run**: Масштабируемый, контроль над RAM
     
     **Оптимальные настройки для больших объемов:**
-    - 100-1000 изображений: 8 потоков, размер пакета 100
-    - 1000-10000 изображений: 12 потоков, размер пакета 200
-    - 10000+ изображений: 16 потоков, размер пакета 500
+    Зависят от числа ядер, памяти и скорости CDN, поэтому подбираются замером
+    на своей машине — бенчмарк поднимает локальный сервер изображений с
+    задержкой и ошибками и перебирает потоки, размер пакета, шаблоны и форматы:
+    ```bash
+    python -m benchmarks.bench_batch --rows 300 --workers 4 8 12 16 --batch-sizes 100 200 500
+    ```
+    В `bench_batch_results.csv` — изображений в секунду, p50/p95/p99 загрузки
+    и рендеринга и пиковый RSS по каждой комбинации.
     """)
 
 # ==================== ИНСТРУКЦИЯ ====================
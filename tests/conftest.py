@@ -0,0 +1,61 @@
+"""Общие фикстуры: локальный сервер изображений из бенчмарков и изолированные кэши.
+
+``ImageServer`` отдаёт синтетику и опубликованные тестом байты с ETag и
+поддержкой ``Range``; по пути можно задать код ответа, а картинку по тому
+же адресу подменить посреди теста — как при замене на CDN.
+"""
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+from benchmarks.image_server import ImageServer
+from infographic import download
+from infographic.batch import BatchSettings
+from infographic.prepare import NOT_USED
+
+TEMPLATE = "📋 Стандартный"
+
+
+def make_image(color, size=(320, 240)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def server():
+    with ImageServer() as image_server:
+        yield image_server
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Дисковый кэш, индекс отпечатков и пул соединений — свои на каждый тест"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(download, "_instances", {})
+
+
+def catalog(urls):
+    return pd.DataFrame({
+        "Название": [f"Товар {i}" for i in range(len(urls))],
+        "URL картинки": urls,
+        "Цена": [f"{100 + i} руб" for i in range(len(urls))],
+    })
+
+
+def batch_settings(**overrides):
+    values = dict(
+        column_mapping={'top_left': "Название", 'image_url': "URL картинки",
+                        'top_right': "Цена", 'bottom_left': NOT_USED, 'bottom_right': NOT_USED},
+        template_name=TEMPLATE,
+        render_workers=2,
+        download_concurrency=4,
+        retries=0,
+        timeout=5,
+        batch_size=8,
+        batch_id="test",
+    )
+    values.update(overrides)
+    return BatchSettings(**values)
@@ -0,0 +1,104 @@
+import pytest
+import requests
+
+from infographic import adaptive
+from infographic.adaptive import (AdaptiveLimit, CircuitBreaker, HostCircuitOpen, backoff_delay,
+                                  is_retryable_error, retry_after_seconds)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(adaptive.time, "monotonic", fake)
+    return fake
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(response=response)
+
+
+def complete(limit, latency=0.1, ok=True, throttled=False):
+    limit.acquire()
+    limit.release(latency, ok=ok, throttled=throttled)
+
+
+def test_aimd_halves_on_throttling_and_grows_additively(clock):
+    limit = AdaptiveLimit(8)
+    complete(limit, throttled=True)
+    assert limit.limit == 4
+
+    # Вторая ошибка той же волны лимит не трогает
+    complete(limit, throttled=True)
+    assert limit.limit == 4
+
+    clock.now += 1
+    complete(limit)
+    assert limit.limit == pytest.approx(4.25)
+    for _ in range(100):
+        complete(limit)
+    assert limit.limit == 8
+
+
+def test_latency_growth_decreases_gently(clock):
+    limit = AdaptiveLimit(10)
+    for _ in range(5):
+        complete(limit, latency=0.1)
+    for _ in range(20):
+        clock.now += 1
+        complete(limit, latency=5.0)
+
+    assert 1 <= limit.limit < 10
+    assert limit.max_limit == 10
+
+
+def test_fixed_limit_ignores_feedback(clock):
+    limit = AdaptiveLimit(8, adaptive=False)
+    complete(limit, throttled=True)
+    assert limit.limit == 8
+
+
+def test_breaker_opens_after_threshold_and_doubles_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10, max_cooldown=25)
+
+    assert [breaker.record(False) for _ in range(3)] == [False, False, True]
+    assert breaker.is_open
+    with pytest.raises(HostCircuitOpen):
+        breaker.check("example.com")
+
+    clock.now += 10
+    assert not breaker.is_open
+    breaker.check("example.com")
+    # После паузы одного сбоя хватает, пауза удваивается до потолка
+    assert breaker.record(False)
+    assert breaker.open_until == clock.now + 20
+    clock.now += 20
+    assert breaker.record(False) and breaker.open_until == clock.now + 25
+
+
+def test_breaker_success_resets(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    breaker.record(False)
+    breaker.record(True)
+
+    assert not breaker.record(False)
+    assert breaker.opened == 0 and breaker.cooldown == 10
+
+
+def test_retryable_errors_and_retry_after():
+    assert is_retryable_error(requests.ConnectionError())
+    assert is_retryable_error(http_error(503))
+    assert not is_retryable_error(http_error(404))
+    assert retry_after_seconds(http_error(429, {'Retry-After': "7"}).response) == 7
+    assert 7 <= backoff_delay(0, http_error(429, {'Retry-After': "7"})) <= 7.5
+    assert 0 <= backoff_delay(3) <= 4
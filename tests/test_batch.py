@@ -0,0 +1,116 @@
+import os
+import threading
+import zipfile
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from infographic import batch
+from infographic.batch import run_batch
+
+from .conftest import batch_settings, catalog, make_image
+
+COLORS = [(200, 40, 40), (40, 200, 40), (40, 40, 200)]
+
+
+def source_urls(server, rows=6):
+    urls = [server.publish(f"/img{i}.jpg", make_image(color)) for i, color in enumerate(COLORS)]
+    return [urls[i % len(urls)] for i in range(rows)]
+
+
+def archive_names(report):
+    with zipfile.ZipFile(report.settings.zip_path) as archive:
+        return [name for name in archive.namelist() if not name.endswith(".csv")]
+
+
+@pytest.mark.parametrize("backend", ["threads", "processes"])
+def test_batch_renders_every_row(server, backend):
+    report = run_batch(catalog(source_urls(server)), batch_settings(render_backend=backend))
+
+    assert report.processed == 6
+    assert report.errors == 0
+    assert len(archive_names(report)) == 6
+    assert all(os.path.exists(result['path']) for result in report.results)
+
+
+def test_missing_image_goes_to_error_log(server):
+    urls = source_urls(server, rows=3) + [server.base_url + "/missing.jpg"]
+
+    report = run_batch(catalog(urls), batch_settings())
+
+    assert report.processed == 3
+    assert [result['index'] for result in report.error_log] == [3]
+
+
+def test_resume_takes_finished_rows_from_checkpoint(server):
+    df = catalog(source_urls(server))
+    run_batch(df, batch_settings())
+    requests_before = server.stats["requests"]
+
+    report = run_batch(df, batch_settings())
+
+    assert report.resumed == 6
+    assert report.processed == 6
+    assert server.stats["requests"] == requests_before
+    assert len(archive_names(report)) == 6
+
+
+def test_failure_mid_batch_closes_archive_and_executor(server, monkeypatch):
+    executors = []
+
+    def recording_executor(*args, **kwargs):
+        executors.append(create_render_executor(*args, **kwargs))
+        return executors[-1]
+
+    def cancel(processed, errors, total):
+        if processed >= 2:
+            raise KeyboardInterrupt
+
+    create_render_executor = batch.create_render_executor
+    monkeypatch.setattr(batch, "create_render_executor", recording_executor)
+    settings = batch_settings()
+
+    with pytest.raises(KeyboardInterrupt):
+        run_batch(catalog(source_urls(server)), settings, on_progress=cancel)
+
+    assert executors[0]._shutdown
+    with zipfile.ZipFile(settings.zip_path) as archive:
+        assert archive.testzip() is None
+        assert len(archive.namelist()) >= 2
+
+
+def pipeline_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name == "download-loop" or thread.name.startswith("render-")]
+
+
+def test_aborted_batches_stop_pipeline_threads(server):
+    # Строк больше, чем batch_size: загрузка ждёт окно, когда потребитель уходит
+    urls = source_urls(server, rows=40)
+
+    def abort(processed, errors, total):
+        if processed >= 2:
+            raise RuntimeError("отмена")
+
+    for attempt in range(3):
+        settings = batch_settings(batch_id=f"abort{attempt}", dedup=False)
+        with pytest.raises(RuntimeError):
+            run_batch(catalog(urls), settings, on_progress=abort)
+        assert pipeline_threads() == []
+
+
+def test_resume_rerenders_rows_after_settings_change(server):
+    df = catalog(source_urls(server))
+    run_batch(df, batch_settings())
+    notices = []
+
+    report = run_batch(df, batch_settings(template_name="📱 Вертикальный"),
+                       on_notice=lambda level, message: notices.append(level))
+
+    assert report.resumed == 0
+    assert report.processed == 6
+    assert "warning" in notices
+    with zipfile.ZipFile(report.settings.zip_path) as archive:
+        name = archive_names(report)[0]
+        assert Image.open(BytesIO(archive.read(name))).size == (1080, 1920)
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from infographic.dedup import SingleFlight, SourceCache, group_rows, normalize_url
+from infographic.prepare import PreparedRow
+
+
+def row(index, url):
+    return PreparedRow(index, {}, url, f"{index}.jpg", "")
+
+
+def test_normalize_url():
+    assert (normalize_url(" HTTP://Example.COM:80/a.jpg?b=2&a=1#top ")
+            == "http://example.com/a.jpg?a=1&b=2")
+    assert normalize_url("https://example.com:8443") == "https://example.com:8443/"
+    assert normalize_url("not a url") == "not a url"
+
+
+def test_groups_by_normalized_url_in_first_row_order():
+    rows = [row(0, "http://a/1.jpg"), row(1, "http://b/2.jpg"),
+            row(2, "HTTP://A/1.jpg"), row(3, "http://c/3.jpg")]
+
+    groups = list(group_rows(rows))
+
+    assert [[member.index for member in group.rows] for group in groups] == [[0, 2], [1], [3]]
+    assert groups[0].image_url == "http://a/1.jpg"
+
+
+def test_large_groups_split_and_window_bounds_lookahead():
+    rows = [row(i, "http://a/1.jpg") for i in range(5)] + [row(5, "http://b/2.jpg")]
+
+    assert [len(group.rows) for group in group_rows(rows, max_rows=2)] == [2, 2, 1, 1]
+    # Окно в 3 строки: одинаковые URL из разных окон не объединяются
+    assert [len(group.rows) for group in group_rows(rows, window=3)] == [3, 2, 1]
+
+
+def test_single_flight_runs_one_call_per_key():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("value", False)] + [("value", True)] * 3
+
+
+def test_single_flight_shares_errors_and_forgets_key():
+    flight = SingleFlight()
+
+    def broken():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", broken)
+
+    assert flight.do("key", lambda: 42) == (42, False)
+
+
+def test_source_cache_evicts_over_byte_budget():
+    cache = SourceCache(max_bytes=2 * 10 * 10 * 3)
+
+    def image():
+        return Image.new("RGB", (10, 10)), 0.1
+
+    for key in ("a", "b", "c"):
+        cache.get(key, image)
+
+    assert cache.stats() == {'entries': 2, 'bytes': 600}
+    assert cache.get("c", image)[1] and not cache.get("a", image)[1]
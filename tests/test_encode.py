@@ -0,0 +1,62 @@
+import math
+import random
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from infographic.config import Config
+from infographic.render import _encode, encode_image
+
+
+@pytest.fixture(scope="module")
+def noisy():
+    rng = random.Random(7)
+    return Image.frombytes("RGB", (200, 150), bytes(rng.randrange(256) for _ in range(200 * 150 * 3)))
+
+
+def size_at(img, export_format, quality):
+    params = dict(Config.EXPORT_FORMATS[export_format]['profiles']['balanced'], quality=quality)
+    return len(_encode(img, export_format, params))
+
+
+@pytest.mark.parametrize("export_format", ["JPEG", "WebP"])
+def test_picks_highest_quality_under_limit(noisy, export_format):
+    export_config = Config.EXPORT_FORMATS[export_format]
+    low, high = export_config['min_quality'], export_config['quality']
+    max_bytes = (size_at(noisy, export_format, low) + size_at(noisy, export_format, high)) // 2
+    details = {}
+
+    data = encode_image(noisy, export_format, max_bytes=max_bytes, details=details)
+
+    quality = details['quality']
+    assert len(data) <= max_bytes and not details['over_budget']
+    assert low <= quality < high
+    assert size_at(noisy, export_format, quality + 1) > max_bytes
+    # Полная попытка плюс бинарный поиск по диапазону качества
+    assert details['attempts'] <= 1 + math.ceil(math.log2(high - low + 1))
+    assert Image.open(BytesIO(data)).size == noisy.size
+
+
+def test_fitting_image_keeps_default_quality(noisy):
+    details = {}
+    data = encode_image(noisy, "JPEG", max_bytes=10 * 1024 * 1024, details=details)
+
+    assert details == {'quality': 85, 'attempts': 1, 'over_budget': False}
+    assert data == encode_image(noisy, "JPEG")
+
+
+def test_limit_below_min_quality_reports_over_budget(noisy):
+    details = {}
+    data = encode_image(noisy, "JPEG", max_bytes=1000, details=details)
+
+    assert details['quality'] == Config.EXPORT_FORMATS["JPEG"]['min_quality']
+    assert details['over_budget'] and len(data) > 1000
+
+
+def test_png_ignores_limit(noisy):
+    details = {}
+    data = encode_image(noisy, "PNG", max_bytes=1000, details=details)
+
+    assert details == {'quality': None, 'attempts': 1, 'over_budget': True}
+    assert data == encode_image(noisy, "PNG")
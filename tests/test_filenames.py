@@ -0,0 +1,45 @@
+from infographic.filenames import (FORBIDDEN_CHARS, MAX_NAME_LENGTH, TRANSLIT_MAP, fields_hash,
+                                   fields_hashes, sanitize_filename, sanitize_filenames,
+                                   variant_dirname)
+
+
+def reference_sanitize(name):
+    """Посимвольная версия: то же, что таблица ``str.translate``"""
+    out = []
+    for char in name:
+        if char in FORBIDDEN_CHARS:
+            continue
+        if char == ' ':
+            out.append('_')
+        elif char.lower() in TRANSLIT_MAP:
+            lat = TRANSLIT_MAP[char.lower()]
+            out.append(lat.upper() if char.isupper() else lat)
+        else:
+            out.append(char)
+    return "".join(out)[:MAX_NAME_LENGTH]
+
+
+def test_translit_spaces_and_forbidden_chars():
+    assert sanitize_filename("Щётка для обуви: 2 шт?") == "SHCHyotka_dlya_obuvi_2_sht"
+    assert sanitize_filename("Їжак <Ґанок>") == "YIzhak_Ganok"
+
+
+def test_table_matches_reference_for_every_mapped_char():
+    alphabet = "".join(TRANSLIT_MAP) + "".join(TRANSLIT_MAP).upper() + FORBIDDEN_CHARS + " aZ9-_."
+    assert sanitize_filename(alphabet) == reference_sanitize(alphabet)
+    assert sanitize_filenames(["Товар 1", "a/b"]) == ["Tovar_1", "ab"]
+
+
+def test_name_is_truncated():
+    assert len(sanitize_filename("я" * 200)) == MAX_NAME_LENGTH
+
+
+def test_variant_dirname_is_ascii():
+    assert variant_dirname("📱 Вертикальный", "WebP") == "Vertikalnyy_webp"
+
+
+def test_fields_hashes_match_per_row_hash():
+    columns = [["Товар 1", "Товар 2"], ["http://a", "http://b"]]
+
+    assert fields_hashes(columns) == [fields_hash(["Товар 1", "http://a"]),
+                                      fields_hash(["Товар 2", "http://b"])]
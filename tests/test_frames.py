@@ -0,0 +1,75 @@
+import threading
+import zipfile
+
+import pytest
+from PIL import Image
+
+from infographic.batch import run_batch
+from infographic.config import Config
+from infographic.frames import SharedFramePool, read_frame, write_frame
+from infographic.render import create_infographic
+
+from .conftest import TEMPLATE, batch_settings, catalog, make_image
+
+
+@pytest.fixture
+def frame_pool():
+    pool = SharedFramePool({(4, 4): 2})
+    yield pool
+    pool.close()
+
+
+def test_acquire_refuses_to_wait_for_own_frame(frame_pool):
+    lease = frame_pool.acquire(('hash', None, (4, 4)), (4, 4))
+    assert lease.fill
+
+    with pytest.raises(RuntimeError):
+        frame_pool.acquire(('hash', None, (4, 4)), (4, 4))
+    frame_pool.release(lease)
+
+
+def test_ready_frame_is_shared(frame_pool):
+    key = ('hash', None, (4, 4))
+    first = frame_pool.acquire(key, (4, 4))
+    frame_pool.filled(first, cost=0.5)
+
+    second = frame_pool.acquire(key, (4, 4))
+
+    assert not second.fill
+    assert second.ref == first.ref
+    assert frame_pool.cost(second) == 0.5
+
+
+def test_same_size_fanout_on_process_backend(server):
+    # Стандартный и Премиум — оба 1200x1200: одна ячейка на задание
+    urls = [server.publish(f"/img{i}.jpg", make_image((60 * i, 90, 120))) for i in range(3)]
+    settings = batch_settings(render_backend="processes", shared_frames=True, dedup=True,
+                              extra_templates=["⭐ Премиум"])
+    reports = []
+    worker = threading.Thread(target=lambda: reports.append(
+        run_batch(catalog(urls + urls), settings)), daemon=True)
+
+    worker.start()
+    worker.join(timeout=120)
+
+    assert not worker.is_alive(), "пакет завис на ячейках разделяемой памяти"
+    report = reports[0]
+    assert report.processed == 6
+    with zipfile.ZipFile(settings.zip_path) as archive:
+        assert len([name for name in archive.namelist() if not name.endswith(".csv")]) == 12
+    assert report.frame_stats['fills'] == 3
+
+
+def test_read_frame_maps_slot_without_copy(frame_pool):
+    lease = frame_pool.acquire(None, (4, 4))
+    write_frame(lease.ref, Image.new("RGB", (4, 4), (10, 20, 30)))
+
+    frame = read_frame(lease.ref)
+    write_frame(lease.ref, Image.new("RGB", (4, 4), (200, 100, 50)))
+
+    assert frame.mode == "RGBX"
+    assert frame.getpixel((0, 0))[:3] == (200, 100, 50)
+    canvas = create_infographic(frame, {}, {**Config.TEMPLATES[TEMPLATE], 'size': (4, 4)})
+    assert canvas.mode == "RGB" and canvas.getpixel((0, 0)) == (200, 100, 50)
+    del frame
+    frame_pool.release(lease)
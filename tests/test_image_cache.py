@@ -0,0 +1,75 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from infographic import image_cache
+from infographic.image_cache import ImageCache
+
+JPEG = {'content-type': "image/jpeg"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Строго возрастающее время: порядок LRU не зависит от разрешения часов"""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(image_cache.time, "time", lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ImageCache(str(tmp_path / "cache"), max_bytes=250)
+
+
+def test_evicts_least_recently_used_over_budget(cache):
+    cache.store("a", b"a" * 100, JPEG)
+    cache.store("b", b"b" * 100, JPEG)
+    cache.touch("a")
+
+    cache.store("c", b"c" * 100, JPEG)
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") is not None and cache.lookup("c") is not None
+    assert cache.total_bytes() == 200
+    assert cache.stats()['evictions'] == 1
+
+
+def test_identical_bytes_are_stored_and_counted_once(cache):
+    cache.store("a", b"x" * 200, JPEG)
+    cache.store("b", b"x" * 200, JPEG)
+
+    assert cache.total_bytes() == 200
+    assert cache.lookup("a").blob_hash == cache.lookup("b").blob_hash
+
+
+def test_missing_blob_drops_index_entry(cache, tmp_path):
+    blob_hash = cache.store("a", b"a" * 10, JPEG)
+    (tmp_path / "cache" / "objects" / blob_hash[:2] / blob_hash).unlink()
+
+    assert cache.lookup("a") is None
+
+
+def test_stale_entry_is_revalidated_with_etag(tmp_path, clock):
+    cache = ImageCache(str(tmp_path / "cache"), revalidate_after=0)
+    cache.store("a", b"data", dict(JPEG, etag='"v1"'))
+    calls = []
+
+    def get(url, timeout=None, headers=None):
+        calls.append(headers)
+        return SimpleNamespace(status_code=304)
+
+    data, content_type = cache.fetch("a", get)
+
+    assert (data, content_type) == (b"data", "image/jpeg")
+    assert calls == [{'If-None-Match': '"v1"'}]
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_fresh_entry_is_served_without_network(tmp_path, clock):
+    cache = ImageCache(str(tmp_path / "cache"), revalidate_after=3600)
+    cache.store("a", b"data", JPEG)
+
+    data, _ = cache.fetch("a", get=None)
+
+    assert data == b"data"
+    assert cache.stats()['hits'] == 1
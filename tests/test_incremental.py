@@ -0,0 +1,55 @@
+import time
+from types import SimpleNamespace
+
+from infographic.batch import run_batch
+from infographic.download import get_image_cache
+from infographic.image_cache import ImageCache
+from infographic.incremental import (DELTA_CHANGED, DELTA_UNCHANGED, image_validator,
+                                     revalidate_stale)
+
+from .conftest import batch_settings, catalog, make_image
+
+
+def test_incremental_reuses_only_unchanged_images(server):
+    urls = [server.publish(f"/img{i}.jpg", make_image((50 * i, 100, 150))) for i in range(3)]
+    df = catalog(urls)
+    run_batch(df, batch_settings(incremental=True, batch_id="first"))
+    # Картинку заменили по тому же URL; запись кэша устарела
+    server.publish("/img1.jpg", make_image((250, 250, 0)))
+    get_image_cache().revalidate_after = 0
+
+    report = run_batch(df, batch_settings(incremental=True, batch_id="second"))
+
+    delta = {row['index']: row for row in report.delta_report}
+    assert delta[0]['delta'] == DELTA_UNCHANGED and delta[0]['reused_from'] == "first"
+    assert delta[2]['reused_from'] == "first"
+    assert delta[1]['delta'] == DELTA_CHANGED and delta[1]['reused_from'] == ""
+    rendered = [result for result in report.results if 'reused_from' not in result]
+    assert [result['index'] for result in rendered] == [1]
+
+
+def test_stale_entry_without_revalidation_is_unknown(server, tmp_path):
+    url = server.publish("/img.jpg", make_image((10, 20, 30)))
+    cache = ImageCache(str(tmp_path / "cache"), revalidate_after=0)
+    cache.store(url, make_image((10, 20, 30)), {'content-type': "image/jpeg"})
+
+    assert image_validator(cache, url) == ""
+
+
+def test_stale_entries_revalidate_concurrently(tmp_path):
+    cache = ImageCache(str(tmp_path / "cache"), revalidate_after=0)
+    urls = [f"http://images.test/{i}.jpg" for i in range(8)]
+    for url in urls:
+        cache.store(url, make_image((10, 20, 30)), {'content-type': "image/jpeg", 'etag': '"v1"'})
+
+    def slow_not_modified(url, timeout=None, headers=None):
+        assert headers['If-None-Match'] == '"v1"'
+        time.sleep(0.2)
+        return SimpleNamespace(status_code=304)
+
+    started = time.perf_counter()
+    versions = revalidate_stale(cache, urls + urls, slow_not_modified, concurrency=8)
+
+    assert time.perf_counter() - started < 0.2 * len(urls) / 2
+    assert set(versions) == set(urls)
+    assert image_validator(cache, urls[0], revalidated=versions) == versions[urls[0]]
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from infographic import ingest
+from infographic.ingest import load_table, read_table
+
+CATALOG = pd.DataFrame({
+    "Название": ["Товар 1", "Товар 2", "Товар 3"],
+    "Описание": ["Хлопок", "Лён", "Шерсть"],
+    "Цена": [100, 200, 300],
+})
+
+
+def encoded(kind):
+    buffer = BytesIO()
+    if kind == 'xlsx':
+        CATALOG.to_excel(buffer, index=False)
+    elif kind == 'parquet':
+        CATALOG.to_parquet(buffer, index=False)
+    else:
+        return CATALOG.to_csv(index=False).encode(kind)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("kind, filename", [('xlsx', "catalog.xlsx"),
+                                            ('parquet', "catalog.parquet"),
+                                            ('utf-8-sig', "catalog.csv"),
+                                            ('cp1251', "catalog.csv")])
+def test_reads_selected_columns_and_rows(kind, filename):
+    df = read_table(encoded(kind), filename, columns=["Название", "Цена"], max_rows=2)
+
+    assert list(df.columns) == ["Название", "Цена"]
+    assert df["Название"].tolist() == ["Товар 1", "Товар 2"]
+    assert df["Цена"].tolist() == [100, 200]
+
+
+@pytest.mark.parametrize("kind, filename", [('xlsx', "catalog.xlsx"),
+                                            ('parquet', "catalog.parquet"),
+                                            ('utf-8-sig', "catalog.csv")])
+def test_reads_everything_like_pandas(kind, filename):
+    pd.testing.assert_frame_equal(read_table(encoded(kind), filename), CATALOG,
+                                  check_dtype=False)
+
+
+def test_xlsx_chunks_and_trailing_blank_rows(tmp_path):
+    path = tmp_path / "catalog.xlsx"
+    padded = pd.concat([CATALOG, pd.DataFrame([[None] * 3] * 2, columns=CATALOG.columns)])
+    padded.to_excel(path, index=False)
+
+    df = read_table(str(path), "catalog.xlsx", chunk_size=2)
+
+    assert df["Название"].tolist() == CATALOG["Название"].tolist()
+
+
+def test_load_table_caches_by_content(monkeypatch):
+    monkeypatch.setattr(ingest, "_cache", OrderedDict())
+    data = encoded('utf-8-sig')
+
+    first = load_table(data, "a.csv")
+    second = load_table(bytes(data), "b.csv")
+
+    assert not first.cached and second.cached
+    assert second.df is first.df
+
+
+def test_unsupported_extension():
+    with pytest.raises(ValueError):
+        read_table(b"", "catalog.txt")
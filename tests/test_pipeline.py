@@ -0,0 +1,42 @@
+import threading
+import time
+
+from infographic.pipeline import DownloadRenderPipeline
+
+
+def test_window_counts_job_weight():
+    lock = threading.Lock()
+    counters = {'admitted': 0, 'consumed': 0, 'peak': 0}
+
+    def fetch(job):
+        with lock:
+            counters['admitted'] += len(job)
+            counters['peak'] = max(counters['peak'], counters['admitted'] - counters['consumed'])
+        return b"data"
+
+    def render(job, data):
+        time.sleep(0.002)
+        return len(job)
+
+    pipeline = DownloadRenderPipeline(fetch, render, on_error=lambda job, e: 0,
+                                      download_concurrency=16, render_workers=2,
+                                      max_in_flight=8, job_weight=len)
+    jobs = [[index] * 4 for index in range(20)]
+
+    total = 0
+    for rows in pipeline.run(jobs):
+        time.sleep(0.002)
+        with lock:
+            counters['consumed'] += rows
+        total += rows
+
+    assert total == 80
+    assert counters['peak'] <= 8
+
+
+def test_job_heavier_than_window_still_runs():
+    pipeline = DownloadRenderPipeline(lambda job: b"data", lambda job, data: len(job),
+                                      on_error=lambda job, e: 0, render_workers=1,
+                                      max_in_flight=2, job_weight=len)
+
+    assert sorted(pipeline.run([[1, 2, 3], [4]])) == [1, 3]
@@ -0,0 +1,39 @@
+from infographic.batch import run_batch
+from infographic.preflight import STATUS_ERROR, STATUS_OK, STATUS_WARNING, classify
+
+from .conftest import batch_settings, catalog, make_image
+
+
+def probe(status, content_type="image/jpeg"):
+    return {'http_status': status, 'content_type': content_type, 'width': 320, 'height': 240}
+
+
+def test_transient_statuses_are_warnings():
+    for status in (429, 500, 502, 503, 504):
+        assert classify(probe(status))[0] == STATUS_WARNING
+    assert classify({'error': "timeout", 'transient': True})[0] == STATUS_WARNING
+
+
+def test_definitive_failures_are_errors():
+    assert classify(probe(404))[0] == STATUS_ERROR
+    assert classify(probe(410))[0] == STATUS_ERROR
+    assert classify(probe(200, "text/html"))[0] == STATUS_ERROR
+    assert classify(probe(200), max_pixels=1000)[0] == STATUS_ERROR
+    assert classify(probe(206))[0] == STATUS_OK
+
+
+def test_exclude_keeps_rows_with_transient_errors(server):
+    ok = server.publish("/ok.jpg", make_image((10, 120, 200)))
+    busy = server.publish("/busy.jpg", make_image((200, 120, 10)))
+    gone = server.base_url + "/gone.jpg"
+    # Предпроверка видит 503, загрузка — уже рабочий ответ
+    server.fail("/busy.jpg", 503, times=1)
+
+    report = run_batch(catalog([ok, busy, gone]), batch_settings(preflight="exclude"))
+
+    rows = {row['index']: row for row in report.preflight.rows}
+    assert rows[1]['status'] == STATUS_WARNING and rows[1]['http_status'] == 503
+    assert rows[2]['status'] == STATUS_ERROR and rows[2]['http_status'] == 404
+    assert [result['index'] for result in report.error_log] == [2]
+    assert report.error_log[0].get('preflight')
+    assert report.processed == 2
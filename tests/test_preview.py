@@ -0,0 +1,57 @@
+from infographic.decode import decode_image
+from infographic.download import get_image_cache, image_version
+from infographic.prepare import PreparedRow
+from infographic.preview import PreviewCache
+
+from .conftest import TEMPLATE, make_image
+
+MAPPING = {'top_left': "Название"}
+
+
+def preview_row(index, url):
+    return PreparedRow(index, {'top_left': f"Товар {index}"}, url, f"{index}.jpg", f"hash{index}")
+
+
+def test_new_image_version_renders_again():
+    cache = PreviewCache()
+    sources = {"v1": make_image((200, 0, 0)), "v2": make_image((0, 0, 200))}
+    version = ["v1"]
+    fetched = []
+
+    def fetch(url, target_size):
+        fetched.append(version[0])
+        return decode_image(sources[version[0]], target_size=target_size)
+
+    row = preview_row(0, "http://images.test/0.jpg")
+    first, _ = cache.render(row, [TEMPLATE], MAPPING, "", 0.1, fetch, version="v1")
+    again, decoded = cache.render(row, [TEMPLATE], MAPPING, "", 0.1, fetch, version="v1")
+    version[0] = "v2"
+    changed, _ = cache.render(row, [TEMPLATE], MAPPING, "", 0.1, fetch, version="v2")
+
+    assert fetched == ["v1", "v2"]
+    assert decoded is None and again[TEMPLATE] is first[TEMPLATE]
+    assert changed[TEMPLATE].getpixel((60, 60)) != first[TEMPLATE].getpixel((60, 60))
+
+
+def test_sources_do_not_evict_renders():
+    cache = PreviewCache(max_entries=8, max_sources=2)
+
+    def fetch(url, target_size):
+        return decode_image(make_image((90, 90, 90)), target_size=target_size)
+
+    for index in range(6):
+        cache.render(preview_row(index, f"http://images.test/{index}.jpg"),
+                     [TEMPLATE], MAPPING, "", 0.1, fetch)
+
+    stats = cache.stats()
+    assert stats['entries'] == 6 and stats['sources'] == 2
+
+
+def test_image_version_follows_upstream_change(server):
+    url = server.publish("/img.jpg", make_image((10, 20, 30)))
+    first = image_version(url)
+    server.publish("/img.jpg", make_image((200, 20, 30)))
+
+    assert image_version(url) == first
+    get_image_cache().revalidate_after = 0
+    assert image_version(url) not in ("", first)
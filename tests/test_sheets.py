@@ -0,0 +1,103 @@
+import re
+
+import pandas as pd
+import pytest
+
+from infographic import sheets
+from infographic.sheets import (FILENAME_COLUMN, STATUS_COLUMN, read_worksheet,
+                                with_backoff, write_batch_results)
+
+
+class FakeWorksheet:
+    """Лист в памяти: столбцы по буквам, только вызовы, которые делает sheets.py"""
+
+    def __init__(self, columns):
+        self.columns = {chr(ord('A') + i): [name] + values
+                        for i, (name, values) in enumerate(columns.items())}
+        self.col_count = len(self.columns)
+        self.batch_gets = []
+        self.updates = []
+
+    def row_values(self, row):
+        return [values[row - 1] for values in self.columns.values()]
+
+    def add_cols(self, count):
+        self.col_count += count
+
+    def batch_get(self, ranges, major_dimension=None):
+        self.batch_gets.append(list(ranges))
+        result = []
+        for cell_range in ranges:
+            letter, start, end = re.fullmatch(r"([A-Z]+)(\d+):[A-Z]+(\d*)", cell_range).groups()
+            values = self.columns.get(letter, [])
+            values = values[int(start) - 1:int(end) if end else None]
+            result.append([values] if values else [])
+        return result
+
+    def batch_update(self, updates, value_input_option=None):
+        self.updates.extend(updates)
+
+
+def test_reads_only_requested_columns_in_one_call():
+    worksheet = FakeWorksheet({"Название": ["Товар 1", "Товар 2", "Товар 3"],
+                               "Описание": ["x", "y", "z"],
+                               "Цена": ["100", "", "300"]})
+
+    df = read_worksheet(worksheet, columns=["Название", "Цена"], max_rows=2)
+
+    assert worksheet.batch_gets == [["A2:A3", "C2:C3"]]
+    assert list(df.columns) == ["Название", "Цена"]
+    assert df["Название"].tolist() == ["Товар 1", "Товар 2"]
+
+
+def test_writes_only_changed_cells_as_contiguous_ranges():
+    worksheet = FakeWorksheet({"Название": [f"Товар {i}" for i in range(6)],
+                               STATUS_COLUMN: ["OK", "", "", "OK", "", ""],
+                               FILENAME_COLUMN: ["a.jpg", "", "", "d.jpg", "", ""]})
+    df = pd.DataFrame(index=range(6))
+    results = [{'index': i, 'status': 'success', 'filename': name}
+               for i, name in enumerate(["a.jpg", "b.jpg", "c.jpg", "d.jpg", "e.jpg"])]
+    results.append({'index': 5, 'status': 'error', 'error': "404"})
+
+    cells = write_batch_results(worksheet, df, results)
+
+    assert cells == 7
+    assert worksheet.updates == [
+        {'range': "B3:B4", 'values': [["OK"], ["OK"]]},
+        {'range': "B6:B7", 'values': [["OK"], ["Ошибка: 404"]]},
+        {'range': "C3:C4", 'values': [["b.jpg"], ["c.jpg"]]},
+        {'range': "C6:C6", 'values': [["e.jpg"]]},
+    ]
+
+
+def test_adds_missing_result_columns():
+    worksheet = FakeWorksheet({"Название": ["Товар 0"]})
+
+    write_batch_results(worksheet, pd.DataFrame(index=[0]),
+                        [{'index': 0, 'status': 'success', 'filename': "a.jpg"}])
+
+    assert worksheet.col_count == 3
+    assert worksheet.updates[:2] == [{'range': "B1", 'values': [[STATUS_COLUMN]]},
+                                     {'range': "C1", 'values': [[FILENAME_COLUMN]]}]
+
+
+def test_backoff_retries_quota_errors_only(monkeypatch):
+    monkeypatch.setattr(sheets.time, "sleep", lambda delay: None)
+    quota = Exception("quota")
+    quota.response = type("Response", (), {'status_code': 429})()
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise quota
+        return "ok"
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad")
+
+    assert with_backoff(flaky) == "ok" and len(calls) == 3
+    with pytest.raises(ValueError):
+        with_backoff(broken)
+    assert len(calls) == 4